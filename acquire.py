@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+class Accumulator:
+    """采集方式：对触发对齐的数据段做平均或峰值保持
+    
+    累加器按数据段的形状预先分配，逐段原地更新，内存占用与累计的段数无关。
+    """
+    
+    MODES = ('常规', '平均', '指数平均', '峰值保持')
+    
+    def __init__(self, mode=0, count=16, alpha=0.1):
+        """构造函数"""
+        
+        self.mode = mode                            # 采集方式：0 - 常规，1 - N次平均，2 - 指数平均，3 - 峰值保持
+        self.count = count                          # N次平均的次数，超过后按1/N做指数平均
+        self.alpha = alpha                          # 指数平均系数
+        self.reset()
+    
+    def reset(self, shape=(0, 0)):
+        """按数据段形状重新分配累加器"""
+        
+        self.acc = np.zeros(shape)                  # 平均值
+        self.lo = np.zeros(shape)                   # 峰值保持的最小值
+        self.hi = np.zeros(shape)                   # 峰值保持的最大值
+        self.tmp = np.empty(shape)                  # 原地运算的临时缓冲区
+        self.n = 0                                  # 已累计的段数
+    
+    @property
+    def length(self):
+        """数据段长度"""
+        
+        return self.acc.shape[1]
+    
+    def set_args(self, **kwds):
+        """设置参数（清除已累计的数据）"""
+        
+        for key in ('mode', 'count', 'alpha'):
+            if key in kwds:
+                setattr(self, key, kwds[key])
+        
+        self.reset()
+    
+    def feed(self, segments):
+        """送入触发对齐的数据段，每段形状为(通道数, 数据点数)；段长变化时清除已累计的数据，返回累计的段数"""
+        
+        if not self.mode:
+            return 0
+        
+        for seg in segments:
+            if seg.shape[1] == 0:
+                continue
+            
+            if seg.shape != self.acc.shape:
+                self.reset(seg.shape)
+            
+            self.n += 1
+            if self.n == 1:
+                self.acc[:] = seg
+                self.lo[:] = seg
+                self.hi[:] = seg
+            elif self.mode == 3:
+                np.minimum(self.lo, seg, out=self.lo)
+                np.maximum(self.hi, seg, out=self.hi)
+            else:
+                w = 1/min(self.n, self.count) if self.mode == 1 else self.alpha
+                np.subtract(seg, self.acc, out=self.tmp)
+                self.tmp *= w
+                self.acc += self.tmp
+        
+        return self.n
+    
+    def window(self, width):
+        """返回累计结果的绘图点：数据点偏移和各通道对应的数值，格式与Envelope.window相同
+        
+        按像素列返回最小值和最大值；峰值保持方式下分别取自最小值和最大值累加器，即包络带。
+        """
+        
+        lo, hi = (self.lo, self.hi) if self.mode == 3 else (self.acc, self.acc)
+        n, width = self.length, max(int(width), 1)
+        
+        if n <= 2*width and self.mode != 3:
+            return np.arange(n, dtype=np.float64), self.acc
+        
+        px = np.arange(n) * min(width, n) // n
+        idx = np.flatnonzero(np.diff(px, prepend=-1))
+        x = np.repeat(px[idx] * n / min(width, n), 2)
+        y = np.empty((lo.shape[0], 2*idx.shape[0]))
+        y[:, 0::2] = np.minimum.reduceat(lo, idx, axis=1)
+        y[:, 1::2] = np.maximum.reduceat(hi, idx, axis=1)
+        
+        return x, y
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+
+from spectrum import Spectrum
+from measure import measure, rising
+
+class SharedRing:
+    """共享内存环形缓冲区：采样线程写入形状为(通道数, 数据点数)的数据块，分析进程按数据流中的绝对位置直接读取
+    
+    共享内存的开头是写入计数（已写入的数据点数）和正在写入的数据块的终点，其后是按通道优先存放的环形缓冲区。
+    只有一个写入者：先登记终点，再写数据，最后推进写入计数；读取者复制数据后按登记的终点检查，复制期间被覆盖的数据作废。
+    样本数据不经过进程间的管道，进程之间只传递spec和位置。
+    """
+    
+    HEADER = 64                                     # 写入计数所在的头部长度（字节）
+    
+    def __init__(self, channels=1, capacity=1048576, dtype=np.int16, name=None):
+        """构造函数，name为None时创建新的共享内存，否则按名称连接已有的共享内存"""
+        
+        self.channels = channels                    # 通道数
+        self.capacity = capacity                    # 每个通道的容量（数据点数）
+        self.dtype = np.dtype(dtype)                # 数据类型
+        self.owner = name is None                   # 是否为创建者（负责释放共享内存）
+        self.lock = threading.RLock()               # 重新创建共享内存与读取名称、写入计数之间的锁（reset中调用close，可重入）
+        self._open(name)
+    
+    def _open(self, name):
+        """创建或连接共享内存，建立头部和缓冲区的数组视图"""
+        
+        size = self.HEADER + self.channels*self.capacity*self.dtype.itemsize
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                self.shm = shared_memory.SharedMemory(name=name)
+        
+        self.header = np.ndarray(2, dtype=np.int64, buffer=self.shm.buf) # 写入计数、正在写入的数据块的终点
+        self.buf = np.ndarray((self.channels, self.capacity), dtype=self.dtype, buffer=self.shm.buf, offset=self.HEADER) # 环形缓冲区
+        if self.owner:
+            self.header[:] = 0
+    
+    @property
+    def spec(self):
+        """连接所需的参数(名称, 通道数, 容量, 数据类型)，随任务发给分析进程；正在重新创建时为None"""
+        
+        with self.lock:
+            if self.shm is None:
+                return None
+            
+            return (self.shm.name, self.channels, self.capacity, self.dtype.str)
+    
+    @classmethod
+    def attach(cls, spec):
+        """按spec连接已有的共享内存"""
+        
+        name, channels, capacity, dtype = spec
+        
+        return cls(channels, capacity, dtype, name=name)
+    
+    @property
+    def head(self):
+        """已写入的数据点数（正在重新创建时为0）"""
+        
+        with self.lock:
+            return int(self.header[0]) if self.header is not None else 0
+    
+    def reset(self, channels=None, dtype=None):
+        """重新开始：释放原共享内存，按通道数和数据类型创建新的（名称随之改变，分析进程据此重新连接）
+        
+        在采样线程中调用，持有锁，界面线程提交任务或读取写入计数时不会看到已关闭的共享内存。
+        """
+        
+        with self.lock:
+            self.close()
+            self.channels = channels or self.channels
+            self.dtype = np.dtype(dtype or self.dtype)
+            self.owner = True
+            self._open(None)
+    
+    def write(self, data):
+        """写入形状为(通道数, 数据点数)的数据块，超过容量时只保留最后的部分"""
+        
+        n = data.shape[1]
+        m = min(n, self.capacity)
+        head = int(self.header[0])
+        self.header[1] = head + n
+        i = (head + n - m) % self.capacity
+        j = min(m, self.capacity - i)
+        self.buf[:, i:i+j] = data[:, n-m:n-m+j]
+        self.buf[:, :m-j] = data[:, n-m+j:]
+        self.header[0] = head + n
+    
+    def read(self, start, stop):
+        """复制出绝对位置为[start, stop)的数据（超出已写入范围的部分截去），复制期间被覆盖时返回None"""
+        
+        head = int(self.header[0])
+        start, stop = max(start, head - self.capacity, 0), min(stop, head)
+        if stop <= start:
+            return np.empty((self.channels, 0), dtype=self.dtype)
+        
+        n = stop - start
+        i = start % self.capacity
+        j = min(n, self.capacity - i)
+        data = np.empty((self.channels, n), dtype=self.dtype)
+        data[:, :j] = self.buf[:, i:i+j]
+        data[:, j:] = self.buf[:, :n-j]
+        
+        if int(self.header[1]) - self.capacity > start:
+            return None
+        
+        return data
+    
+    def close(self):
+        """断开共享内存，创建者同时释放"""
+        
+        with self.lock:
+            if self.shm is None:
+                return
+            
+            self.header = self.buf = None
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+            self.shm = None
+
+_rings = dict()                                     # 分析进程中已连接的共享内存：名称 → SharedRing
+
+def _ring(spec):
+    """分析进程中按spec取得共享内存环形缓冲区，采样器重新开始后断开旧的"""
+    
+    if spec[0] not in _rings:
+        for ring in _rings.values():
+            ring.close()
+        _rings.clear()
+        _rings[spec[0]] = SharedRing.attach(spec)
+    
+    return _rings[spec[0]]
+
+def spectrum_task(spec, stop, rate, nfft=8192, frames=8, average=0.2, full=32768):
+    """分析进程任务：计算截至stop的frames帧的平均幅度谱，返回(stop, 幅度谱)，数据已被覆盖时返回None"""
+    
+    sp = Spectrum(rate=rate, nfft=nfft, average=average, channels=spec[1], full=full)
+    data = _ring(spec).read(stop - nfft - sp.hop*(frames - 1), stop)
+    if data is None or data.shape[1] < nfft:
+        return None
+    
+    sp.feed(data)
+    
+    return stop, sp.avg.astype(np.float32)
+
+def measure_task(spec, start, stop, rate):
+    """分析进程任务：测量[start, stop)区间的数据，返回(stop, 测量结果)，数据已被覆盖时返回None"""
+    
+    data = _ring(spec).read(start, stop)
+    if data is None or data.shape[1] == 0:
+        return None
+    
+    return stop, measure(data, rate)
+
+def search_task(spec, start, stop, level, hysteresis=0, channel=0):
+    """分析进程任务：查找[start, stop)区间内channel通道上升沿越过level的位置，返回(stop, 绝对位置数组)"""
+    
+    data = _ring(spec).read(start, stop)
+    if data is None or data.shape[1] == 0:
+        return None
+    
+    t, armed = rising(data[channel].astype(np.float64), level, hysteresis)
+    
+    return stop, (start + np.ceil(t)).astype(np.int64)
+
+TASKS = {'spectrum': spectrum_task, 'measure': measure_task, 'search': search_task} # 任务名称 → 任务函数
+
+class AnalysisPool:
+    """分析进程池：频谱、测量和事件查找在工作进程中进行，不与采集、队列读出和界面线程争用GIL
+    
+    任务只携带共享内存的spec、位置和参数，结果是小型的数组或字典；同一种任务最多一个在执行，
+    界面每次只取最新的结果，分析跟不上时跳过中间的数据而不会积压。
+    """
+    
+    def __init__(self, workers=None):
+        """构造函数，workers为工作进程数，None表示CPU核数减一（至少一个）"""
+        
+        self.workers = workers or max((os.cpu_count() or 2) - 1, 1) # 工作进程数
+        self.ring = None                            # 共享内存环形缓冲区
+        self.pending = set()                        # 正在执行的任务名称
+        self.results = dict()                       # 任务名称 → 最新的结果
+        self.errors = 0                             # 执行出错的任务数
+        self.lock = threading.Lock()                # 结果回调线程与界面线程之间的锁（持有时可再取共享内存的锁，反之不可）
+        
+        # spawn方式启动工作进程，不复制界面和采样线程的状态
+        self.pool = multiprocessing.get_context('spawn').Pool(self.workers)
+    
+    def attach(self, ring):
+        """设置共享内存环形缓冲区，丢弃之前的结果"""
+        
+        with self.lock:
+            self.ring = ring
+            self.results.clear()
+    
+    def _done(self, name, spec, result):
+        """任务完成的回调（在进程池的结果线程中执行），只保留与当前共享内存对应的结果"""
+        
+        with self.lock:
+            self.pending.discard(name)
+            if result is not None and self.ring is not None and spec == self.ring.spec:
+                self.results[name] = result
+    
+    def _failed(self, name, error):
+        """任务出错的回调"""
+        
+        with self.lock:
+            self.pending.discard(name)
+            self.errors += 1
+    
+    def submit(self, name, *args):
+        """提交任务（参数不含spec），同名任务仍在执行时不提交，返回是否已提交"""
+        
+        with self.lock:
+            spec = self.ring.spec if self.ring is not None else None
+            if spec is None or name in self.pending:
+                return False
+            
+            self.pending.add(name)
+        
+        self.pool.apply_async(
+            TASKS[name],
+            (spec,) + args,
+            callback        = lambda result: self._done(name, spec, result),
+            error_callback  = lambda error: self._failed(name, error)
+        )
+        
+        return True
+    
+    def result(self, name):
+        """取出最新的结果，没有新结果时返回None"""
+        
+        with self.lock:
+            return self.results.pop(name, None)
+    
+    def close(self):
+        """结束工作进程"""
+        
+        self.pool.terminate()
+        self.pool.join()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+import os
+import wave
+import numpy as np
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+from lazy import BlockFile, NpyFile
+from oscfile import OscFile
+from formats import full_scale, convert, unpack24, pack24
+
+WIDTHS = {2: np.dtype('<i2'), 3: np.dtype('<i4'), 4: np.dtype('<i4')} # WAV文件的样本字节数 → 数据类型
+
+class WavFile(NpyFile):
+    """按块读取的WAV文件：16位、24位或32位PCM，采样频率和通道数取自文件头；24位和32位样本读为24位范围的int32"""
+    
+    def __init__(self, path, block=65536, step=1024, cache=64*1048576, ahead=2):
+        """构造函数，block为每块数据点数，step为概览摘要的分辨率"""
+        
+        BlockFile.__init__(self, path, cache, ahead)
+        
+        reader = wave.open(self.fp, 'rb')
+        if reader.getsampwidth() not in WIDTHS:
+            raise ValueError('只支持16位、24位或32位WAV文件')
+        
+        # readframes(0)将文件定位到采样数据的开头
+        reader.readframes(0)
+        
+        self.offset = self.fp.tell()                # 采样数据的位置
+        self.rate = reader.getframerate()           # 采样频率
+        self.channels = reader.getnchannels()       # 通道数
+        self.width = reader.getsampwidth()          # 样本字节数
+        self.dtype = WIDTHS[self.width]             # 数据类型
+        self.fortran = False                        # 按帧交织存放
+        self.count = reader.getnframes()            # 每个通道的数据点数
+        self.block = block                          # 每块数据点数
+        self.step = step                            # 概览摘要的分辨率（数据点数）
+        self.starts = np.append(np.arange(0, self.count, block), self.count) # 各块首个数据点的位置
+    
+    def _load(self, fp, i):
+        """从文件对象fp读取第i个数据块，24位样本解包，32位样本舍去低8位"""
+        
+        if self.width == 2:
+            return NpyFile._load(self, fp, i)
+        
+        a, b = int(self.starts[i]), int(self.starts[i+1])
+        fp.seek(self.offset + a*self.channels*self.width)
+        buf = fp.read((b - a)*self.channels*self.width)
+        
+        if self.width == 3:
+            return np.ascontiguousarray(unpack24(buf, self.channels))
+        
+        return np.ascontiguousarray(np.frombuffer(buf, dtype=self.dtype).reshape(b - a, self.channels).T >> 8)
+
+class FlacFile(BlockFile):
+    """按块读取的FLAC文件（需要安装soundfile）：16位以上的样本读为24位范围的int32"""
+    
+    def __init__(self, path, block=65536, step=1024, cache=64*1048576, ahead=2):
+        """构造函数，block为每块数据点数，step为概览摘要的分辨率"""
+        
+        if soundfile is None:
+            raise ImportError('读写FLAC文件需要安装soundfile')
+        
+        BlockFile.__init__(self, path, cache, ahead)
+        
+        info = soundfile.info(path)
+        self.readers = dict()                       # 文件对象 → 解码器，读取线程和预读线程各用一个
+        self.rate = info.samplerate                 # 采样频率
+        self.channels = info.channels               # 通道数
+        self.dtype = np.dtype(np.int16 if info.subtype in ('PCM_S8', 'PCM_16') else np.int32) # 数据类型
+        self.count = info.frames                    # 每个通道的数据点数
+        self.block = block                          # 每块数据点数
+        self.step = step                            # 概览摘要的分辨率（数据点数）
+        self.starts = np.append(np.arange(0, self.count, block), self.count) # 各块首个数据点的位置
+    
+    def _load(self, fp, i):
+        """解码第i个数据块"""
+        
+        reader = self.readers.get(fp)
+        if reader is None:
+            reader = self.readers[fp] = soundfile.SoundFile(self.path)
+        
+        a, b = int(self.starts[i]), int(self.starts[i+1])
+        reader.seek(a)
+        
+        data = reader.read(b - a, dtype=self.dtype.name, always_2d=True).T
+        
+        # soundfile读出的int32样本以32位为满量程
+        return np.ascontiguousarray(data >> 8 if self.dtype.itemsize == 4 else data)
+    
+    def close(self):
+        """关闭文件和解码器"""
+        
+        BlockFile.close(self)
+        for reader in self.readers.values():
+            reader.close()
+        self.readers.clear()
+
+class AudioWriter:
+    """WAV或FLAC文件写入器：按块写入形状为(通道数, 数据点数)的数据，按扩展名决定文件格式
+    
+    int16数据写为16位样本，24位范围的int32数据和浮点数据写为24位样本（WAV文件中浮点数据按满量程换算为整数）。
+    """
+    
+    def __init__(self, path, channels=1, rate=44100, dtype=np.int16):
+        """构造函数，dtype为int16、int32（24位样本）或float32"""
+        
+        self.path = path                            # 文件路径
+        self.channels = channels                    # 通道数
+        self.rate = rate                            # 采样频率
+        self.dtype = np.dtype(dtype)                # 数据类型
+        self.flac = os.path.splitext(path)[1].lower() == '.flac' # 是否写入FLAC文件
+        self.width = 2 if full_scale(self.dtype) == 32768 else 3 # 样本字节数
+        self.count = 0                              # 已写入的数据点数
+        
+        if self.dtype.kind not in 'if' or self.dtype.itemsize not in (2, 4):
+            raise ValueError('只支持int16、int32或float32数据')
+        
+        if self.flac:
+            if soundfile is None:
+                raise ImportError('读写FLAC文件需要安装soundfile')
+            self.fp = soundfile.SoundFile(path, 'w', rate, channels, 'PCM_16' if self.width == 2 else 'PCM_24', format='FLAC')
+        else:
+            self.fp = wave.open(path, 'wb')
+            self.fp.setnchannels(channels)
+            self.fp.setsampwidth(self.width)
+            self.fp.setframerate(rate)
+    
+    def write(self, data):
+        """写入形状为(通道数, 数据点数)的数据，按帧交织"""
+        
+        data = np.reshape(data, (self.channels, -1))
+        if self.flac:
+            # soundfile以数据类型的满量程换算，24位范围的int32样本左移8位
+            if self.dtype.kind == 'f':
+                frames = np.ascontiguousarray(data.T, dtype=np.float32)
+            elif self.width == 3:
+                frames = np.ascontiguousarray(data.T, dtype=np.int32) << 8
+            else:
+                frames = np.ascontiguousarray(data.T, dtype=np.int16)
+            self.fp.write(frames)
+        elif self.width == 3:
+            self.fp.writeframesraw(pack24(convert(np.asarray(data, dtype=self.dtype), np.int32)))
+        else:
+            self.fp.writeframesraw(np.ascontiguousarray(data.T, dtype='<i2').tobytes())
+        
+        self.count += data.shape[1]
+    
+    def close(self):
+        """关闭文件，WAV文件在文件头中补写数据长度"""
+        
+        if self.fp is None:
+            return
+        
+        self.fp.close()
+        self.fp = None
+
+def open_file(path, **kwds):
+    """按扩展名打开.osc、.npy、WAV或FLAC文件，返回按块读取的数据文件对象"""
+    
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.osc':
+        return OscFile(path, **kwds)
+    if ext == '.wav':
+        return WavFile(path, **kwds)
+    if ext == '.flac':
+        return FlacFile(path, **kwds)
+    
+    return NpyFile(path, **kwds)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import argparse
+import threading
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from store import DataStore
+from envelope import Envelope
+from sample import AudioSampler
+from source import SignalSource
+from chunkqueue import ChunkQueue
+
+def timeit(fn, repeat=20):
+    """返回fn多次执行耗时的中位数（秒）"""
+    
+    ts = list()
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        ts.append(time.perf_counter() - t0)
+    
+    return float(np.median(ts))
+
+def fill(rate, seconds, channels=1):
+    """生成一个已装入seconds秒合成数据的存储器及其包络金字塔，以大块填充以节省时间"""
+    
+    store = DataStore(channels=channels)
+    env = Envelope(store)
+    feed = SignalSource('sine', freq=50, noise=200, seed=0)
+    block = rate
+    
+    for i in range(0, int(seconds*rate), block):
+        store.append(feed.generate(i, min(block, int(seconds*rate) - i), rate, channels))
+        env.update()
+    
+    return store, env, feed
+
+def bench_store(rate, lengths, chunk=1024, count=200):
+    """数据追加：在不同数据长度下，每个数据块的追加和包络更新耗时，以及内存占用"""
+    
+    rows = list()
+    for seconds in lengths:
+        store, env, feed = fill(rate, seconds)
+        data = feed.generate(0, chunk, rate, 1)
+        
+        t0 = time.perf_counter()
+        for i in range(count):
+            store.append(data)
+        t_append = (time.perf_counter() - t0) / count
+        
+        t0 = time.perf_counter()
+        for i in range(count):
+            store.append(data)
+            env.update()
+        t_update = (time.perf_counter() - t0) / count - t_append
+        
+        levels = sum(mins.buf.nbytes + maxs.buf.nbytes for mins, maxs in env.levels)
+        rows.append({
+            'stage': 'append',
+            'seconds': seconds,
+            'append_us': t_append*1e6,
+            'envelope_us': t_update*1e6,
+            'data_mb': store.buf.nbytes/1048576,
+            'envelope_mb': levels/1048576
+        })
+    
+    return rows
+
+def bench_window(rate, lengths, widths, pixels=1600):
+    """时间窗口取点：在不同数据长度和时间窗口宽度下，从包络金字塔取出绘图点的耗时"""
+    
+    rows = list()
+    for seconds in lengths:
+        store, env, feed = fill(rate, seconds)
+        for tw in widths:
+            k = max(int(tw*rate/1000), 1)
+            starts = np.linspace(0, max(len(store) - k, 0), 16).astype(int)
+            it = iter(np.resize(starts, 1000))
+            
+            rows.append({
+                'stage': 'window',
+                'seconds': seconds,
+                'tw_ms': tw,
+                'samples': k,
+                'window_us': timeit(lambda: env.window(*(lambda s: (s, s + k, pixels))(next(it))))*1e6,
+                'points': env.window(0, k, pixels)[0].shape[0]
+            })
+    
+    return rows
+
+def bench_pipeline(rate, seconds, channels=1):
+    """采样流水线：合成数据源不限速产出，队列读出、合并追加和包络更新的持续吞吐量"""
+    
+    dq = ChunkQueue(capacity=1048576, policy='block')
+    sampler = AudioSampler(dq, rate=rate, channels=channels, input=SignalSource(speed=0, seed=0))
+    store = DataStore(channels=channels)
+    env = Envelope(store)
+    
+    thread = threading.Thread(target=sampler.start, daemon=True)
+    thread.start()
+    
+    frames = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        data, marks, t = dq.take(timeout=0.1)
+        if data is not None:
+            store.append(data)
+            env.update()
+            frames += 1
+    
+    elapsed = time.perf_counter() - t0
+    chunks = dq.chunks_out
+    sampler.stop()
+    thread.join()
+    
+    return [{
+        'stage': 'pipeline',
+        'channels': channels,
+        'chunk': sampler.chunk,
+        'chunks_per_s': chunks/elapsed,
+        'samples_per_s': dq.samples_out/elapsed,
+        'realtime_x': dq.samples_out/elapsed/rate,
+        'batches_per_s': frames/elapsed,
+        'dropped': sampler.dropped
+    }]
+
+def bench_screen(rate, lengths, widths, size=(1920, 1080)):
+    """屏幕：Screen._update、背景位图重绘和Screen.plot每帧的耗时，plot绘制在离屏的wx.MemoryDC上；没有wx时跳过"""
+    
+    try:
+        import wx
+        from screen import Screen
+    except ImportError:
+        return list()
+    
+    class Parent(wx.Frame):
+        """承载屏幕的隐藏窗口，提供Screen需要的滑块和旋钮"""
+        
+        def __init__(self):
+            """构造函数"""
+            
+            wx.Frame.__init__(self, None, -1, size=size)
+            self.slider = wx.Slider(self, -1, 0, 0, 1000)
+            self.vknob = wx.Slider(self, -1, 0, 0, 100)
+    
+    app = wx.App(False)
+    frame = Parent()
+    screen = Screen(frame, rate=rate)
+    screen.SetSize(size)
+    screen.scrsize = size
+    
+    bmp = wx.Bitmap(*size)
+    dc = wx.MemoryDC(bmp)
+    
+    rows = list()
+    for seconds in lengths:
+        store, env, feed = fill(rate, seconds)
+        screen.data, screen.env = store, env
+        env.store = store
+        
+        for tw in widths:
+            screen.tw = tw
+            screen.k = max(int(tw*rate/1000), 1)
+            screen.pos = max(len(store) - screen.k, 0)
+            screen.args = screen._update()
+            screen.bg = None
+            
+            rows.append({
+                'stage': 'screen',
+                'seconds': seconds,
+                'tw_ms': tw,
+                'update_us': timeit(screen._update)*1e6,
+                'background_us': timeit(screen._background)*1e6,
+                'plot_us': timeit(lambda: screen.plot(dc))*1e6
+            })
+    
+    dc.SelectObject(wx.NullBitmap)
+    frame.Destroy()
+    app.Destroy()
+    
+    return rows
+
+def show(rows):
+    """按阶段输出表格"""
+    
+    for stage in sorted(set(row['stage'] for row in rows), key=[row['stage'] for row in rows].index):
+        items = [row for row in rows if row['stage'] == stage]
+        keys = [key for key in items[0] if key != 'stage']
+        
+        print('\n[%s]'%stage)
+        print('  '.join(key.rjust(14) for key in keys))
+        for row in items:
+            print('  '.join(('%.2f'%row[key] if isinstance(row[key], float) else str(row[key])).rjust(14) for key in keys))
+
+def main(argv=None):
+    """命令行入口"""
+    
+    parser = argparse.ArgumentParser(description='采样器 → 队列 → 屏幕 流水线基准测试')
+    parser.add_argument('-r', '--rate', type=int, default=44100, help='采样频率')
+    parser.add_argument('--lengths', default='1,60,600', help='数据长度（秒），逗号分隔；3600即1小时')
+    parser.add_argument('--widths', default='0.1,1,32,1000,10000', help='时间窗口宽度（毫秒），逗号分隔')
+    parser.add_argument('--pipeline', type=float, default=3, help='流水线吞吐量测试时长（秒）')
+    parser.add_argument('--json', help='将结果以JSON格式写入文件，便于比较回归')
+    args = parser.parse_args(argv)
+    
+    lengths = [float(item) for item in args.lengths.split(',')]
+    widths = [float(item) for item in args.widths.split(',')]
+    
+    rows = list()
+    rows += bench_store(args.rate, lengths)
+    rows += bench_window(args.rate, lengths, widths)
+    rows += bench_pipeline(args.rate, args.pipeline)
+    rows += bench_pipeline(args.rate, args.pipeline, channels=2)
+    rows += bench_screen(args.rate, lengths, widths)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024 if resource else 0
+    
+    show(rows)
+    print('\n进程内存峰值（RSS）：%.1f MB'%peak)
+    
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump({'rate': args.rate, 'peak_rss_mb': peak, 'rows': rows}, fp, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+from sample import AudioSampler
+from recorder import Recorder
+from source import SignalSource, ReplaySource
+from stats import Stats
+from chunkqueue import ChunkQueue
+from formats import FORMATS, RATES, full_scale
+from filters import PRESETS
+from analysis import SharedRing, AnalysisPool
+
+class Capture:
+    """无界面采集器：持续采集并写盘，按时长切分文件，定时输出吞吐量和触发统计
+    
+    与界面相同，录制器由采样器在入队之前写盘（声卡回调中只复制数据块交给写盘线程，不等待）；
+    数据队列只用于吞吐量和延迟统计，队列满时按策略丢弃的数据不影响录制的文件。
+    """
+    
+    def __init__(self, sampler, works, rotate=3600, interval=5, fmt='osc', stats=None, pool=None):
+        """构造函数，stats为运行统计日志文件路径，None表示不统计；pool为分析进程池，非None时每个统计间隔分析一次"""
+        
+        self.sampler = sampler                      # 采样器
+        self.works = works                          # 数据目录
+        self.rotate = rotate                        # 每个文件的时长（秒），0表示不切分
+        self.interval = interval                    # 统计输出间隔（秒）
+        self.fmt = fmt                              # 文件格式：osc、npy、wav或flac
+        self.recorder = Recorder()                  # 录制器
+        self.chunks = 0                             # 采集的数据块（或触发数据段）数
+        self.samples = 0                            # 采集的数据点数
+        self.files = 0                              # 已生成的文件数
+        self.filed = 0                              # 当前文件开始时已采集的数据点数
+        self.t0 = time.time()                       # 开始采集的时间
+        self.stats = Stats(sampler, log=stats) if stats else None # 运行统计，每个统计间隔写入一行快照
+        self.pool = pool                            # 分析进程池，分析采样器写入共享内存的数据流
+    
+    def _open(self):
+        """打开一个新文件：首个文件在采样器启动之前打开，此后由写盘线程切换到新文件"""
+        
+        name = time.strftime('%Y%m%d_%H%M%S') + ('_%d'%self.files if self.files else '') + '.' + self.fmt
+        path = os.path.join(self.works, name)
+        
+        if self.files:
+            self.recorder.rotate(path)
+        else:
+            # 回放文件等数据源自带的采样频率、通道数和样本格式优先
+            feed = self.sampler.input
+            self.recorder.open(
+                path,
+                channels    = feed.channels or self.sampler.channels,
+                rate        = feed.rate or self.sampler.rate,
+                meta        = self.sampler.describe(),
+                dtype       = FORMATS[feed.format or self.sampler.format]
+            )
+        
+        self.files += 1
+        self.filed = self.samples
+        
+        return name
+    
+    def report(self, elapsed, chunks, samples):
+        """输出一行统计信息"""
+        
+        rate = samples / elapsed if elapsed > 0 else 0
+        print('%8.1fs  %8.1f 块/秒  %10.0f 点/秒  %6.2f MB/秒  累计 %d 块  溢出 %d  丢弃 %d  文件 %d'%(
+            time.time() - self.t0,
+            chunks / elapsed if elapsed > 0 else 0,
+            rate,
+            rate * self.sampler.channels * self.sampler.dtype.itemsize / 1048576,
+            self.chunks,
+            self.sampler.overflows,
+            self.sampler.dropped,
+            self.files
+        ))
+        sys.stdout.flush()
+        
+        if self.stats:
+            self.stats.snapshot()
+        
+        if self.pool:
+            self.analyze(elapsed)
+    
+    def analyze(self, elapsed):
+        """向分析进程池提交最近一个统计间隔的测量和过电平查找任务，输出已完成的结果（通常是上一个间隔的）"""
+        
+        ring, trigger = self.pool.ring, self.sampler.trigger
+        head = ring.head
+        start = max(head - int(elapsed*self.sampler.rate), head - ring.capacity, 0)
+        self.pool.submit('measure', start, head, self.sampler.rate)
+        self.pool.submit('search', start, head, trigger.level, trigger.hysteresis, min(trigger.source, self.sampler.channels - 1))
+        
+        result = self.pool.result('measure')
+        if result is not None:
+            m, fs = result[1], 100 / full_scale(self.sampler.dtype)
+            for c in range(m['vpp'].shape[0]):
+                print('          CH%d  Vpp %6.2f%%  RMS %6.2f%%  均值 %6.2f%%  频率 %9.2fHz'%(c+1, m['vpp'][c]*fs, m['rms'][c]*fs, m['mean'][c]*fs, m['freq'][c]))
+        
+        result = self.pool.result('search')
+        if result is not None:
+            print('          过电平 %d 次'%result[1].shape[0])
+        sys.stdout.flush()
+    
+    def run(self, duration=0):
+        """采集，duration为总时长（秒），0表示直到被中断"""
+        
+        if not os.path.exists(self.works):
+            os.mkdir(self.works)
+        
+        print('写入 %s'%os.path.join(self.works, self._open()))
+        self.sampler.set_args(recorder=self.recorder)
+        
+        thread = threading.Thread(target=self.sampler.start)
+        thread.setDaemon(True)
+        thread.start()
+        
+        self.t0 = last = time.time()
+        chunks, samples = self.chunks, self.samples
+        
+        try:
+            while thread.is_alive() or not self.sampler.dq.empty():
+                data, marks, t = self.sampler.dq.take(timeout=0.5)
+                if data is not None and self.stats:
+                    self.stats.received(t)
+                
+                # 按采样器入队（即已提交写盘）的数据计数，队列丢弃的数据同样已经录制
+                self.chunks = self.sampler.dq.chunks_in
+                self.samples = self.sampler.dq.samples_in
+                if self.rotate and self.samples - self.filed >= self.rotate*self.sampler.rate:
+                    print('写入 %s'%os.path.join(self.works, self._open()))
+                
+                now = time.time()
+                if now - last >= self.interval:
+                    self.report(now - last, self.chunks - chunks, self.samples - samples)
+                    last, chunks, samples = now, self.chunks, self.samples
+                
+                if duration and now - self.t0 >= duration:
+                    self.sampler.stop()
+        except KeyboardInterrupt:
+            self.sampler.stop()
+        
+        thread.join()
+        self.sampler.set_args(recorder=None)
+        self.recorder.close()
+        self.report(time.time() - self.t0, self.chunks, self.samples)
+
+def main(argv=None):
+    """命令行入口"""
+    
+    parser = argparse.ArgumentParser(description='无界面音频采集：持续写盘，按时长切分文件')
+    parser.add_argument('-o', '--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'), help='数据目录')
+    parser.add_argument('-r', '--rate', type=int, default=44100, help='采样频率，声卡通常支持%s'%'、'.join(str(rate) for rate in RATES))
+    parser.add_argument('--sample-format', choices=list(FORMATS), default='int16', help='样本格式：int16、int24（存放在int32中）或float32')
+    parser.add_argument('--chunk', type=int, default=0, help='数据块大小（数据点数），0表示按采样频率自适应（约100ms）')
+    parser.add_argument('-c', '--channels', type=int, default=1, help='通道数')
+    parser.add_argument('-d', '--duration', type=float, default=0, help='采集时长（秒），0表示直到Ctrl+C')
+    parser.add_argument('--rotate', type=float, default=3600, help='每个文件的时长（秒），0表示不切分')
+    parser.add_argument('--interval', type=float, default=5, help='统计输出间隔（秒）')
+    parser.add_argument('--stats', help='运行统计日志文件（JSON Lines），每个统计间隔追加一行')
+    parser.add_argument('--policy', choices=ChunkQueue.POLICIES, default='drop', help='统计用数据队列满时的策略（录制在入队之前写盘，不受影响）：drop - 丢弃最早的数据块，block - 等待消费者（声卡回调中同drop），merge - 合并数据块')
+    parser.add_argument('-f', '--format', choices=['osc', 'npy', 'wav', 'flac'], default='osc', help='文件格式：osc - 分块压缩的录音文件，npy - 未压缩的NumPy数组，wav、flac - 音频文件（flac需要安装soundfile）')
+    parser.add_argument('--filter', action='append', choices=list(PRESETS), default=[], help='滤波器，可重复指定：highpass - 5Hz高通，lowpass - 1kHz低通，notch50、notch60 - 工频及其谐波陷波')
+    parser.add_argument('--workers', type=int, default=0, help='分析进程数：每个统计间隔在工作进程中测量并查找过电平，0表示不分析')
+    parser.add_argument('-t', '--trigger', action='store_true', help='触发模式：只保存以触发点对齐的数据段')
+    parser.add_argument('--level', type=int, default=16, help='触发电平（以int16满量程32768为基准，按样本格式换算）')
+    parser.add_argument('--hysteresis', type=int, default=8, help='触发迟滞（同触发电平）')
+    parser.add_argument('--edge', type=int, choices=[0, 1, 2], default=0, help='触发沿：0 - 上升沿，1 - 下降沿，2 - 双沿')
+    parser.add_argument('--pre', type=float, default=0.25, help='预触发深度（占数据段长度的比例）')
+    parser.add_argument('--holdoff', type=float, default=0, help='触发释抑时间（毫秒）')
+    parser.add_argument('--length', type=float, default=32, help='触发数据段长度（毫秒）')
+    parser.add_argument('--source', type=int, default=0, help='触发源通道')
+    parser.add_argument('--signal', choices=SignalSource.KINDS, help='以合成信号代替声卡输入')
+    parser.add_argument('--freq', type=float, default=50, help='合成信号频率（Hz）')
+    parser.add_argument('--replay', help='以回放.osc、.npy、WAV或FLAC文件代替声卡输入')
+    parser.add_argument('--speed', type=float, default=1, help='合成信号或回放的倍速，0表示不限速')
+    args = parser.parse_args(argv)
+    
+    if args.replay:
+        feed = ReplaySource(args.replay, speed=args.speed, rate=args.rate)
+    elif args.signal:
+        feed = SignalSource(args.signal, freq=args.freq, speed=args.speed)
+    else:
+        feed = None
+    
+    sampler = AudioSampler(ChunkQueue(policy=args.policy), rate=args.rate, callback=True, channels=args.channels, input=feed, format=args.sample_format, chunk=args.chunk)
+    
+    # 触发电平和迟滞以int16满量程为基准，按实际的样本格式换算；释抑时间和数据段长度按实际的采样频率（回放文件自带）换算
+    scale = full_scale(FORMATS[feed and feed.format or args.sample_format]) / 32768
+    rate = feed and feed.rate or args.rate
+    sampler.set_args(
+        throughput  = True,
+        filters     = args.filter,
+        mode        = 0 if args.trigger else 1,
+        level       = args.level*scale,
+        hysteresis  = args.hysteresis*scale,
+        edge        = args.edge,
+        pre         = args.pre,
+        holdoff     = int(args.holdoff*rate/1000),
+        length      = int(args.length*rate/1000),
+        source      = args.source
+    )
+    
+    pool = None
+    if args.workers:
+        pool = AnalysisPool(args.workers)
+        pool.attach(SharedRing())
+        sampler.set_args(ring=pool.ring)
+    
+    try:
+        Capture(sampler, args.output, rotate=args.rotate, interval=args.interval, fmt=args.format, stats=args.stats, pool=pool).run(args.duration)
+    finally:
+        if pool:
+            pool.close()
+            pool.ring.close()
+
+if __name__ == '__main__':
+    main()
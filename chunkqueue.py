@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+import collections
+import numpy as np
+
+class ChunkQueue:
+    """有界数据块队列：生产者（采样线程）把数据块复制进预分配的环形缓冲区，消费者一次取出全部积压的数据
+    
+    队列中的数据块在缓冲区中首尾相接，取出时合并为一个形状为(通道数, 数据点数)的数组，只复制一次；
+    内存占用由容量决定，消费者停顿（如弹出模态对话框）之后也只需追加一次就能追上。缓冲区满时的策略：
+        block - 生产者等待消费者取走数据，超过timeout秒仍无空间时丢弃最早的数据块；放入时指定不等待（如在声卡回调中）则同drop
+        drop  - 丢弃最早的数据块，显示立即追上最新的数据；录制器在入队之前写盘，录制的数据不受影响
+        merge - 相邻的无标记数据块合并为一项，项数不随积压增长；缓冲区满时同drop
+    带标记的数据块（如触发数据段）不与其它数据块合并，取出时连同标记一起返回。
+    """
+    
+    POLICIES = ('block', 'drop', 'merge')
+    
+    def __init__(self, capacity=262144, items=1024, policy='drop', timeout=1.0, channels=1, dtype=np.int16):
+        """构造函数，capacity为每个通道的容量（数据点数），items为最多的项数"""
+        
+        self.capacity = capacity                    # 容量（数据点数），放入更长的数据块时扩大
+        self.maxitems = items                       # 最多的项数
+        self.policy = policy                        # 缓冲区满时的策略
+        self.timeout = timeout                      # block策略下最长的等待时间（秒）
+        self.dtype = np.dtype(dtype)                # 数据类型
+        self.cond = threading.Condition()           # 生产者与消费者之间的锁和通知
+        self.buf = None                             # 环形缓冲区
+        self.reset(channels)
+    
+    def reset(self, channels=None, dtype=None):
+        """清空队列和计数，按通道数和数据类型重新分配缓冲区"""
+        
+        with self.cond:
+            self.channels = channels or self.channels # 通道数
+            self.dtype = np.dtype(dtype or self.dtype) # 数据类型
+            if self.buf is None or self.buf.shape != (self.channels, self.capacity) or self.buf.dtype != self.dtype:
+                self.buf = np.empty((self.channels, self.capacity), dtype=self.dtype)
+            
+            self.items = collections.deque()        # 队列中各项的[起点, 数据点数, 标记, 入队时刻, 数据块数]，起点为写入计数
+            self.head = 0                           # 已写入的数据点数
+            self.tail = 0                           # 队列中最早数据点的写入计数
+            self.chunks_in = 0                      # 放入的数据块数
+            self.samples_in = 0                     # 放入的数据点数
+            self.chunks_out = 0                     # 取出的数据块数
+            self.samples_out = 0                    # 取出的数据点数
+            self.dropped = 0                        # 丢弃的数据块数
+            self.lost = 0                           # 丢弃的数据点数
+            self.merged = 0                         # 合并到上一项的数据块数
+            self.high = 0                           # 项数的高水位
+            self.cond.notify_all()
+    
+    def qsize(self):
+        """返回队列中的项数"""
+        
+        return len(self.items)
+    
+    def empty(self):
+        """队列是否为空"""
+        
+        return not self.items
+    
+    def peak(self):
+        """返回项数的高水位，并复位为当前项数（与生产者更新高水位互斥）"""
+        
+        with self.cond:
+            high, self.high = self.high, len(self.items)
+        
+        return high
+    
+    def _read(self, pos, n):
+        """复制出写入计数为[pos, pos+n)的数据"""
+        
+        cap = self.buf.shape[1]
+        i = pos % cap
+        j = min(n, cap - i)
+        data = np.empty((self.channels, n), dtype=self.dtype)
+        data[:, :j] = self.buf[:, i:i+j]
+        data[:, j:] = self.buf[:, :n-j]
+        
+        return data
+    
+    def _write(self, pos, data):
+        """将数据写入写入计数为pos处，在缓冲区末尾回绕"""
+        
+        cap = self.buf.shape[1]
+        n = data.shape[1]
+        i = pos % cap
+        j = min(n, cap - i)
+        self.buf[:, i:i+j] = data[:, :j]
+        self.buf[:, :n-j] = data[:, j:]
+    
+    def _grow(self, n):
+        """扩大容量以容纳n个数据点的数据块，保留队列中的数据"""
+        
+        data = self._read(self.tail, self.head - self.tail)
+        self.capacity = max(n, 2*self.capacity)
+        self.buf = np.empty((self.channels, self.capacity), dtype=self.dtype)
+        self._write(self.tail, data)
+    
+    def _mergeable(self, tag):
+        """数据块能否合并到最后一项"""
+        
+        return self.policy == 'merge' and tag is None and bool(self.items) and self.items[-1][2] is None
+    
+    def _full(self, n, tag):
+        """再放入n个数据点的数据块是否超出容量或项数"""
+        
+        if self.head - self.tail + n > self.buf.shape[1]:
+            return True
+        
+        return len(self.items) >= self.maxitems and not self._mergeable(tag)
+    
+    def put(self, data, tag=None, wait=True):
+        """复制放入一个形状为(通道数, 数据点数)的数据块，tag为随数据块一起取出的标记
+        
+        wait为False时不等待消费者：声卡回调在PortAudio线程中执行，等待会导致输入溢出，block策略此时同drop。
+        """
+        
+        n = data.shape[1]
+        with self.cond:
+            if n > self.buf.shape[1]:
+                self._grow(n)
+            
+            deadline = time.perf_counter() + self.timeout
+            while self._full(n, tag):
+                remain = deadline - time.perf_counter()
+                if self.policy == 'block' and wait and remain > 0:
+                    self.cond.wait(remain)
+                    continue
+                
+                item = self.items.popleft()
+                self.tail = self.items[0][0] if self.items else self.head
+                self.dropped += item[4]
+                self.lost += item[1]
+            
+            self._write(self.head, data)
+            if self._mergeable(tag):
+                self.items[-1][1] += n
+                self.items[-1][4] += 1
+                self.merged += 1
+            else:
+                self.items.append([self.head, n, tag, time.perf_counter(), 1])
+            
+            self.head += n
+            self.chunks_in += 1
+            self.samples_in += n
+            self.high = max(self.high, len(self.items))
+            self.cond.notify_all()
+    
+    def take(self, timeout=0):
+        """取出全部积压的数据，队列为空时最多等待timeout秒
+        
+        返回(数据, 标记列表, 最早的入队时刻)，标记列表为带标记的各数据块的(在数据中的位置, 数据点数, 标记)；
+        没有数据时返回(None, [], None)。
+        """
+        
+        with self.cond:
+            if not self.items and timeout:
+                self.cond.wait(timeout)
+            if not self.items:
+                return None, list(), None
+            
+            data = self._read(self.tail, self.head - self.tail)
+            marks = [(start - self.tail, n, tag) for start, n, tag, t, count in self.items if tag is not None]
+            t = self.items[0][3]
+            
+            self.chunks_out += sum(item[4] for item in self.items)
+            self.samples_out += data.shape[1]
+            self.items.clear()
+            self.tail = self.head
+            self.cond.notify_all()
+        
+        return data, marks, t
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from store import DataStore
+
+class Envelope:
+    """多分辨率最大最小值包络金字塔：第i层每个数据块覆盖 base*2^i 个数据点"""
+    
+    def __init__(self, store, base=8):
+        """构造函数"""
+        
+        self.store = store                          # 采样数据存储器
+        self.base = base                            # 第0层数据块大小
+        self.levels = list()                        # 各层的(最小值, 最大值)存储器
+        self.dropped = store.dropped                # 已同步的丢弃数据点数
+    
+    def _level(self, i):
+        """返回第i层，不存在则创建"""
+        
+        while len(self.levels) <= i:
+            dtype, channels = self.store.dtype, self.store.channels
+            self.levels.append((DataStore(dtype, 1024, channels=channels), DataStore(dtype, 1024, channels=channels)))
+        
+        return self.levels[i]
+    
+    def clear(self):
+        """清除全部包络"""
+        
+        self.levels = list()
+        self.dropped = self.store.dropped
+    
+    def update(self):
+        """将新追加的数据并入金字塔
+        
+        存储器映射自磁盘文件时不建立金字塔，以免读遍整个文件，此时按时间窗口直接读取原始数据。
+        """
+        
+        if self.store.mapped:
+            self.clear()
+            return
+        
+        # 存储器丢弃了最早的数据或被清空时，重建金字塔
+        if self.store.dropped != self.dropped or self.levels and len(self.levels[0][0])*self.base > len(self.store):
+            self.clear()
+        
+        # 第0层由原始数据生成
+        mins, maxs = self._level(0)
+        done, total = len(mins), len(self.store)//self.base
+        if total > done:
+            blocks = self.store[done*self.base:total*self.base].reshape(self.store.channels, -1, self.base)
+            mins.append(blocks.min(axis=2))
+            maxs.append(blocks.max(axis=2))
+        
+        # 其余各层由下一层两两合并生成，某层没有新增数据块时更高的层也不会变化
+        i = 0
+        while len(self.levels[i][0]) >= 2:
+            lmins, lmaxs = self.levels[i]
+            mins, maxs = self._level(i+1)
+            done, total = len(mins), len(lmins)//2
+            if total == done:
+                break
+            
+            mins.append(np.minimum(lmins[2*done:2*total:2], lmins[2*done+1:2*total:2]))
+            maxs.append(np.maximum(lmaxs[2*done:2*total:2], lmaxs[2*done+1:2*total:2]))
+            i += 1
+    
+    def window(self, start, stop, width):
+        """返回[start, stop)区间内的绘图点：相对start的数据点偏移和各通道对应的数值
+        
+        区间覆盖的数据点数超过2倍宽度时，按像素列返回最小值和最大值，每个通道不超过2*width个点。
+        """
+        
+        stop = min(stop, len(self.store))
+        n = stop - start
+        width = max(int(width), 1)
+        
+        if n <= 0:
+            return np.array([], dtype=np.float64), np.empty((self.store.channels, 0), dtype=self.store.dtype)
+        
+        if n <= 2*width:
+            return np.arange(n, dtype=np.float64), self.store[start:stop]
+        
+        # 选择块大小不超过每像素数据点数的最粗一层
+        i = int(np.floor(np.log2(n/width/self.base))) if n/width >= self.base else -1
+        i = min(i, len(self.levels)-1)
+        while i >= 0 and len(self.levels[i][0]) == 0:
+            i -= 1
+        
+        # 数据文件自带分块摘要时，每像素覆盖的数据点多于摘要分辨率则直接使用摘要，不解压数据
+        summary = getattr(self.store.buf, 'summary', None)
+        if i < 0 and summary and n/width >= self.store.buf.step:
+            mins, maxs, pos = summary(start, stop, n/width)
+        elif i < 0:
+            mins = maxs = self.store[start:stop]
+            pos = np.arange(start, stop)
+        else:
+            size = self.base * 2**i
+            lmins, lmaxs = self.levels[i]
+            b0, b1 = start//size, min(-(-stop//size), len(lmins))
+            tail = max(b1*size, start)
+            mins = np.concatenate((lmins[b0:b1], self.store[tail:stop]), axis=1)
+            maxs = np.concatenate((lmaxs[b0:b1], self.store[tail:stop]), axis=1)
+            pos = np.concatenate((np.arange(b0, b1)*size, np.arange(tail, stop)))
+        
+        # 按像素列分组归并
+        px = np.clip((pos - start) * width // n, 0, width-1)
+        idx = np.flatnonzero(np.diff(px, prepend=-1))
+        x = np.repeat(px[idx] * n / width, 2)
+        y = np.empty((mins.shape[0], 2*idx.shape[0]), dtype=mins.dtype)
+        y[:, 0::2] = np.minimum.reduceat(mins, idx, axis=1)
+        y[:, 1::2] = np.maximum.reduceat(maxs, idx, axis=1)
+        
+        return x, y
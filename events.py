@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import time
+import numpy as np
+
+class EventIndex:
+    """触发事件索引：触发模式下每次采集的数据段一条记录，记录数据段的位置、触发时刻和摘要，不复制数据
+    
+    记录按数据段位置递增存放在容量按几何级数增长的结构化数组中，按序号定位、上一个、下一个都是O(1)。
+    位置是数据段在数据流中的绝对位置，即DataStore中的位置加上已丢弃的数据点数，数据存储器丢弃最早的数据后索引仍然有效。
+    """
+    
+    def __init__(self, channels=1, capacity=1024):
+        """构造函数"""
+        
+        self.channels = channels                    # 通道数
+        self.dtype = np.dtype([
+            ('start', '<i8'),                       # 数据段首个数据点在数据流中的位置
+            ('length', '<i4'),                      # 数据段长度
+            ('trigger', '<i8'),                     # 触发点在采集数据源中的位置
+            ('offset', '<i4'),                      # 触发点在数据段中的偏移（预触发数据点数）
+            ('time', '<f8'),                        # 触发时刻（Unix时间戳）
+            ('min', '<f8', (channels,)),            # 各通道最小值
+            ('max', '<f8', (channels,)),            # 各通道最大值
+            ('rms', '<f8', (channels,))             # 各通道均方根值
+        ])
+        self.buf = np.zeros(capacity, dtype=self.dtype) # 预分配的记录数组
+        self.first = 0                              # 首个有效记录，之前的记录对应的数据已被丢弃
+        self.size = 0                               # 记录数
+        self.current = -1                           # 当前事件的序号，-1表示尚未定位
+    
+    def __len__(self):
+        """返回有效的事件数"""
+        
+        return self.size - self.first
+    
+    def __getitem__(self, i):
+        """返回第i个有效事件的记录"""
+        
+        return self.buf[self.first + i]
+    
+    def records(self):
+        """返回全部有效记录（记录数组的视图）"""
+        
+        return self.buf[self.first:self.size]
+    
+    def add(self, start, seg, trigger, offset, t):
+        """添加一个事件：seg为数据段（形状为(通道数, 数据点数)的视图），只计算摘要，不保存数据"""
+        
+        # 已满时先回收被丢弃事件占用的空间，仍不足一半空闲时容量加倍
+        if self.size == self.buf.shape[0]:
+            n = len(self)
+            buf = self.buf if 2*n <= self.buf.shape[0] else np.zeros(2*self.buf.shape[0], dtype=self.dtype)
+            buf[:n] = self.buf[self.first:self.size]
+            self.buf, self.first, self.size = buf, 0, n
+        
+        x = seg.astype(np.float64)
+        self.buf[self.size] = (start, seg.shape[1], trigger, offset, t, x.min(axis=1), x.max(axis=1), np.sqrt(np.mean(x*x, axis=1)))
+        self.size += 1
+    
+    def trim(self, dropped):
+        """丢弃数据段起点已被数据存储器丢弃的事件"""
+        
+        first = self.first + int(np.searchsorted(self.buf['start'][self.first:self.size], dropped))
+        self.current = max(self.current - (first - self.first), -1)
+        self.first = first
+    
+    def go(self, i):
+        """定位到第i个事件（超出范围时取首个或最后一个），返回事件序号，没有事件时返回-1"""
+        
+        if len(self) == 0:
+            return -1
+        
+        self.current = min(max(i, 0), len(self) - 1)
+        
+        return self.current
+    
+    def next(self):
+        """定位到下一个事件"""
+        
+        return self.go(self.current + 1)
+    
+    def prev(self):
+        """定位到上一个事件"""
+        
+        return self.go(self.current - 1 if self.current >= 0 else len(self) - 1)
+    
+    def clear(self):
+        """清除全部事件"""
+        
+        self.first = 0
+        self.size = 0
+        self.current = -1
+    
+    def export(self, path, dropped=0):
+        """将事件表导出为CSV文件，位置为数据段在当前数据中的位置"""
+        
+        head = ['序号', '时刻', '触发点', '位置', '长度', '预触发']
+        for c in range(self.channels):
+            head.extend(['CH%d最小值'%(c+1), 'CH%d最大值'%(c+1), 'CH%d均方根'%(c+1)])
+        
+        with open(path, 'w', newline='', encoding='utf-8-sig') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(head)
+            for i, item in enumerate(self.records()):
+                t = float(item['time'])
+                row = [i+1, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t)) + '.%06d'%int((t % 1)*1e6), int(item['trigger']), int(item['start']) - dropped, int(item['length']), int(item['offset'])]
+                for c in range(self.channels):
+                    row.extend(['%.1f'%item['min'][c], '%.1f'%item['max'][c], '%.2f'%item['rms'][c]])
+                writer.writerow(row)
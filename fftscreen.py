@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+import wx
+import numpy as np
+
+from screen import Screen
+from spectrum import Spectrum
+from formats import full_scale
+
+class SpectrumScreen(wx.Panel):
+    """频谱显示屏幕"""
+    
+    def __init__(self, parent, rate=44100, channels=1, size=(-1, 240)):
+        """构造函数"""
+        
+        wx.Panel.__init__(self, parent, -1, size=size, style=wx.SUNKEN_BORDER)
+        self.SetBackgroundColour(wx.Colour(0, 0, 0))
+        self.SetDoubleBuffered(True)
+        
+        self.spectrum = Spectrum(rate=rate, channels=channels) # 频谱分析器
+        self.log = True                             # 频率轴是否为对数坐标
+        self.fmin = 10                              # 对数坐标下的最低频率
+        self.top = 0                                # 幅度轴上限（dBFS）
+        self.bottom = -120                          # 幅度轴下限（dBFS）
+        self.pool = None                            # 分析进程池，非None时频谱由工作进程计算
+        self.scrsize = self.GetSize()               # 屏幕宽度和高度
+        self.args = self._layout()                  # 绘图参数
+        self.points = self._update()                # 各通道的频谱折线
+        self.font = wx.Font(9, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL, False, 'Courier New')
+        
+        self.Bind(wx.EVT_SIZE, self.on_size)
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+    
+    def _layout(self):
+        """计算频点到像素列的映射和网格，只在尺寸、采样频率或坐标类型变化时重新计算"""
+        
+        left, right, top, bottom = 60, self.scrsize[0] - 20, 10, self.scrsize[1] - 25
+        w = max(right - left, 1)
+        freqs = self.spectrum.freqs
+        fmax = self.spectrum.rate / 2
+        
+        if self.log:
+            sel = np.flatnonzero(freqs >= self.fmin)
+            x = (np.log10(freqs[sel]) - np.log10(self.fmin)) / (np.log10(fmax) - np.log10(self.fmin))
+            grid = [f for f in (10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000) if self.fmin <= f <= fmax]
+            gx = [left + w*(np.log10(f) - np.log10(self.fmin))/(np.log10(fmax) - np.log10(self.fmin)) for f in grid]
+        else:
+            sel = np.arange(freqs.shape[0])
+            x = freqs / fmax
+            grid = [fmax*i/10 for i in range(11)]
+            gx = [left + w*i/10 for i in range(11)]
+        
+        # 同一像素列内的频点取最大值，每个通道不超过宽度个点
+        px = np.minimum((x*w).astype(int), w - 1)
+        idx = np.flatnonzero(np.diff(px, prepend=-1))
+        
+        return {
+            'left': left, 'right': right, 'top': top, 'bottom': bottom,
+            'sel': sel, 'idx': idx, 'x': left + px[idx],
+            'grid': list(zip(gx, ['%gk'%(f/1000) if f >= 1000 else '%g'%f for f in grid]))
+        }
+    
+    def _update(self):
+        """由平均后的频谱计算各通道的折线"""
+        
+        if self.spectrum.frames == 0:
+            return list()
+        
+        db = self.spectrum.decibel()[:, self.args['sel']]
+        db = np.maximum.reduceat(db, self.args['idx'], axis=1)
+        h = self.args['bottom'] - self.args['top']
+        y = self.args['top'] + h * (self.top - db) / (self.top - self.bottom)
+        y = np.clip(y, self.args['top'], self.args['bottom'])
+        
+        return [np.stack((self.args['x'], item), axis=1) for item in y]
+    
+    def on_size(self, evt):
+        """响应窗口大小变化"""
+        
+        self.scrsize = self.GetSize()
+        self.args = self._layout()
+        self.points = self._update()
+        self.Refresh()
+    
+    def on_paint(self, evt):
+        """响应重绘事件"""
+        
+        dc = wx.PaintDC(self)
+        self.plot(dc)
+    
+    def append_data(self, data):
+        """送入数据，有新的频谱帧时重绘；隐藏时不计算"""
+        
+        if not self.IsShown():
+            return
+        
+        if self.pool:
+            self._poll()
+        elif self.spectrum.feed(data):
+            self.points = self._update()
+            self.Refresh()
+    
+    def set_pool(self, pool):
+        """设置分析进程池（None表示在界面线程中计算频谱）"""
+        
+        self.pool = pool
+    
+    def _poll(self):
+        """向分析进程池提交共享内存中最新数据的频谱任务（前一个未完成时跳过），取回已完成的结果并重绘"""
+        
+        sp = self.spectrum
+        self.pool.submit('spectrum', self.pool.ring.head, sp.rate, sp.nfft, 8, sp.average, sp.full)
+        
+        result = self.pool.result('spectrum')
+        if result is not None and result[1].shape == sp.avg.shape:
+            sp.avg[:] = result[1]
+            sp.frames = max(sp.frames, 1)
+            self.points = self._update()
+            self.Refresh()
+    
+    def set_log(self, log):
+        """设置频率轴为对数或线性坐标"""
+        
+        self.log = log
+        self.args = self._layout()
+        self.points = self._update()
+        self.Refresh()
+    
+    def set_rate(self, rate):
+        """设置采样频率"""
+        
+        self.spectrum.set_args(rate=rate)
+        self.args = self._layout()
+        self.points = self._update()
+        self.Refresh()
+    
+    def set_channels(self, channels):
+        """设置通道数"""
+        
+        self.spectrum.set_args(channels=channels)
+        self.points = self._update()
+        self.Refresh()
+    
+    def set_format(self, dtype):
+        """设置样本的数据类型，频谱幅度以其满量程为0dB"""
+        
+        self.spectrum.set_args(full=full_scale(dtype))
+        self.points = self._update()
+        self.Refresh()
+    
+    def clear(self):
+        """清除频谱"""
+        
+        self.spectrum.reset()
+        self.points = self._update()
+        self.Refresh()
+    
+    def plot(self, dc):
+        """绘制屏幕"""
+        
+        left, right, top, bottom = self.args['left'], self.args['right'], self.args['top'], self.args['bottom']
+        
+        # 绘制网格
+        dc.SetPen(wx.Pen(wx.Colour(64,64,64), 1))
+        dc.DrawLineList([(x, top, x, bottom) for x, label in self.args['grid']])
+        levels = range(self.top, self.bottom - 1, -20)
+        dc.DrawLineList([(left, top + (bottom-top)*(self.top-v)/(self.top-self.bottom), right, top + (bottom-top)*(self.top-v)/(self.top-self.bottom)) for v in levels])
+        
+        # 绘制频谱
+        for i, points in enumerate(self.points):
+            dc.SetPen(wx.Pen(wx.Colour(*Screen.COLOURS[i%len(Screen.COLOURS)]), 1))
+            dc.DrawLines(points)
+        
+        # 标注
+        dc.SetTextForeground(wx.Colour(224,255,255))
+        dc.SetFont(self.font)
+        
+        for x, label in self.args['grid']:
+            dc.DrawText(label.center(6), x - 20, bottom + 5)
+        
+        for v in levels:
+            dc.DrawText(('%ddB'%v).rjust(7), 2, top + (bottom-top)*(self.top-v)/(self.top-self.bottom) - 7)
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import collections
+import numpy as np
+
+from lazy import BlockFile
+from formats import limits
+
+signal = False                                      # scipy.signal模块，首次滤波时导入；False表示尚未导入，None表示未安装
+
+def butterworth_q(order):
+    """返回order阶巴特沃斯滤波器各二阶节的品质因数"""
+    
+    return [1 / (2*np.cos(np.pi*(2*k + 1)/(2*order))) for k in range(order//2)]
+
+PRESETS = {                                         # 预设滤波器 → 各二阶节的(类型, 频率, 品质因数)
+    'highpass': [('highpass', 5.0, q) for q in butterworth_q(4)], # 4阶高通，滤除直流和缓慢漂移
+    'lowpass': [('lowpass', 1000.0, q) for q in butterworth_q(4)], # 4阶低通，滤除高频噪声
+    'notch50': [('notch', 50.0*k, 30.0) for k in (1, 2, 3)], # 50Hz工频及其2、3次谐波陷波
+    'notch60': [('notch', 60.0*k, 30.0) for k in (1, 2, 3)]  # 60Hz工频及其2、3次谐波陷波
+}
+LABELS = {'highpass': '高通5Hz', 'lowpass': '低通1kHz', 'notch50': '50Hz陷波', 'notch60': '60Hz陷波'} # 界面上的名称
+
+def biquad(kind, freq, rate, q=0.7071):
+    """按RBJ音频均衡器公式设计二阶节，返回归一化的[b0, b1, b2, 1, a1, a2]"""
+    
+    w0 = 2*np.pi*min(freq, 0.49*rate)/rate
+    alpha, cs = np.sin(w0)/(2*q), np.cos(w0)
+    
+    if kind == 'highpass':
+        b = [(1 + cs)/2, -(1 + cs), (1 + cs)/2]
+    elif kind == 'lowpass':
+        b = [(1 - cs)/2, 1 - cs, (1 - cs)/2]
+    elif kind == 'notch':
+        b = [1, -2*cs, 1]
+    else:
+        raise ValueError('不支持的滤波器类型：%s'%kind)
+    
+    a0 = 1 + alpha
+    
+    return np.array(b + [a0, -2*cs, 1 - alpha]) / a0
+
+class FilterChain:
+    """级联二阶节（biquad）IIR滤波器：逐块处理形状为(通道数, 数据点数)的数据，滤波状态跨块延续
+    
+    状态采用直接II型转置结构，形状为(二阶节数, 通道数, 2)，与scipy.signal.sosfilt的zi一致。安装了scipy时由sosfilt逐块滤波；
+    否则将每个二阶节写成状态空间形式，块内的零状态响应用FFT卷积、零输入响应和块末状态用矩阵幂一次算出，都是整块的向量运算。
+    """
+    
+    LENGTHS = 4                                     # 无scipy时每个二阶节缓存矩阵的块长度个数
+    
+    def __init__(self, rate=44100, channels=1, filters=()):
+        """构造函数，filters为预设滤波器名称（见PRESETS）的列表"""
+        
+        self.rate = rate                            # 采样频率
+        self.channels = channels                    # 通道数
+        self.filters = list(filters)                # 启用的预设滤波器
+        self.changes = None                         # 待生效的参数，在下一个数据块开始处理时生效
+        self.lock = threading.Lock()                # 保护矩阵缓存（文件的读取线程与预读线程共用一个滤波器）
+        self.design()
+    
+    def design(self):
+        """按当前参数设计各二阶节，并复位状态"""
+        
+        rows = [biquad(kind, freq, self.rate, q) for name in self.filters for kind, freq, q in PRESETS[name]]
+        self.sos = np.array(rows).reshape(-1, 6)    # 各二阶节的系数，每行为[b0, b1, b2, 1, a1, a2]
+        self.kernels = collections.OrderedDict()    # (二阶节, 块长度) → 无scipy时整块计算所用的矩阵，最近使用的在末尾
+        self.zi = None                              # 滤波状态，None表示按下一个数据块的首个数据点初始化
+    
+    def set_args(self, **kwds):
+        """设置参数（线程安全：参数在下一个数据块开始处理时生效，并复位状态）"""
+        
+        changes = dict(self.changes or {})
+        changes.update(kwds)
+        self.changes = changes
+    
+    def _apply(self):
+        """使待生效的参数生效"""
+        
+        changes, self.changes = self.changes, None
+        for key in ('rate', 'channels', 'filters'):
+            if key in changes:
+                setattr(self, key, changes[key])
+        
+        self.design()
+    
+    def steady(self, x0):
+        """返回输入恒为x0（各通道的首个数据点）时的稳态滤波状态，避免起始处的阶跃响应"""
+        
+        zi = np.empty((self.sos.shape[0], x0.shape[0], 2))
+        u = x0.astype(np.float64)
+        for i, (b0, b1, b2, a0, a1, a2) in enumerate(self.sos):
+            y = u * (b0 + b1 + b2) / (1 + a1 + a2)
+            zi[i, :, 0] = y - b0*u
+            zi[i, :, 1] = b2*u - a2*y
+            u = y
+        
+        return zi
+    
+    def settling(self, tolerance=1e-7):
+        """返回初始状态的影响衰减到tolerance倍以下所需的数据点数，由各二阶节极点的最大模算出（未启用滤波器时为0）"""
+        
+        if self.sos.shape[0] == 0:
+            return 0
+        
+        r = max(np.abs(np.roots([1, a1, a2])).max() for b0, b1, b2, a0, a1, a2 in self.sos)
+        
+        return int(np.ceil(np.log(tolerance) / np.log(min(r, 1 - 1e-12))))
+    
+    def _kernel(self, i, n):
+        """第i个二阶节处理n个数据点所用的矩阵：冲激响应的频谱、零输入响应、块末状态的转移矩阵和输入权重"""
+        
+        key = (i, n)
+        with self.lock:
+            if key in self.kernels:
+                self.kernels.move_to_end(key)
+                return self.kernels[key]
+        
+        b0, b1, b2, a0, a1, a2 = self.sos[i]
+        a = np.array([[-a1, 1.0], [-a2, 0.0]])      # 状态转移矩阵
+        b = np.array([b1 - a1*b0, b2 - a2*b0])      # 输入对状态的作用
+        
+        # 倍增法计算a的0～n次幂
+        p = np.empty((n + 1, 2, 2))
+        p[0] = np.eye(2)
+        k = 1
+        while k <= n:
+            m = min(k, n + 1 - k)
+            p[k:k+m] = p[:m] @ (p[k-1] @ a)
+            k += m
+        
+        h = np.empty(n)                             # 冲激响应
+        h[0] = b0
+        h[1:] = p[:n-1, 0, :] @ b
+        size = 1 << int(2*n - 1).bit_length()       # FFT长度，不小于线性卷积的长度
+        kernel = (np.fft.rfft(h, size), size, p[:n, 0, :].T.copy(), p[n].T.copy(), (p[n-1::-1] @ b))
+        
+        with self.lock:
+            self.kernels[key] = kernel
+            while len(self.kernels) > self.LENGTHS * self.sos.shape[0]:
+                self.kernels.popitem(last=False)
+        
+        return kernel
+    
+    def _sosfilt(self, x, zi):
+        """对形状为(通道数, 数据点数)的浮点数据滤波，返回输出和块末状态"""
+        
+        global signal
+        if signal is False:
+            try:
+                from scipy import signal
+            except ImportError:
+                signal = None
+        
+        if signal is not None:
+            return signal.sosfilt(self.sos, x, axis=1, zi=zi)
+        
+        n = x.shape[1]
+        zf = np.empty_like(zi)
+        for i in range(self.sos.shape[0]):
+            spec, size, g, t, w = self._kernel(i, n)
+            y = np.fft.irfft(np.fft.rfft(x, size, axis=1) * spec, size, axis=1)[:, :n] + zi[i] @ g
+            zf[i] = zi[i] @ t + x @ w
+            x = y
+        
+        return x, zf
+    
+    def filter(self, data, zi):
+        """以zi为初始状态对数据块滤波，返回与输入数据类型相同的输出（整数削波取整）和块末状态"""
+        
+        x = np.asarray(data, dtype=np.float64)
+        if x.shape[1] == 0 or self.sos.shape[0] == 0:
+            return data, zi
+        
+        y, zf = self._sosfilt(x, zi)
+        if data.dtype.kind != 'f':
+            y = np.round(y)
+        
+        return np.clip(y, *limits(data.dtype)).astype(data.dtype), zf
+    
+    def process(self, data):
+        """对连续数据流中的下一个数据块滤波，返回新数组（未启用滤波器时原样返回）"""
+        
+        if self.changes:
+            self._apply()
+        
+        if self.sos.shape[0] == 0 or data.shape[1] == 0:
+            return data
+        
+        if self.zi is None:
+            self.zi = self.steady(data[:, 0])
+        y, self.zi = self.filter(data, self.zi)
+        
+        return y
+
+class FilteredFile(BlockFile):
+    """滤波后的按块读取的数据文件：读取原文件的数据块时滤波，滤波结果同样由LRU缓存和预读线程管理
+    
+    数据块起点的滤波状态由其之前一段数据（长度按滤波器最慢的衰减算出，初始状态的影响衰减到满量程的1e-7以下）滤波建立，
+    跳转到文件任意位置只需读取有限的几块，不生成整个文件的滤波副本；顺序浏览时沿用前一块的块末状态，每块只滤波一次。
+    """
+    
+    STATES = 64                                     # 保存的数据块起点滤波状态的个数
+    
+    def __init__(self, source, filters, rate=None, cache=64*1048576, ahead=2):
+        """构造函数，source为按块读取的数据文件（如open_file的返回值），filters为预设滤波器名称的列表，rate为不带采样频率的文件（.npy）的采样频率"""
+        
+        BlockFile.__init__(self, source.path, cache, ahead)
+        
+        self.source = source                        # 原数据文件
+        self.rate = getattr(source, 'rate', rate or 44100) # 采样频率
+        self.channels = source.channels             # 通道数
+        self.dtype = source.dtype                   # 数据类型
+        self.block = source.block                   # 每块数据点数
+        self.step = source.step                     # 概览摘要的分辨率（数据点数）
+        self.starts = source.starts                 # 各块首个数据点的位置
+        self.chain = FilterChain(self.rate, self.channels, filters) # 滤波器
+        self.warmup = self.chain.settling()         # 数据块之前用于建立滤波状态的数据点数
+        self.states = collections.OrderedDict()     # 数据块序号 → 该块起点的滤波状态（由前一块读取时得到）
+        self.lock = threading.Lock()                # 读取线程与预读线程之间的锁
+    
+    def _state(self, i):
+        """返回已保存的第i个数据块起点的滤波状态，没有则返回None"""
+        
+        with self.lock:
+            zi = self.states.get(i)
+            if zi is not None:
+                self.states.move_to_end(i)
+            
+            return zi
+    
+    def _save(self, i, zi):
+        """保存第i个数据块起点的滤波状态，只保留最近的STATES个"""
+        
+        with self.lock:
+            self.states[i] = zi
+            self.states.move_to_end(i)
+            while len(self.states) > self.STATES:
+                self.states.popitem(last=False)
+    
+    def _load(self, fp, i):
+        """读取原文件的第i个数据块并滤波
+        
+        起点状态已知（顺序浏览时由前一块得到）时只滤波这一块；否则从其前warmup个数据点所在的数据块开始滤波建立状态，
+        文件开头按首个数据点的稳态初始化。读取一块的计算量有上限，与数据块在文件中的位置无关。
+        """
+        
+        zi = self._state(i)
+        j = i
+        if zi is None:
+            j = max(int(np.searchsorted(self.starts, self.starts[i] - self.warmup, side='right')) - 1, 0)
+            zi = self._state(j)
+        
+        for k in range(j, i + 1):
+            data = self.source._load(fp, k)
+            if zi is None:
+                zi = self.chain.steady(data[:, 0]) if data.shape[1] else np.zeros((self.chain.sos.shape[0], self.channels, 2))
+            data, zi = self.chain.filter(data, zi)
+        
+        self._save(i + 1, zi)
+        
+        return data
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+FORMATS = {                                         # 样本格式 → 内存中的数据类型
+    'int16': np.dtype(np.int16),                    # 16位整数，满量程32768
+    'int24': np.dtype(np.int32),                    # 24位整数，存放在int32中，满量程8388608
+    'float32': np.dtype(np.float32)                 # 32位浮点数，满量程1.0
+}
+RATES = (44100, 48000, 96000, 192000)               # 可选的采样频率
+
+LATENCY = 0.01                                      # 实时显示时每个数据块的目标时长（秒），数据块小则延迟低
+THROUGHPUT = 0.1                                    # 长时间录制时每个数据块的目标时长（秒），数据块大则开销低
+
+def full_scale(dtype):
+    """返回数据类型的满量程：浮点数为1.0，16位整数为32768，32位整数按24位样本计为8388608"""
+    
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return 1.0
+    
+    return 2**(8*min(dtype.itemsize, 3) - 1)
+
+def limits(dtype):
+    """返回数据类型可表示的样本范围(最小值, 最大值)"""
+    
+    full = full_scale(dtype)
+    
+    return (-full, full) if np.dtype(dtype).kind == 'f' else (-full, full - 1)
+
+def format_of(dtype):
+    """返回与数据类型对应的样本格式名称"""
+    
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return 'float32'
+    
+    return 'int16' if dtype.itemsize <= 2 else 'int24'
+
+def convert(data, dtype):
+    """将数据按满量程换算为另一种数据类型，超出范围的样本削波"""
+    
+    dtype = np.dtype(dtype)
+    data = np.asarray(data)
+    if data.dtype == dtype:
+        return data
+    
+    y = data * (full_scale(dtype) / full_scale(data.dtype))
+    if dtype.kind != 'f':
+        y = np.round(y)
+    
+    return np.clip(y, *limits(dtype)).astype(dtype)
+
+def unpack24(buf, channels=1):
+    """将按帧交织的3字节小端整数解包为形状为(通道数, 数据点数)的int32数组"""
+    
+    raw = np.frombuffer(buf, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    data = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+    data = np.where(data & 0x800000, data - 0x1000000, data).astype(np.int32)
+    
+    return data.reshape(-1, channels).T
+
+def pack24(data):
+    """将形状为(通道数, 数据点数)的24位样本按帧交织打包为3字节小端整数"""
+    
+    frames = np.ascontiguousarray(np.reshape(data, (np.shape(data)[0], -1)).T, dtype='<i4')
+    
+    return frames.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+def chunk_size(rate, seconds):
+    """返回时长最接近seconds的数据块大小（2的幂，64～65536个数据点）"""
+    
+    n = 2**int(round(np.log2(max(rate*seconds, 1))))
+    
+    return min(max(n, 64), 65536)
@@ -3,6 +3,8 @@
 import wx
 import numpy as np
 
+from sprite import SpritePanel
+
 wxEVT_KNOB_ANGLE_CHANGED = wx.NewEventType()
 EVT_KNOB_ANGLE_CHANGED = wx.PyEventBinder(wxEVT_KNOB_ANGLE_CHANGED, 1)
 
@@ -24,13 +26,15 @@ class KnobEvent(wx.CommandEvent):
 
         return self._value
 
-class Knob(wx.Panel):
-    """旋钮"""
+class Knob(SpritePanel):
+    """旋钮：取0～100的整数值，每个值的外观预先合成为一张位图并缓存，拖动时每帧最多发出一次值变化事件"""
+    
+    EVENT = (KnobEvent, wxEVT_KNOB_ANGLE_CHANGED)
     
     def __init__(self, parent, id=wx.ID_ANY, value=50, pos=wx.DefaultPosition, size=(150,150)):
         """构造函数"""
         
-        wx.Panel.__init__(self, parent, id, pos, size, style=wx.NO_FULL_REPAINT_ON_RESIZE)
+        SpritePanel.__init__(self, parent, id, int(round(value)), pos, size)
         
         self.bmp_wp = wx.Bitmap('res/wpoint.png', wx.BITMAP_TYPE_ANY)
         self.bmp_bp = wx.Bitmap('res/bpoint.png', wx.BITMAP_TYPE_ANY)
@@ -38,17 +42,15 @@ class Knob(wx.Panel):
         self.bmp_core = wx.Bitmap('res/knob.png', wx.BITMAP_TYPE_ANY)
         
         self._state = 0
-        self._value = value
         self._angle = -60, 240
         self.args = self._update()
         self.Refresh()
         
         self.Bind(wx.EVT_SIZE, self.on_size)
-        self.Bind(wx.EVT_PAINT, self.on_paint)
         self.Bind(wx.EVT_MOUSE_EVENTS, self.on_mouse_event)
     
     def _update(self):
-        """更新重绘参数"""
+        """更新重绘参数（只与控件尺寸有关）"""
         
         w, h = self.GetSize()
         r = min(w, h)/2 - 5
@@ -58,27 +60,48 @@ class Knob(wx.Panel):
         x = r * np.cos(theta) + origin[0]
         y = -r * np.sin(theta) + origin[1]
         
-        a = np.radians(self._angle[1] - (self._angle[1] - self._angle[0]) * self._value / 100)
+        return {'points': np.stack((x, y), axis=1), 'origin': origin, 'r': r, 'theta': theta}
+    
+    def _sprite(self, value):
+        """合成值为value时控件的完整外观"""
+        
+        w, h = self.GetSize()
+        origin, r, points = self.args['origin'], self.args['r'], self.args['points']
+        
+        a = np.radians(self._angle[1] - (self._angle[1] - self._angle[0]) * value / 100)
         ax = r * np.cos(a) * 0.5 + origin[0]
         ay = -r * np.sin(a) * 0.5 + origin[1]
         
-        k = np.where(theta >= a)[0][0]
-        if self._value == 0:
+        k = np.searchsorted(self.args['theta'], a)
+        if value == 0:
             k += 1
         
-        return {'points': np.stack((x, y), axis=1), 'origin': origin, 'r': r, 'curr': (ax, ay), 'k': k}
-    
-    def SetValue(self, value):
-        """设置当前值"""
+        bmp = wx.Bitmap(max(w, 1), max(h, 1))
+        dc = wx.MemoryDC(bmp)
+        dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
+        dc.Clear()
+        dc.SetFont(self.GetFont())
+        dc.SetTextForeground(self.GetForegroundColour())
         
-        self._value = value
-        self.args = self._update()
-        self.Refresh()
+        for i in range(points.shape[0]):
+            if i < k:
+                dc.DrawBitmap(self.bmp_bp, points[i][0]-5, points[i][1])
+            else:
+                dc.DrawBitmap(self.bmp_wp, points[i][0]-5, points[i][1])
+        
+        dc.DrawBitmap(self.bmp_core, origin[0]-60, origin[1]-60)
+        dc.DrawBitmap(self.bmp_rp, ax-5, ay)
+        
+        dc.DrawText('MIN', points[-1][0]-35, points[-1][1]-5)
+        dc.DrawText('MAX', points[0][0]+10, points[0][1]-5)
+        dc.SelectObject(wx.NullBitmap)
+        
+        return bmp
     
-    def GetValue(self):
-        """返回当前值"""
+    def SetValue(self, value):
+        """设置当前值，取整后显示，与拖动时发出的值一致"""
         
-        return self._value
+        SpritePanel.SetValue(self, int(round(value)))
     
     def on_mouse_event(self, evt):
         """响应鼠标事件"""
@@ -106,35 +129,15 @@ class Knob(wx.Panel):
                 angle = self._angle[1]
             
             if self._angle[0] <= angle <= self._angle[1]:
-                self._value = 100 * (self._angle[1] - angle) / (self._angle[1] - self._angle[0])
-                self.args = self._update()
-                self.Refresh()
-                
-                event = KnobEvent(wxEVT_KNOB_ANGLE_CHANGED, self.GetId())
-                event.SetEventObject(self)
-                event.SetValue(self._value)
-                self.GetEventHandler().ProcessEvent(event)
+                value = int(round(100 * (self._angle[1] - angle) / (self._angle[1] - self._angle[0])))
+                if value != self._value:
+                    self._value = value
+                    self.Refresh()
+                    self._notify()
     
     def on_size(self, evt):
         """响应控件改变大小"""
         
         self.args = self._update()
+        self.sprites.clear()
         self.Refresh()
-    
-    def on_paint(self, evt):
-        """响应重绘事件"""
-        
-        dc = wx.PaintDC(self)
-        
-        for i in range(self.args['points'].shape[0]):
-            if i < self.args['k']:
-                dc.DrawBitmap(self.bmp_bp, self.args['points'][i][0]-5, self.args['points'][i][1])
-            else:
-                dc.DrawBitmap(self.bmp_wp, self.args['points'][i][0]-5, self.args['points'][i][1])
-        
-        dc.DrawBitmap(self.bmp_core, self.args['origin'][0]-60, self.args['origin'][1]-60)
-        dc.DrawBitmap(self.bmp_rp, self.args['curr'][0]-5, self.args['curr'][1])
-        
-        dc.DrawText('MIN', self.args['points'][-1][0]-35, self.args['points'][-1][1]-5)
-        dc.DrawText('MAX', self.args['points'][0][0]+10, self.args['points'][0][1]-5)
-    
\ No newline at end of file
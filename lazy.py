@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+import queue
+import threading
+import collections
+import numpy as np
+
+class BlockCache:
+    """最近最少使用（LRU）数据块缓存：容量以字节计，超出时淘汰最久未访问的数据块，线程安全"""
+    
+    def __init__(self, capacity=64*1048576):
+        """构造函数"""
+        
+        self.capacity = capacity                    # 容量（字节）
+        self.nbytes = 0                             # 已缓存的字节数
+        self.items = collections.OrderedDict()      # 数据块序号 → 数据块，最近访问的在末尾
+        self.lock = threading.Lock()                # 读取线程与预读线程之间的锁
+    
+    def __contains__(self, key):
+        """数据块是否已缓存"""
+        
+        return key in self.items
+    
+    def get(self, key):
+        """返回已缓存的数据块，没有则返回None"""
+        
+        with self.lock:
+            data = self.items.get(key)
+            if data is not None:
+                self.items.move_to_end(key)
+            
+            return data
+    
+    def put(self, key, data):
+        """缓存数据块，淘汰最久未访问的数据块直到不超出容量（至少保留刚放入的一块）"""
+        
+        with self.lock:
+            if key in self.items:
+                self.nbytes -= self.items.pop(key).nbytes
+            
+            self.items[key] = data
+            self.nbytes += data.nbytes
+            while self.nbytes > self.capacity and len(self.items) > 1:
+                self.nbytes -= self.items.popitem(last=False)[1].nbytes
+    
+    def clear(self):
+        """清空缓存"""
+        
+        with self.lock:
+            self.items.clear()
+            self.nbytes = 0
+
+class BlockFile:
+    """按块读取的只读数据文件：以形状为(通道数, 数据点数)的只读数组的方式访问，切片作用于数据点所在的轴
+    
+    只读取切片覆盖的数据块，读过的数据块保存在容量有限的LRU缓存中；预读线程按浏览方向提前读入相邻的数据块。
+    内存占用由缓存容量决定，与文件大小无关。子类须设置channels、dtype、block、step、starts，并实现_load。
+    """
+    
+    def __init__(self, path, cache=64*1048576, ahead=2):
+        """构造函数，cache为缓存容量（字节），ahead为预读的数据块数"""
+        
+        self.path = path                            # 文件路径
+        self.fp = open(path, 'rb')                  # 文件对象（预读线程另开一个）
+        self.cache = BlockCache(cache)              # 数据块缓存
+        self.ahead = ahead                          # 预读的数据块数
+        self.last = 0                               # 最近一次读取的首个数据块，用于判断浏览方向
+        self.wanted = set()                         # 当前需要预读的数据块，浏览位置变化后过期的预读请求被跳过
+        self.pending = queue.Queue()                # 预读请求队列
+        self.thread = None                          # 预读线程
+        self.details = BlockCache(cache//4)         # 数据块序号 → 块内摘要，大小约为数据的2/step，同样按LRU淘汰
+        self.ndim = 2
+    
+    def _load(self, fp, i):
+        """从文件对象fp读取第i个数据块，返回形状为(通道数, 数据点数)的数组"""
+        
+        raise NotImplementedError
+    
+    @property
+    def length(self):
+        """每个通道的数据点数"""
+        
+        return int(self.starts[-1])
+    
+    @property
+    def shape(self):
+        """数据形状"""
+        
+        return (self.channels, self.length)
+    
+    def __len__(self):
+        """返回通道数，与数组的第一维一致"""
+        
+        return self.channels
+    
+    def _block(self, i):
+        """返回第i个数据块，优先取自缓存"""
+        
+        data = self.cache.get(i)
+        if data is None:
+            data = self._load(self.fp, i)
+            self.cache.put(i, data)
+        
+        return data
+    
+    def _run(self):
+        """预读线程函数"""
+        
+        fp = open(self.path, 'rb')
+        while True:
+            i = self.pending.get()
+            if i is None:
+                break
+            
+            if i in self.wanted and i not in self.cache:
+                self.cache.put(i, self._load(fp, i))
+        
+        fp.close()
+    
+    def _prefetch(self, b0, b1):
+        """按浏览方向预读[b0, b1)之后或之前的ahead个数据块"""
+        
+        n = self.starts.shape[0] - 1
+        blocks = range(b1, min(b1 + self.ahead, n)) if b0 >= self.last else range(max(b0 - self.ahead, 0), b0)
+        self.last = b0
+        self.wanted = set(blocks)
+        
+        if self.ahead and self.thread is None:
+            self.thread = threading.Thread(target=self._run)
+            self.thread.setDaemon(True)
+            self.thread.start()
+        
+        for i in blocks:
+            if i not in self.cache:
+                self.pending.put(i)
+    
+    def read(self, start, stop):
+        """读取[start, stop)区间的数据，形状为(通道数, 数据点数)"""
+        
+        start, stop = max(start, 0), min(stop, self.length)
+        if stop <= start:
+            return np.empty((self.channels, 0), dtype=self.dtype)
+        
+        b0 = int(np.searchsorted(self.starts, start, side='right')) - 1
+        b1 = int(np.searchsorted(self.starts, stop, side='left'))
+        parts = [self._block(i) for i in range(b0, b1)]
+        data = parts[0] if len(parts) == 1 else np.concatenate(parts, axis=1)
+        base = int(self.starts[b0])
+        self._prefetch(b0, b1)
+        
+        return data[:, start-base:stop-base]
+    
+    def __getitem__(self, key):
+        """按[通道, 数据点]切片读取，只读取覆盖到的数据块"""
+        
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        start, stop, step = cols.indices(self.length)
+        
+        return self.read(start, stop)[rows, ::step]
+    
+    def _detail(self, i):
+        """第i个数据块每step个数据点的最小值、最大值，形状为(2, 通道数, 摘要个数)，首次访问时读取数据块计算"""
+        
+        detail = self.details.get(i)
+        if detail is None:
+            data = self._block(i)
+            idx = np.arange(0, data.shape[1], self.step)
+            detail = np.stack((np.minimum.reduceat(data, idx, axis=1), np.maximum.reduceat(data, idx, axis=1)))
+            self.details.put(i, detail)
+        
+        return detail
+    
+    def summary(self, start, stop, size=None):
+        """返回覆盖[start, stop)区间的摘要：最小值、最大值(通道数, 摘要个数)和各摘要首个数据点的位置"""
+        
+        b0 = max(int(np.searchsorted(self.starts, start, side='right')) - 1, 0)
+        b1 = int(np.searchsorted(self.starts, stop, side='left'))
+        details = [self._detail(i) for i in range(b0, b1)]
+        if not details:
+            empty = np.empty((self.channels, 0), dtype=self.dtype)
+            return empty, empty, np.empty(0, dtype=np.int64)
+        
+        detail = np.concatenate(details, axis=2)
+        pos = np.concatenate([self.starts[i] + np.arange(d.shape[2])*self.step for i, d in zip(range(b0, b1), details)])
+        
+        return detail[0], detail[1], pos
+    
+    def close(self):
+        """关闭文件，结束预读线程"""
+        
+        if self.thread is not None:
+            self.pending.put(None)
+            self.thread.join()
+            self.thread = None
+        
+        self.cache.clear()
+        self.details.clear()
+        self.fp.close()
+
+class NpyFile(BlockFile):
+    """按块读取的.npy文件，数组形状为(数据点数,)或(数据点数, 通道数)，按行或按列存放均可"""
+    
+    def __init__(self, path, block=65536, step=1024, cache=64*1048576, ahead=2):
+        """构造函数，block为每块数据点数，step为概览摘要的分辨率"""
+        
+        BlockFile.__init__(self, path, cache, ahead)
+        
+        version = np.lib.format.read_magic(self.fp)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(self.fp)
+        elif version == (2, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(self.fp)
+        else:
+            raise ValueError('不支持的.npy文件版本：%d.%d'%version)
+        
+        self.offset = self.fp.tell()                # 数组数据的位置
+        self.channels = 1 if len(shape) == 1 else shape[1] # 通道数
+        self.dtype = dtype                          # 数据类型
+        self.fortran = fortran and len(shape) == 2  # 是否按列（各通道连续）存放
+        self.count = shape[0]                       # 每个通道的数据点数
+        self.block = block                          # 每块数据点数
+        self.step = step                            # 概览摘要的分辨率（数据点数）
+        self.starts = np.append(np.arange(0, self.count, block), self.count) # 各块首个数据点的位置
+    
+    def _load(self, fp, i):
+        """从文件对象fp读取第i个数据块"""
+        
+        a, b = int(self.starts[i]), int(self.starts[i+1])
+        size = self.dtype.itemsize
+        
+        if self.fortran:
+            data = np.empty((self.channels, b - a), dtype=self.dtype)
+            for c in range(self.channels):
+                fp.seek(self.offset + (c*self.count + a)*size)
+                data[c] = np.frombuffer(fp.read((b - a)*size), dtype=self.dtype)
+            return data
+        
+        fp.seek(self.offset + a*self.channels*size)
+        data = np.frombuffer(fp.read((b - a)*self.channels*size), dtype=self.dtype)
+        
+        return np.ascontiguousarray(data.reshape(b - a, self.channels).T)
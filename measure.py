@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+KEYS = ('vpp', 'rms', 'mean', 'freq', 'period', 'duty')
+
+def rising(x, level, hysteresis, armed=False, prev=None):
+    """返回一维数据x中上升沿越过level的位置（线性插值，可为小数）及越过后的预备状态
+    
+    信号须先低于 level-hysteresis 才预备，预备后第一个不低于level的点为越过点；prev为x之前的一个数据点。
+    """
+    
+    mark = np.where(x < level - hysteresis, 1, np.where(x >= level, 2, 0))
+    idx = np.flatnonzero(mark)
+    if idx.shape[0] == 0:
+        return np.zeros(0), armed
+    
+    mark = mark[idx]
+    before = np.empty_like(mark)
+    before[0] = 1 if armed else 2
+    before[1:] = mark[:-1]
+    armed = bool(mark[-1] == 1)
+    r = idx[(mark == 2) & (before == 1)]
+    
+    # 越过点之前的数据点一定低于level，在两点之间插值
+    if prev is None:
+        r = r[r > 0]
+    x0 = np.where(r > 0, x[r-1], prev if prev is not None else 0)
+    
+    return r - 1 + (level - x0)/np.maximum(x[r] - x0, 1e-12), armed
+
+def measure(data, rate, hysteresis=0.1):
+    """对形状为(通道数, 数据点数)的数据计算各通道的峰峰值、有效值、均值、频率、周期和占空比
+    
+    以均值为电平、hysteresis倍峰峰值为迟滞检测上升沿，频率由首末上升沿之间的整周期数计算；无法测量的项为nan。
+    """
+    
+    data = np.atleast_2d(np.asarray(data, dtype=float))
+    channels = data.shape[0]
+    result = {key: np.full(channels, np.nan) for key in KEYS}
+    if data.shape[1] == 0:
+        return result
+    
+    result['mean'] = data.mean(axis=1)
+    result['vpp'] = data.max(axis=1) - data.min(axis=1)
+    result['rms'] = np.sqrt(np.mean(np.square(data), axis=1))
+    
+    for c in range(channels):
+        level = result['mean'][c]
+        t, armed = rising(data[c], level, hysteresis*result['vpp'][c])
+        if t.shape[0] > 1:
+            result['period'][c] = (t[-1] - t[0]) / (t.shape[0] - 1) / rate
+            result['freq'][c] = 1 / result['period'][c]
+            a, b = int(np.ceil(t[0])), int(np.ceil(t[-1]))
+            result['duty'][c] = np.count_nonzero(data[c, a:b] >= level) / max(b - a, 1)
+    
+    return result
+
+class Meter:
+    """连续测量：随数据块到达更新累加量，每满一个闸门时间输出一次各通道的测量结果，计算量与累计数据长度无关
+    
+    上升沿检测的电平和迟滞取自上一个闸门时间的均值和峰峰值。
+    """
+    
+    def __init__(self, rate=44100, channels=1, gate=0.5, hysteresis=0.1, full=32768):
+        """构造函数"""
+        
+        self.rate = rate                            # 采样频率
+        self.channels = channels                    # 通道数
+        self.gate = gate                            # 闸门时间（秒）
+        self.hysteresis = hysteresis                # 迟滞（占峰峰值的比例）
+        self.full = full                            # 样本格式的满量程，迟滞的初值和下限以int16为基准按它换算
+        self.result = {key: np.full(channels, np.nan) for key in KEYS} # 最近一个闸门时间的测量结果
+        self.reset()
+    
+    def reset(self):
+        """复位状态"""
+        
+        c = self.channels
+        self.level = np.zeros(c)                    # 上升沿检测电平
+        self.hyst = np.full(c, 8*self.full/32768)   # 上升沿检测迟滞
+        self.armed = [False] * c                    # 各通道的上升沿预备状态
+        self.prev = None                            # 上一个数据块的最后一个数据点
+        self._restart()
+    
+    def _restart(self):
+        """开始新的闸门时间"""
+        
+        c = self.channels
+        self.n = 0                                  # 本闸门时间内的数据点数
+        self.s1 = np.zeros(c)                       # 数据之和
+        self.s2 = np.zeros(c)                       # 数据平方和
+        self.lo = np.full(c, np.inf)                # 最小值
+        self.hi = np.full(c, -np.inf)               # 最大值
+        self.high = np.zeros(c)                     # 不低于电平的数据点数（自闸门开始累计）
+        self.edges = np.zeros(c, dtype=int)         # 上升沿个数
+        self.first = np.zeros((2, c))               # 首个上升沿的位置及其之前不低于电平的数据点数
+        self.last = np.zeros((2, c))                # 最后一个上升沿的位置及其之前不低于电平的数据点数
+    
+    def set_args(self, **kwds):
+        """设置参数（复位状态）"""
+        
+        for key in ('rate', 'channels', 'gate', 'hysteresis', 'full'):
+            if key in kwds:
+                setattr(self, key, kwds[key])
+        
+        self.result = {key: np.full(self.channels, np.nan) for key in KEYS}
+        self.reset()
+    
+    def feed(self, data):
+        """送入形状为(通道数, 数据点数)的数据块，完成一个闸门时间时返回True"""
+        
+        data = np.asarray(data, dtype=float).reshape(self.channels, -1)
+        m = data.shape[1]
+        if m == 0:
+            return False
+        
+        self.s1 += data.sum(axis=1)
+        self.s2 += np.einsum('ij,ij->i', data, data)
+        np.minimum(self.lo, data.min(axis=1), out=self.lo)
+        np.maximum(self.hi, data.max(axis=1), out=self.hi)
+        
+        for c in range(self.channels):
+            above = np.cumsum(data[c] >= self.level[c])
+            t, self.armed[c] = rising(data[c], self.level[c], self.hyst[c], self.armed[c], None if self.prev is None else self.prev[c])
+            if t.shape[0]:
+                # 上升沿之前（不含越过点）不低于电平的数据点数
+                r = np.ceil(t).astype(int)
+                h = self.high[c] + np.where(r > 0, above[np.maximum(r-1, 0)], 0)
+                if self.edges[c] == 0:
+                    self.first[:, c] = self.n + t[0], h[0]
+                self.last[:, c] = self.n + t[-1], h[-1]
+                self.edges[c] += t.shape[0]
+            self.high[c] += above[-1]
+        
+        self.prev = data[:, -1].copy()
+        self.n += m
+        if self.n < self.gate * self.rate:
+            return False
+        
+        mean = self.s1 / self.n
+        vpp = self.hi - self.lo
+        span = self.last[0] - self.first[0]
+        ok = (self.edges > 1) & (span > 0)
+        period = np.where(ok, span / np.maximum(self.edges - 1, 1) / self.rate, np.nan)
+        
+        self.result = {
+            'vpp': vpp,
+            'rms': np.sqrt(self.s2 / self.n),
+            'mean': mean,
+            'freq': 1 / period,
+            'period': period,
+            'duty': np.where(ok, (self.last[1] - self.first[1]) / np.maximum(span, 1e-12), np.nan)
+        }
+        
+        self.level = mean
+        self.hyst = np.maximum(self.hysteresis * vpp, self.full/32768)
+        self._restart()
+        
+        return True
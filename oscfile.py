@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+import os
+import bz2
+import json
+import lzma
+import time
+import zlib
+import struct
+import numpy as np
+
+from lazy import BlockFile
+
+MAGIC = b'OSCREC01'                                 # 文件头标识
+TRAILER = b'OSCIDX01'                               # 文件尾标识
+
+CODECS = {
+    'none': (bytes, bytes),
+    'zlib': (zlib.compress, zlib.decompress),
+    'bz2': (bz2.compress, bz2.decompress),
+    'lzma': (lzma.compress, lzma.decompress)
+}
+
+def encode(data, codec='zlib', delta=True):
+    """压缩形状为(通道数, 数据点数)的数据块：整数先沿数据点做差分，再按字节重排，最后压缩"""
+    
+    data = np.ascontiguousarray(data)
+    if delta and data.dtype.kind in 'iu':
+        data = np.diff(data, axis=1, prepend=np.zeros((data.shape[0], 1), dtype=data.dtype)).astype(data.dtype)
+    
+    # 相邻数据点的同一字节相关性最强，重排后同一字节位置的数据连续存放
+    raw = data.reshape(-1).view(np.uint8).reshape(-1, data.dtype.itemsize).T.tobytes()
+    
+    return CODECS[codec][0](raw)
+
+def decode(buf, shape, dtype, codec='zlib', delta=True):
+    """解压encode生成的数据块，返回形状为shape的数组"""
+    
+    dtype = np.dtype(dtype)
+    raw = np.frombuffer(CODECS[codec][1](buf), dtype=np.uint8)
+    data = np.ascontiguousarray(raw.reshape(dtype.itemsize, -1).T).view(dtype).reshape(shape)
+    
+    if delta and dtype.kind in 'iu':
+        data = np.cumsum(data, axis=1, dtype=dtype)
+    
+    return data
+
+class OscWriter:
+    """录音文件写入器：数据按固定长度分块压缩写入，每块带最小值、最大值摘要，关闭时在文件尾写入块索引
+    
+    文件结构：文件头标识 | 头部长度 | JSON头部 | 数据块…… | 块索引 | 索引位置 | 块数 | 文件尾标识
+    每个数据块：压缩后字节数 | 数据点数 | 各通道最小值 | 各通道最大值 | 各通道每step个数据点的最小值 | 最大值 | 压缩数据
+    块索引只含整块的摘要，打开文件时全部读入；块内更细的摘要在块头中，不解压即可读取。
+    """
+    
+    def __init__(self, path, channels=1, rate=44100, dtype=np.int16, start=None, block=65536, step=1024, codec='zlib', meta=None):
+        """构造函数，start为首个数据点的时刻（Unix时间戳），meta为附加的元数据（如触发参数）"""
+        
+        self.path = path                            # 文件路径
+        self.channels = channels                    # 通道数
+        self.dtype = np.dtype(dtype)                # 数据类型
+        self.block = block                          # 每块数据点数
+        self.step = step                            # 块内摘要的分辨率（数据点数）
+        self.codec = codec                          # 压缩算法
+        self.buf = np.empty((channels, block), dtype=self.dtype) # 正在填充的数据块
+        self.fill = 0                               # 正在填充的数据块已有的数据点数
+        self.index = list()                         # 已写入数据块的(位置, 字节数, 数据点数, 最小值, 最大值)
+        self.count = 0                              # 已写入的数据点数
+        self.head = {
+            'version': 1,
+            'rate': rate,
+            'channels': channels,
+            'dtype': self.dtype.str,
+            'start': time.time() if start is None else start,
+            'block': block,
+            'step': step,
+            'codec': codec,
+            'delta': True,
+            'meta': meta or dict()
+        }
+        
+        head = json.dumps(self.head, ensure_ascii=False).encode('utf-8')
+        self.fp = open(path, 'wb')
+        self.fp.write(MAGIC + struct.pack('<I', len(head)) + head)
+    
+    def _flush(self):
+        """压缩并写入正在填充的数据块"""
+        
+        if self.fill == 0:
+            return
+        
+        data = self.buf[:, :self.fill]
+        lo, hi = data.min(axis=1), data.max(axis=1)
+        idx = np.arange(0, self.fill, self.step)
+        payload = encode(data, self.codec)
+        
+        self.index.append((self.fp.tell(), len(payload), self.fill, lo, hi))
+        self.fp.write(struct.pack('<II', len(payload), self.fill) + lo.tobytes() + hi.tobytes())
+        self.fp.write(np.minimum.reduceat(data, idx, axis=1).tobytes() + np.maximum.reduceat(data, idx, axis=1).tobytes())
+        self.fp.write(payload)
+        self.fill = 0
+    
+    def write(self, data):
+        """写入形状为(通道数, 数据点数)的数据"""
+        
+        data = np.reshape(data, (self.channels, -1))
+        i = 0
+        while i < data.shape[1]:
+            k = min(self.block - self.fill, data.shape[1] - i)
+            self.buf[:, self.fill:self.fill+k] = data[:, i:i+k]
+            self.fill += k
+            i += k
+            if self.fill == self.block:
+                self._flush()
+        
+        self.count += data.shape[1]
+    
+    def close(self):
+        """写入最后一个不完整的数据块和块索引，关闭文件"""
+        
+        if self.fp is None:
+            return
+        
+        self._flush()
+        index = np.zeros(len(self.index), dtype=index_dtype(self.channels, self.dtype))
+        for i, item in enumerate(self.index):
+            index[i] = item
+        
+        pos = self.fp.tell()
+        self.fp.write(index.tobytes())
+        self.fp.write(struct.pack('<QQ', pos, len(self.index)) + TRAILER)
+        self.fp.close()
+        self.fp = None
+
+def index_dtype(channels, dtype):
+    """块索引的结构化数据类型"""
+    
+    return np.dtype([('offset', '<u8'), ('nbytes', '<u4'), ('count', '<u4'), ('min', dtype, (channels,)), ('max', dtype, (channels,))])
+
+class OscFile(BlockFile):
+    """录音文件读取器：只解压被访问的数据块，解压后的数据块保存在LRU缓存中，概览图直接取自块摘要"""
+    
+    def __init__(self, path, cache=64*1048576, ahead=2):
+        """构造函数，cache为缓存容量（字节），ahead为预读的数据块数"""
+        
+        BlockFile.__init__(self, path, cache, ahead)
+        
+        if self.fp.read(8) != MAGIC:
+            raise ValueError('不是录音文件：%s'%path)
+        
+        size, = struct.unpack('<I', self.fp.read(4))
+        self.head = json.loads(self.fp.read(size).decode('utf-8')) # 头部
+        self.body = 12 + size                       # 首个数据块的位置
+        self.rate = self.head['rate']               # 采样频率
+        self.channels = self.head['channels']       # 通道数
+        self.dtype = np.dtype(self.head['dtype'])   # 数据类型
+        self.start = self.head['start']             # 首个数据点的时刻
+        self.block = self.head['block']             # 每块数据点数
+        self.step = self.head['step']               # 块内摘要的分辨率
+        self.meta = self.head['meta']               # 附加的元数据
+        self.index = self._load_index()             # 块索引
+        self.starts = np.concatenate(([0], np.cumsum(self.index['count'], dtype=np.int64))) # 各块首个数据点的位置
+    
+    def _load_index(self):
+        """读取文件尾的块索引；录制未正常结束而没有索引时，依次读取各数据块的块头重建索引"""
+        
+        dtype = index_dtype(self.channels, self.dtype)
+        end = self.fp.seek(0, os.SEEK_END)
+        
+        if end >= self.body + 24:
+            self.fp.seek(end - 24)
+            pos, n, tail = struct.unpack('<QQ8s', self.fp.read(24))
+            if tail == TRAILER and pos + n*dtype.itemsize == end - 24:
+                self.fp.seek(pos)
+                return np.frombuffer(self.fp.read(n*dtype.itemsize), dtype=dtype)
+        
+        items = list()
+        size = 8 + 2*self.channels*self.dtype.itemsize
+        pos = self.body
+        while pos + size <= end:
+            self.fp.seek(pos)
+            head = self.fp.read(size)
+            nbytes, count = struct.unpack('<II', head[:8])
+            if pos + self._skip(count) + nbytes > end:
+                break
+            
+            bound = np.frombuffer(head[8:], dtype=self.dtype).reshape(2, self.channels)
+            items.append((pos, nbytes, count, bound[0], bound[1]))
+            pos += self._skip(count) + nbytes
+        
+        index = np.zeros(len(items), dtype=dtype)
+        for i, item in enumerate(items):
+            index[i] = item
+        
+        return index
+    
+    def _skip(self, count):
+        """含count个数据点的数据块的块头长度"""
+        
+        return 8 + 2*self.channels*self.dtype.itemsize*(1 + -(-count//self.step))
+    
+    def _load(self, fp, i):
+        """从文件对象fp读取并解压第i个数据块"""
+        
+        offset, nbytes, count = self.index[i][['offset', 'nbytes', 'count']]
+        fp.seek(int(offset) + self._skip(int(count)))
+        
+        return decode(fp.read(int(nbytes)), (self.channels, int(count)), self.dtype, self.head['codec'], self.head['delta'])
+    
+    def _detail(self, i):
+        """读取第i个数据块块头中的细摘要，形状为(2, 通道数, 摘要个数)，不解压数据"""
+        
+        offset, count = int(self.index[i]['offset']), int(self.index[i]['count'])
+        n = -(-count//self.step)
+        self.fp.seek(offset + 8 + 2*self.channels*self.dtype.itemsize)
+        
+        return np.frombuffer(self.fp.read(2*self.channels*n*self.dtype.itemsize), dtype=self.dtype).reshape(2, self.channels, n)
+    
+    def summary(self, start, stop, size=None):
+        """返回覆盖[start, stop)区间的摘要：最小值、最大值(通道数, 摘要个数)和各摘要首个数据点的位置，不解压数据
+        
+        size为期望的摘要分辨率（数据点数），不小于块长度时使用块索引，否则读取块头中的细摘要。
+        """
+        
+        if size is None or size >= self.block:
+            b0 = max(int(np.searchsorted(self.starts, start, side='right')) - 1, 0)
+            b1 = int(np.searchsorted(self.starts, stop, side='left'))
+            index = self.index[b0:b1]
+            return index['min'].T, index['max'].T, self.starts[b0:b1]
+        
+        return BlockFile.summary(self, start, stop, size)
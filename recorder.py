@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import os
+import queue
+import struct
+import threading
+import numpy as np
+
+from oscfile import OscWriter
+from audiofile import AudioWriter
+
+class Recorder:
+    """录制器：采集过程中由写盘线程将数据块连续写入.osc录音文件、.npy、WAV或FLAC文件
+    
+    .osc文件分块压缩并带有采样频率、开始时刻和附加元数据，由OscWriter写入；WAV和FLAC文件由AudioWriter写入。
+    .npy文件中多通道数据按帧交织写入，数组的形状为(数据点数, 通道数)；单通道时为(数据点数,)。
+    """
+    
+    HEADER = 128                                    # 预留的.npy文件头长度
+    
+    def __init__(self, dtype=np.int16):
+        """构造函数"""
+        
+        self.dtype = np.dtype(dtype)                # 数据类型
+        self.channels = 1                           # 通道数
+        self.path = None                            # 文件路径
+        self.fp = None                              # 文件对象，录制.osc、WAV或FLAC文件时为OscWriter或AudioWriter
+        self.npy = True                             # 是否录制为.npy文件
+        self.dq = queue.Queue()                     # 待写盘的数据块队列
+        self.thread = None                          # 写盘线程
+        self.count = 0                              # 当前文件已写入的数据点数
+        self.rate = 44100                           # 采样频率，切换文件时沿用
+        self.meta = None                            # 附加元数据，切换文件时沿用
+    
+    @property
+    def recording(self):
+        """是否正在录制"""
+        
+        return self.fp is not None
+    
+    def _header(self, n):
+        """生成固定长度的.npy文件头"""
+        
+        shape = '(%d,)'%n if self.channels == 1 else '(%d, %d)'%(n, self.channels)
+        d = "{'descr': %r, 'fortran_order': False, 'shape': %s, }"%(self.dtype.str, shape)
+        size = self.HEADER - 10
+        
+        return b'\x93NUMPY\x01\x00' + struct.pack('<H', size) + d.ljust(size-1).encode('latin1') + b'\n'
+    
+    def _create(self, path):
+        """按扩展名创建文件"""
+        
+        self.path = path
+        self.count = 0
+        ext = os.path.splitext(path)[1].lower()
+        self.npy = ext not in ('.osc', '.wav', '.flac')
+        
+        if ext == '.osc':
+            self.fp = OscWriter(path, self.channels, self.rate, self.dtype, meta=self.meta)
+        elif not self.npy:
+            self.fp = AudioWriter(path, self.channels, self.rate, self.dtype)
+        else:
+            self.fp = open(path, 'wb')
+            self.fp.write(self._header(0))
+    
+    def _finish(self):
+        """补写.npy、WAV文件头中的数据长度或.osc文件的块索引，关闭文件"""
+        
+        if self.npy:
+            self.fp.seek(0)
+            self.fp.write(self._header(self.count))
+        self.fp.close()
+    
+    def _run(self):
+        """写盘线程函数，队列中的字符串为切换到的新文件路径"""
+        
+        while True:
+            data = self.dq.get()
+            if data is None:
+                break
+            
+            if isinstance(data, str):
+                self._finish()
+                self._create(data)
+                continue
+            
+            if self.npy:
+                self.fp.write(data.tobytes())
+                self.count += data.shape[0]
+            else:
+                self.fp.write(data)
+                self.count += data.shape[1]
+    
+    def open(self, path, channels=1, rate=44100, meta=None, dtype=None):
+        """开始录制，按扩展名决定文件格式；rate记录在.osc、WAV和FLAC文件中，meta（如触发参数）只记录在.osc文件中，dtype为None时沿用上次的数据类型"""
+        
+        self.channels = channels
+        self.rate = rate
+        self.meta = meta
+        self.dtype = np.dtype(dtype or self.dtype)
+        self._create(path)
+        
+        self.thread = threading.Thread(target=self._run)
+        self.thread.setDaemon(True)
+        self.thread.start()
+    
+    def write(self, data):
+        """提交一个形状为(通道数, 数据点数)的数据块，复制（.npy文件按帧交织）后交由写盘线程写入"""
+        
+        data = np.reshape(data, (self.channels, -1))
+        self.dq.put(np.ascontiguousarray(data.T, dtype=self.dtype) if self.npy else np.array(data, dtype=self.dtype))
+    
+    def rotate(self, path):
+        """切换到新文件继续录制（格式须与当前文件相同），沿用通道数、采样频率、元数据和数据类型
+        
+        由写盘线程在写完之前提交的数据块后切换，调用方（如消费者线程）与写入数据的采样线程之间不需要同步。
+        """
+        
+        self.dq.put(path)
+    
+    def close(self):
+        """停止录制：写完队列中剩余的数据块，补写.npy、WAV文件头中的数据长度或.osc文件的块索引"""
+        
+        if self.fp is None:
+            return
+        
+        self.dq.put(None)
+        self.thread.join()
+        self._finish()
+        self.fp = None
@@ -1,59 +1,160 @@
 # -*- coding: utf-8 -*-
 
-import pyaudio
-import numpy as np
+import time
+
+from trigger import Trigger
+from source import PyAudioSource
+from formats import FORMATS, LATENCY, THROUGHPUT, chunk_size
+from filters import FilterChain
 
 class AudioSampler:
-    """音频采样器"""
+    """音频采样器：从输入数据源（默认为声卡）读取数据块，经触发处理后送入数据队列"""
     
-    def __init__(self, dq, rate=44100):
-        """构造函数"""
+    def __init__(self, dq, rate=44100, callback=False, channels=1, input=None, format='int16', chunk=0):
+        """构造函数，dq为ChunkQueue数据队列，format为样本格式（见formats.FORMATS），chunk为数据块大小，0表示自适应"""
         
-        self.dq = dq                                # 数据队列
+        self.dq = dq                                # 数据队列，触发数据段带有(触发点位置, 预触发数据点数, 触发时刻)标记
         self.rate = rate                            # 采样频率
-        self.chunk = 1024                           # 数据块大小
+        self.format = format                        # 样本格式
+        self.blocksize = chunk                      # 指定的数据块大小，0表示启动时按采样频率和用途自适应
+        self.chunk = chunk or chunk_size(rate, LATENCY) # 当前的数据块大小
+        self.throughput = False                     # 是否优先吞吐量（如无界面采集，数据队列只用于统计）
+        self.channels = channels                    # 通道数
         self.mode = 1                               # 模式开关：0 - 触发模式，1 - 实时模式
-        self.level = 16                             # 触发模式下的触发阈值
-        self.over = 1                               # 触发模式下的触发数量
+        self.trigger = Trigger(auto=rate//10)       # 触发模式下的触发器
+        self.filter = FilterChain(rate, channels)   # 滤波器，在触发、录制和显示之前作用于每个数据块
         self.running = False                        # 采样器工作状态
+        self.recorder = None                        # 录制器，非None时同时写盘
+        self.ring = None                            # 共享内存环形缓冲区，非None时连续的数据流同时写入，供分析进程读取
+        self.input = input or PyAudioSource(callback) # 输入数据源
+        self.overflows = 0                          # 声卡输入溢出次数
+        self.wait = True                            # 数据队列满时能否等待消费者，声卡回调方式下不能等待
+        self.t0 = 0                                 # 采集开始的时刻
+    
+    @property
+    def dropped(self):
+        """数据队列满而丢弃的数据块数"""
+        
+        return self.dq.dropped
+    
+    @property
+    def dtype(self):
+        """与样本格式对应的数据类型"""
         
+        return FORMATS[self.format]
+    
     def set_args(self, **kwds):
         """设置参数"""
         
         if 'mode' in kwds:
             self.mode = kwds['mode']
         
-        if 'level' in kwds:
-            self.level = kwds['level']
+        # 触发参数：触发电平、迟滞、触发沿、预触发深度、释抑时间、扫描方式、数据段长度、触发源通道
+        args = {key: kwds[key] for key in ('level', 'hysteresis', 'edge', 'pre', 'holdoff', 'sweep', 'length', 'source') if key in kwds}
+        if args:
+            self.trigger.set_args(**args)
+        
+        if 'filters' in kwds:
+            self.filter.set_args(filters=kwds['filters'])
+        
+        if 'recorder' in kwds:
+            self.recorder = kwds['recorder']
+        
+        if 'ring' in kwds:
+            self.ring = kwds['ring']
         
-        if 'over' in kwds:
-            self.over = kwds['over']
+        if 'channels' in kwds:
+            self.channels = kwds['channels']
+        
+        if 'input' in kwds:
+            self.input = kwds['input']
+        
+        # 采样频率、样本格式和数据块大小在下次启动时生效
+        if 'rate' in kwds:
+            self.rate = kwds['rate']
+        
+        if 'format' in kwds:
+            self.format = kwds['format']
+        
+        if 'chunk' in kwds:
+            self.blocksize = kwds['chunk']
+        
+        if 'throughput' in kwds:
+            self.throughput = kwds['throughput']
     
-    def start(self):
-        """音频采集"""
+    def adapt(self):
+        """按用途确定数据块大小：只显示时取约10ms的小数据块以降低延迟，录制时取约100ms的大数据块以提高吞吐量"""
         
-        pa = pyaudio.PyAudio()
-        stream = pa.open(
-            format              = pyaudio.paInt16,  # 量化精度（16位，动态范围：-32768~32767）
-            channels            = 1,                # 通道数
-            rate                = self.rate,        # 采样频率
-            frames_per_buffer   = self.chunk,       # pyAudio内部缓存的数据块大小
-            input               = True
-        )
+        if self.blocksize:
+            return self.blocksize
         
-        self.running = True
-        self.dq.queue.clear()
+        return chunk_size(self.rate, THROUGHPUT if self.recorder or self.throughput else LATENCY)
+    
+    def describe(self):
+        """返回采集参数，作为录音文件的附加元数据"""
+        
+        meta = {'mode': 'realtime' if self.mode else 'trigger', 'format': self.format}
+        if not self.mode:
+            args = {key: getattr(self.trigger, key) for key in ('level', 'hysteresis', 'edge', 'pre', 'holdoff', 'sweep', 'length', 'source')}
+            args.update({key: value for key, value in (self.trigger.changes or {}).items() if key in args})
+            meta['trigger'] = args
+        
+        filters = (self.filter.changes or {}).get('filters', self.filter.filters)
+        if filters:
+            meta['filters'] = list(filters)
+        
+        return meta
+    
+    def _emit(self, data):
+        """处理一个数据块：data是声卡缓冲区上形状为(通道数, 数据点数)的视图，由数据队列复制到其缓冲区中
+        
+        启用了滤波器时先滤波，触发、录制、显示和分析的都是滤波后的数据；共享内存环形缓冲区写入的是触发之前的连续数据流。
+        录制器在入队之前写盘，数据队列按策略丢弃数据时录制的数据不受影响；声卡回调方式下入队不等待消费者。
+        """
         
-        while self.running:
-            data = stream.read(self.chunk)
-            data = np.fromstring(data, dtype=np.int16)
-            
-            if self.mode or np.sum([data > self.level, data < -self.level]) > self.over:
-                self.dq.put(data)
+        data = self.filter.process(data)
+        if self.ring is not None:
+            self.ring.write(data)
         
-        stream.close()
-        pa.terminate()
+        # 触发模式下输出以触发点对齐的数据段
+        if not self.mode:
+            for seg, (t, npre) in zip(self.trigger.process(data), self.trigger.marks):
+                if self.recorder:
+                    self.recorder.write(seg)
+                self.dq.put(seg, (t, npre, self.t0 + t/self.rate), wait=self.wait)
+            return
         
+        if self.recorder:
+            self.recorder.write(data)
+        
+        self.dq.put(data, wait=self.wait)
+    
+    def start(self):
+        """音频采集，直到被停止或输入数据源结束"""
+        
+        # 回放文件等数据源自带采样频率、通道数和样本格式
+        if self.input.rate:
+            self.rate = self.input.rate
+        if self.input.channels:
+            self.channels = self.input.channels
+        if self.input.format:
+            self.format = self.input.format
+        
+        self.chunk = self.adapt()
+        self.filter.set_args(rate=self.rate, channels=self.channels)
+        self.trigger.set_args(auto=self.rate//10)
+        self.trigger.reset()
+        self.overflows = 0
+        self.wait = not getattr(self.input, 'callback', False)
+        self.running = True
+        self.t0 = time.time()
+        self.dq.reset(self.channels, self.dtype)
+        if self.ring is not None:
+            self.ring.reset(self.channels, self.dtype)
+        
+        self.input.run(self)
+        self.running = False
+    
     def stop(self):
         """停止采集"""
         
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import time
+import wx
+
+class RenderScheduler(wx.Timer):
+    """渲染调度器：在GUI线程中按限定帧率一次取出队列中全部积压的数据（已合并为一个数组），送给各个显示部件，每个部件重绘一次"""
+    
+    def __init__(self, dq, screen, fps=30):
+        """构造函数，dq为ChunkQueue数据队列"""
+        
+        wx.Timer.__init__(self)
+        
+        self.dq = dq                                # 数据队列
+        self.stats = None                           # 运行统计，非None时记录取出的数据块并每秒生成快照
+        self.stats_time = 0                         # 统计快照最近一次生成的时间
+        self.screen = screen                        # 示波器屏幕
+        self.fps = fps                              # 最高帧率
+        self.sinks = list()                         # 示波器屏幕之外接收数据的显示部件
+    
+    def start(self):
+        """启动调度"""
+        
+        self.Start(max(int(1000/self.fps), 1))
+    
+    def add_sink(self, sink):
+        """添加一个接收数据的显示部件，部件须提供append_data方法"""
+        
+        self.sinks.append(sink)
+    
+    def set_stats(self, stats):
+        """开启（stats为Stats对象）或关闭（stats为None）运行统计"""
+        
+        self.stats = stats
+        self.stats_time = time.time()
+    
+    def set_fps(self, fps):
+        """设置最高帧率"""
+        
+        self.fps = fps
+        if self.IsRunning():
+            self.start()
+    
+    def Notify(self):
+        """定时器回调：数据追加和屏幕重绘都在GUI线程中进行，绘图参数整体替换，重绘不会与追加交错"""
+        
+        data, marks, t = self.dq.take()
+        if data is not None:
+            if self.stats:
+                self.stats.received(t)
+            
+            # 触发数据段的标记为(触发点位置, 预触发数据点数, 触发时刻)
+            events = [(offset, data[:, offset:offset+n]) + tag for offset, n, tag in marks]
+            self.screen.append_data(data, events)
+            for sink in self.sinks:
+                sink.append_data(data)
+        
+        # 每秒生成一次统计快照（与是否重绘无关），统计面板显示最近一秒的结果
+        if self.stats and time.time() - self.stats_time >= 1:
+            self.stats.snapshot()
+            self.stats_time = time.time()
+            self.screen.Refresh()
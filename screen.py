@@ -1,28 +1,52 @@
 # -*- coding: utf-8 -*-
 
 import wx
+import time
 import numpy as np
 
+from store import DataStore
+from envelope import Envelope
+from measure import Meter, measure
+from acquire import Accumulator
+from events import EventIndex
+from formats import full_scale
+
 class Screen(wx.Panel):
     """示波器显示屏幕"""
     
-    def __init__(self, parent, rate=44100):
+    COLOURS = [(32,96,255), (255,192,0), (0,224,224), (224,96,224)] # 各通道波形颜色
+    
+    def __init__(self, parent, rate=44100, budget=None, channels=1):
         """构造函数"""
         
         wx.Panel.__init__(self, parent, -1, style=wx.SUNKEN_BORDER)
         self.SetBackgroundColour(wx.Colour(0, 0, 0))
         self.SetDoubleBuffered(True)
-                
+        
         self.parent = parent                        # 父级控件
         self.rate = rate                            # 采样频率
-        self.scale = 1024                           # 信号幅度基准
+        self.full = full_scale(np.int16)            # 样本格式的满量程，纵轴标注和测量结果以它为100%
+        self.scale = self.full/32                   # 信号幅度基准
         self.tw = 32                                # 以ms为单位的时间窗口宽度
         self.pos = 0                                # 时间窗口左侧在数据流上的位置
         self.k = int(self.tw*self.rate/1000)        # 时间窗口覆盖的数据点数
         self.leftdown = False                       # 鼠标左键按下
         self.mpos = wx._core.Point()                # 鼠标位置
-        self.data = np.array([], dtype=np.int16)    # 音频数据
+        self.budget = budget                        # 音频数据的内存预算
+        self.data = DataStore(budget=budget, channels=channels) # 音频数据，形状为(通道数, 数据点数)
+        self.gains = np.ones(channels)              # 各通道的幅度缩放倍数
+        self.env = Envelope(self.data)              # 音频数据的最大最小值包络金字塔
+        self.meter = Meter(rate, channels)          # 随数据块更新的连续测量
+        self.measuring = False                      # 是否显示自动测量结果
+        self.measures = None                        # 时间窗口内的测量结果
+        self.acc = Accumulator()                    # 触发模式下的平均或峰值保持累加器
+        self.events = EventIndex(channels)          # 触发模式下各数据段的事件索引
         self.scrsize = self.GetSize()               # 示波器屏幕宽度和高度
+        self.bg = None                              # 网格、边框和标注的背景位图缓存，None表示需要重新绘制
+        self.bg_time = 0                            # 背景位图最近一次绘制的时间
+        self.stats = None                           # 运行统计，非None时计时并显示统计面板（快照由RenderScheduler每秒生成）
+        self.pool = None                            # 分析进程池，非None时连续测量由工作进程完成
+        self.measured = 0                           # 最近一次提交测量任务时共享内存中的写入计数
         self.args = self._update()                  # 绘图参数
         self.font = wx.Font(10, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL, False, 'Courier New')
         
@@ -33,11 +57,12 @@ class Screen(wx.Panel):
         self.Bind(wx.EVT_LEFT_UP, self.on_left_up)                
         self.Bind(wx.EVT_MOTION, self.on_mouse_motion)
     
-    def _update(self):
-        """更新绘图参数"""
+    def _update(self, measuring=True):
+        """更新绘图参数，measuring为False时沿用上次时间窗口内的测量结果"""
         
+        t0 = time.perf_counter() if self.stats else 0
         u_padding, v_padding, gap = 80, 50, 5           # 示波器屏幕左右留白、上下留白、边框间隙
-            
+        
         args = {        
             'b_left': u_padding,                        # 示波器边框左侧坐标
             'b_top': v_padding,                         # 示波器边框顶部坐标
@@ -52,50 +77,58 @@ class Screen(wx.Panel):
             'right': self.scrsize[0] - u_padding - gap  # 示波器有效区域右侧坐标
         }
         
-        x = np.linspace(args['left'], args['right'], self.k)
-        y = args['mid'] + (args['h']/2)*self.data[self.pos:self.pos+self.k]/self.scale
-        skip = max(self.k//args['w'], 1)
-        
-        if x.shape[0] > y.shape[0]:
-            x = x[:y.shape[0]]
-        
-        if skip > 1:
-            y = y[::skip]
-            x = x[::skip]
+        # 从包络金字塔中取出时间窗口内每个像素列的最小值和最大值，每个通道不超过2倍宽度个点；有累计结果时显示累计结果
+        if self.acc.n:
+            x, y = self.acc.window(args['w'])
+            n = self.acc.length
+        else:
+            x, y = self.env.window(self.pos, self.pos+self.k, args['w'])
+            n = self.k
+        x = args['left'] + x*(args['right']-args['left'])/max(n-1, 1)
+        y = args['mid'] + (args['h']/2)*y*self.gains[:, np.newaxis]/self.scale
         
-        if y.shape[0] == 0:
-            y = np.array([args['mid']])
+        if y.shape[1] == 0:
+            y = np.full((y.shape[0], 1), args['mid'])
             x = np.array([u_padding + gap])
         else:
             y = np.where(y < args['up'], args['up'], y)
             y = np.where(y > args['down'], args['down'], y)
         
-        args.update({'points':np.stack((x, y), axis=1), 'gu':args['w']/10, 'gv':args['h']/8})
+        args.update({'points':[np.stack((x, item), axis=1) for item in y], 'gu':args['w']/10, 'gv':args['h']/8})
+        
+        # 只测量时间窗口覆盖的数据，不扫描全部数据
+        if self.measuring and measuring:
+            self.measures = measure(self.data[self.pos:self.pos+self.k], self.rate)
+        
+        if self.stats:
+            self.stats.update.add((time.perf_counter() - t0) * 1000)
         
         return args
     
     def _check_pos(self):
         """时间窗口位置校正"""
         
-        if self.pos < 0 or self.data.data.shape[0] <= self.k:
+        if self.pos < 0 or len(self.data) <= self.k:
             self.pos = 0
             self.parent.slider.SetValue(0)
-        elif self.pos > self.data.data.shape[0] - self.k:
-            self.pos = self.data.data.shape[0] - self.k
+        elif self.pos > len(self.data) - self.k:
+            self.pos = len(self.data) - self.k
             self.parent.slider.SetValue(1000)
         else:
-            self.parent.slider.SetValue(int(1000*self.pos/(self.data.data.shape[0] - self.k)))
+            self.parent.slider.SetValue(int(1000*self.pos/(len(self.data) - self.k)))
     
     def on_wheel(self, evt):
         """响应鼠标滚轮调整波形幅度"""
         
         self.scale = self.scale*0.8 if evt.WheelRotation > 0 else self.scale*1.2
-        if self.scale < 32:
-            self.scale = 32
-        if self.scale > 32768:
-            self.scale = 32768
-        
-        self.parent.vknob.SetValue(10 * (np.log2(self.scale)-5))
+        if self.scale < self.full/1024:
+            self.scale = self.full/1024
+        if self.scale > self.full:
+            self.scale = self.full
+        
+        self.parent.vknob.SetValue(self.amplitude())
+        self.parent.gain_ch.SetSelection(0)
+        self.bg = None
         self.args = self._update()
         self.Refresh()
     
@@ -104,12 +137,12 @@ class Screen(wx.Panel):
         
         self.leftdown = True
         self.mpos = evt.GetPosition()
-        
+    
     def on_left_up(self, evt):
         """响应鼠标左键弹起事件"""
         
         self.leftdown = False
-        
+    
     def on_mouse_motion(self, evt):
         """响应鼠标移动事件"""
         
@@ -120,13 +153,15 @@ class Screen(wx.Panel):
             
             self.pos -= int(self.k * dx / self.scrsize[0])
             self._check_pos()
+            self.bg = None
             self.args = self._update()
             self.Refresh()
-            
+    
     def on_size(self, evt):
         """响应窗口大小变化"""
         
         self.scrsize = self.GetSize()
+        self.bg = None
         self.args = self._update()
         self.Refresh()
     
@@ -134,12 +169,22 @@ class Screen(wx.Panel):
         """响应重绘事件"""
         
         dc = wx.PaintDC(self)
-        self.plot(dc)
+        if self.stats:
+            t0 = time.perf_counter()
+            self.plot(dc)
+            self.stats.painted(t0)
+        else:
+            self.plot(dc)
     
-    def set_amplitude(self, value):
-        """设置幅度缩放比例"""
+    def set_amplitude(self, value, channel=None):
+        """设置幅度缩放比例：旋钮0～100对应满量程的1/1024～1；指定channel时只调整该通道（相对于全部通道的缩放倍数）"""
         
-        self.scale = pow(2, 5 + value/10)
+        if channel is not None:
+            self.set_gain(channel, self.scale / (self.full * pow(2, value/10 - 10)))
+            return
+        
+        self.scale = self.full * pow(2, value/10 - 10)
+        self.bg = None
         self.args = self._update()
         self.Refresh()
     
@@ -151,38 +196,211 @@ class Screen(wx.Panel):
         self.k = int(self.tw*self.rate/1000)
         self.pos = center - self.k//2
         self._check_pos()
+        self.bg = None
         self.args = self._update()
         self.Refresh()
     
-    def append_data(self, data):
-        """追加数据"""
-        
-        self.data = np.hstack((self.data, data))
-        self.pos = max(0, self.data.data.shape[0] - self.k)
+    def append_data(self, data, events=()):
+        """追加数据，events为数据中各数据段的(位置, 数据段, 触发点位置, 预触发数据点数, 触发时刻)"""
+        
+        base = self.data.dropped + len(self.data)
+        self.data.append(data)
+        self.env.update()
+        for offset, seg, trigger, npre, t in events:
+            self.events.add(base + offset, seg, trigger, npre, t)
+        self.events.trim(self.data.dropped)
+        self.pos = max(0, len(self.data) - self.k)
+        self.acc.feed([seg for offset, seg, trigger, npre, t in events])
+        
+        # 时间轴标注随数据流动，但最多每秒重绘4次背景，其余帧只绘制波形
+        if time.time() - self.bg_time > 0.25:
+            self.bg = None
+        
+        # 时间窗口内的测量结果与连续测量同步，每个闸门时间更新一次，数值不至于闪烁难读
+        if self.measuring:
+            gated = self._poll() if self.pool else self.meter.feed(data)
+        else:
+            gated = False
+        self.args = self._update(gated)
+        self.Refresh()
+    
+    def load_data(self, data):
+        """载入数据（可以是内存映射数组或按块读取的数据文件，只读取时间窗口覆盖的部分）"""
+        
+        self.data.attach(data)
+        self._rescale(full_scale(self.data.dtype))
+        self.events = EventIndex(self.data.channels)
+        self.gains = np.ones(self.data.channels)
+        self.meter.set_args(channels=self.data.channels)
+        self.env.clear()
+        self.env.update()
+        self.pos = max(0, len(self.data) - self.k)
+        self.bg = None
         self.args = self._update()
         self.Refresh()
     
     def set_pos(self, pos):
         """设置时间窗口位置"""
         
-        length = self.data.shape[0] - self.k
+        length = len(self.data) - self.k
         self.pos = int(length*pos/1000) if length > 0 else 0
+        self.bg = None
         self.args = self._update()
         self.Refresh()
         
         if self.pos == 0:
             self.parent.slider.SetValue(0)
     
+    def set_rate(self, rate):
+        """设置采样频率"""
+        
+        self.rate = rate
+        self.k = int(self.tw*self.rate/1000)
+        self.meter.set_args(rate=rate)
+        self._check_pos()
+        self.bg = None
+        self.args = self._update()
+        self.Refresh()
+    
+    def _rescale(self, full):
+        """换用满量程为full的样本格式，幅度基准按比例换算，屏幕上的波形大小不变"""
+        
+        self.scale = self.scale * full / self.full
+        self.full = full
+        self.meter.set_args(full=full)
+    
+    def set_format(self, dtype):
+        """设置样本的数据类型（清除已有数据）"""
+        
+        self.data = DataStore(dtype=dtype, budget=self.budget, channels=self.data.channels)
+        self.env = Envelope(self.data)
+        self.events = EventIndex(self.data.channels)
+        self._rescale(full_scale(dtype))
+        self.pos = 0
+        self.bg = None
+        self.args = self._update()
+        self.Refresh()
+    
+    def set_channels(self, channels):
+        """设置通道数（清除已有数据）"""
+        
+        self.data = DataStore(dtype=self.data.dtype, budget=self.budget, channels=channels)
+        self.env = Envelope(self.data)
+        self.events = EventIndex(channels)
+        self.gains = np.ones(channels)
+        self.meter.set_args(channels=channels)
+        self.pos = 0
+        self.bg = None
+        self.args = self._update()
+        self.Refresh()
+    
+    def amplitude(self, channel=None):
+        """返回与当前幅度缩放比例对应的旋钮值，指定channel时为该通道的等效值"""
+        
+        scale = self.scale if channel is None else self.scale / self.gains[channel]
+        
+        return min(max(10 * (np.log2(scale/self.full) + 10), 0), 100)
+    
+    def set_gain(self, channel, gain):
+        """设置通道的幅度缩放倍数"""
+        
+        self.gains[channel] = gain
+        self.args = self._update()
+        self.Refresh()
+    
+    def set_acquire(self, mode):
+        """设置采集方式（清除已累计的数据）"""
+        
+        self.acc.set_args(mode=mode)
+        self.args = self._update()
+        self.Refresh()
+    
+    def set_stats(self, stats):
+        """开启（stats为Stats对象）或关闭（stats为None）运行统计和统计面板"""
+        
+        self.stats = stats
+        self.Refresh()
+    
+    def set_pool(self, pool):
+        """设置分析进程池（None表示在界面线程中连续测量）"""
+        
+        self.pool = pool
+        self.measured = 0
+        self.meter.set_args()
+    
+    def _poll(self):
+        """每个闸门时间向分析进程池提交一次共享内存中最近一个闸门时间的测量任务，取回已完成的结果，有新结果时返回True"""
+        
+        head, n = self.pool.ring.head, int(self.meter.gate*self.rate)
+        if head < self.measured:
+            self.measured = 0                       # 采样器重新启动，共享内存已重新创建
+        if head - self.measured >= n and self.pool.submit('measure', head - n, head, self.rate):
+            self.measured = head
+        
+        result = self.pool.result('measure')
+        if result is None or result[1]['vpp'].shape[0] != self.data.channels:
+            return False
+        
+        self.meter.result = result[1]
+        
+        return True
+    
+    def set_measure(self, on):
+        """显示或隐藏自动测量结果"""
+        
+        self.measuring = on
+        self.meter.set_args()
+        self.measures = None
+        self.args = self._update()
+        self.Refresh()
+    
     def clear(self):
         """清除数据"""
         
-        self.data = np.array([], dtype=np.int16)
+        self.data.clear()
+        self.env.clear()
+        self.meter.reset()
+        self.acc.reset()
+        self.events.clear()
         self.pos = 0
+        self.bg = None
         self.args = self._update()
         self.Refresh()
     
-    def plot(self, dc):
-        """绘制屏幕"""
+    def _show_event(self, i):
+        """将时间窗口左侧定位到第i个触发事件的数据段起点"""
+        
+        if i < 0:
+            return
+        
+        self.pos = int(self.events[i]['start']) - self.data.dropped
+        self._check_pos()
+        self.bg = None
+        self.args = self._update()
+        self.Refresh()
+    
+    def goto_event(self, i):
+        """定位到第i个触发事件"""
+        
+        self._show_event(self.events.go(i))
+    
+    def next_event(self):
+        """定位到下一个触发事件"""
+        
+        self._show_event(self.events.next())
+    
+    def prev_event(self):
+        """定位到上一个触发事件"""
+        
+        self._show_event(self.events.prev())
+    
+    def _background(self):
+        """将中心线、网格、外边框和标注绘制到背景位图上，只在尺寸、幅度、时间窗口或位置变化时调用"""
+        
+        bmp = wx.Bitmap(max(self.scrsize[0], 1), max(self.scrsize[1], 1))
+        dc = wx.MemoryDC(bmp)
+        dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
+        dc.Clear()
         
         # 绘制中心水平线
         dc.SetPen(wx.Pen(wx.Colour(0,224,0), 1))
@@ -193,11 +411,6 @@ class Screen(wx.Panel):
         dc.DrawLineList([(self.args['left']+i*self.args['gu'], self.args['up'], self.args['left']+i*self.args['gu'], self.args['down']) for i in range(0,11)])
         dc.DrawLineList([(self.args['left'], self.args['up']+i*self.args['gv'], self.args['right'], self.args['up']+i*self.args['gv']) for i in [0,1,2,3,5,6,7,8]])
         
-        # 绘制数据
-        dc.SetPen(wx.Pen(wx.Colour(32,96,255), 1))
-        dc.DrawLines(self.args['points'])
-        dc.DrawCircle(self.args['points'][-1], 3)
-        
         # 绘制外边框
         dc.SetPen(wx.Pen(wx.Colour(224,0,0), 1))
         dc.DrawLines([
@@ -212,7 +425,7 @@ class Screen(wx.Panel):
         dc.SetTextForeground(wx.Colour(224,255,255))
         dc.SetFont(self.font)
         
-        top = 100 * self.scale / 32768
+        top = 100 * self.scale / self.full
         step = top / 4
         for i in range(9):
             label = '%.2f%%'%(top-i*step)
@@ -228,3 +441,78 @@ class Screen(wx.Panel):
             label = label.center(12)
             dc.DrawText(label, self.args['left']+i*self.args['gu']-40, self.args['b_top']-25)
             dc.DrawText(label, self.args['left']+i*self.args['gu']-40, self.args['b_bottom']+10)
+        
+        dc.SelectObject(wx.NullBitmap)
+        self.bg_time = time.time()
+        
+        return bmp
+    
+    def plot(self, dc):
+        """绘制屏幕：贴上缓存的背景位图，再绘制波形"""
+        
+        if self.bg is None:
+            self.bg = self._background()
+        dc.DrawBitmap(self.bg, 0, 0)
+        
+        # 绘制数据：每个通道一次DrawLines
+        for i, points in enumerate(self.args['points']):
+            dc.SetPen(wx.Pen(wx.Colour(*self.COLOURS[i%len(self.COLOURS)]), 1))
+            dc.DrawLines(points)
+            dc.DrawCircle(points[-1], 3)
+        
+        dc.SetTextForeground(wx.Colour(224,255,255))
+        dc.SetFont(self.font)
+        
+        # 累计的段数
+        if self.acc.n:
+            label = '%s %d/%d'%(self.acc.MODES[self.acc.mode], min(self.acc.n, self.acc.count), self.acc.count) if self.acc.mode == 1 else '%s %d'%(self.acc.MODES[self.acc.mode], self.acc.n)
+            dc.DrawText(label.rjust(16), self.args['right']-130, self.args['up']+5)
+        
+        # 触发事件数和当前事件的触发时刻
+        if len(self.events):
+            if self.events.current >= 0:
+                t = float(self.events[self.events.current]['time'])
+                label = '事件 %d/%d  %s.%03d'%(self.events.current+1, len(self.events), time.strftime('%H:%M:%S', time.localtime(t)), int((t % 1)*1000))
+            else:
+                label = '事件 %d'%len(self.events)
+            dc.DrawText(label.rjust(32), self.args['right']-250, self.args['down']-20)
+        
+        # 单独调整过幅度的通道的缩放倍数
+        for c in np.flatnonzero(self.gains != 1):
+            dc.SetTextForeground(wx.Colour(*self.COLOURS[c%len(self.COLOURS)]))
+            dc.DrawText('CH%d ×%.2f'%(c+1, self.gains[c]), self.args['left']+5, self.args['down']-20-16*(len(self.gains)-1-c))
+        dc.SetTextForeground(wx.Colour(224,255,255))
+        
+        # 运行统计面板
+        if self.stats:
+            dc.SetTextForeground(wx.Colour(160,255,160))
+            for i, line in enumerate(self.stats.lines()):
+                dc.DrawText(line, self.args['right']-300, self.args['up']+25+i*16)
+        
+        # 自动测量结果：每个通道两行，分别是时间窗口内和最近一个闸门时间的结果
+        if self.measuring:
+            rows = list()
+            for c in range(self.data.channels):
+                if self.measures is not None:
+                    rows.append((c, '窗口', self.measures))
+                rows.append((c, '连续', self.meter.result))
+            
+            for i, (c, name, result) in enumerate(rows):
+                dc.SetTextForeground(wx.Colour(*self.COLOURS[c%len(self.COLOURS)]))
+                dc.DrawText(self._measure_label(c, name, result), self.args['left']+5, self.args['up']+5+i*16)
+    
+    def _measure_label(self, c, name, result):
+        """生成一个通道的测量结果文本，幅度以满量程的百分比表示，与纵轴标注一致"""
+        
+        fs = 100 / self.full
+        items = [
+            'CH%d %s'%(c+1, name),
+            'Vpp %7.2f%%'%(result['vpp'][c]*fs),
+            'RMS %7.2f%%'%(result['rms'][c]*fs),
+            '均值 %7.2f%%'%(result['mean'][c]*fs),
+            '频率 %9.2fHz'%result['freq'][c],
+            '周期 %8.3fms'%(result['period'][c]*1000),
+            '占空比 %5.1f%%'%(result['duty'][c]*100)
+        ]
+        
+        return '  '.join(items)
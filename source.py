@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+import time
+import numpy as np
+
+from audiofile import open_file
+from formats import FORMATS, full_scale, limits, format_of, unpack24
+
+def deinterleave(buf, channels, dtype=np.int16):
+    """将交织存放的多通道数据转为(通道数, 数据点数)的跨步视图，不复制"""
+    
+    return np.frombuffer(buf, dtype=dtype).reshape(-1, channels).T
+
+class Pacer:
+    """节拍器：按speed倍速控制数据块的产出节奏，speed为0时不限速"""
+    
+    def __init__(self, rate, speed=1.0):
+        """构造函数"""
+        
+        self.rate = rate                            # 采样频率
+        self.speed = speed                          # 倍速
+        self.t0 = time.time()                       # 开始时间
+        self.n = 0                                  # 已产出的数据点数
+    
+    def wait(self, n):
+        """产出n个数据点后，等待到它们应当产出的时刻"""
+        
+        self.n += n
+        if self.speed:
+            delay = self.t0 + self.n/(self.rate*self.speed) - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+class PyAudioSource:
+    """声卡数据源"""
+    
+    def __init__(self, callback=False):
+        """构造函数"""
+        
+        self.callback = callback                    # 是否使用回调方式采集
+        self.rate = None                            # 采样频率，None表示由采样器决定
+        self.channels = None                        # 通道数，None表示由采样器决定
+        self.format = None                          # 样本格式，None表示由采样器决定
+    
+    def run(self, sampler):
+        """采集，直到sampler.running为False"""
+        
+        import pyaudio
+        
+        formats = {'int16': pyaudio.paInt16, 'int24': pyaudio.paInt24, 'float32': pyaudio.paFloat32}
+        
+        def frames(buf):
+            """将声卡缓冲区转为(通道数, 数据点数)的数组：16位和浮点样本为跨步视图，24位样本解包为int32"""
+            
+            if sampler.format == 'int24':
+                return unpack24(buf, sampler.channels)
+            
+            return deinterleave(buf, sampler.channels, FORMATS[sampler.format])
+        
+        def on_audio(in_data, frame_count, time_info, status):
+            """回调方式采集的回调函数，在PortAudio线程中执行"""
+            
+            if status & pyaudio.paInputOverflow:
+                sampler.overflows += 1
+            
+            sampler._emit(frames(in_data))
+            
+            return (None, pyaudio.paContinue if sampler.running else pyaudio.paComplete)
+        
+        pa = pyaudio.PyAudio()
+        stream = pa.open(
+            format              = formats[sampler.format], # 量化精度（16位、24位整数或32位浮点数）
+            channels            = sampler.channels, # 通道数
+            rate                = sampler.rate,     # 采样频率
+            frames_per_buffer   = sampler.chunk,    # pyAudio内部缓存的数据块大小
+            input               = True,
+            stream_callback     = on_audio if self.callback else None
+        )
+        
+        if self.callback:
+            stream.start_stream()
+            while sampler.running and stream.is_active():
+                time.sleep(0.05)
+            stream.stop_stream()
+        else:
+            while sampler.running:
+                data = stream.read(sampler.chunk, exception_on_overflow=False)
+                sampler._emit(frames(data))
+        
+        stream.close()
+        pa.terminate()
+
+class SignalSource:
+    """合成信号数据源：正弦波、方波、噪声或脉冲串，可叠加噪声，采样频率不受声卡限制"""
+    
+    KINDS = ('sine', 'square', 'noise', 'burst')
+    
+    def __init__(self, kind='sine', freq=50, amplitude=8000, noise=0, period=0.1, duty=0.1, speed=1.0, seed=None):
+        """构造函数"""
+        
+        self.kind = kind                            # 信号类型
+        self.freq = freq                            # 信号频率（Hz）
+        self.amplitude = amplitude                  # 信号幅度（以int16满量程32768为基准，按样本格式换算）
+        self.noise = noise                          # 叠加的高斯噪声标准差
+        self.period = period                        # 脉冲串周期（秒）
+        self.duty = duty                            # 脉冲串占空比
+        self.speed = speed                          # 倍速，0表示不限速
+        self.rng = np.random.default_rng(seed)      # 随机数发生器
+        self.rate = None                            # 采样频率，None表示由采样器决定
+        self.channels = None                        # 通道数，None表示由采样器决定
+        self.format = None                          # 样本格式，None表示由采样器决定
+    
+    def generate(self, n0, n, rate, channels, dtype=np.int16):
+        """生成从第n0个数据点开始的n个数据点，形状为(通道数, n)，各通道依次相移90度"""
+        
+        t = (n0 + np.arange(n)) / rate
+        phase = 2*np.pi*self.freq*t + (np.pi/2)*np.arange(channels)[:, np.newaxis]
+        
+        if self.kind == 'square':
+            y = self.amplitude * np.where(np.sin(phase) >= 0, 1.0, -1.0)
+        elif self.kind == 'noise':
+            y = self.amplitude/3 * self.rng.standard_normal((channels, n))
+        elif self.kind == 'burst':
+            y = self.amplitude * np.sin(phase) * (np.mod(t, self.period) < self.period*self.duty)
+        else:
+            y = self.amplitude * np.sin(phase)
+        
+        if self.noise:
+            y = y + self.noise * self.rng.standard_normal((channels, n))
+        
+        return np.clip(y*(full_scale(dtype)/32768), *limits(dtype)).astype(dtype)
+    
+    def run(self, sampler):
+        """产出数据，直到sampler.running为False"""
+        
+        pacer = Pacer(sampler.rate, self.speed)
+        while sampler.running:
+            sampler._emit(self.generate(pacer.n, sampler.chunk, sampler.rate, sampler.channels, sampler.dtype))
+            pacer.wait(sampler.chunk)
+
+class ReplaySource:
+    """回放数据源：以1倍、N倍或不限速回放.osc录音文件、.npy、WAV或FLAC文件"""
+    
+    def __init__(self, path, speed=1.0, loop=False, rate=44100):
+        """构造函数，rate为.npy文件的采样频率（其它文件以文件头为准）"""
+        
+        self.path = path                            # 文件路径
+        self.speed = speed                          # 倍速，0表示不限速
+        self.loop = loop                            # 是否循环回放
+        self.data = open_file(path)                 # 按块读取的数据文件
+        self.rate = getattr(self.data, 'rate', rate) # 采样频率
+        self.channels = self.data.channels          # 通道数
+        self.format = format_of(self.data.dtype)    # 样本格式
+    
+    def chunks(self, chunk):
+        """逐块读出文件中的数据，形状为(通道数, 数据点数)"""
+        
+        for i in range(0, self.data.length, chunk):
+            yield self.data.read(i, i+chunk)
+    
+    def run(self, sampler):
+        """回放，直到文件结束（循环回放时直到sampler.running为False）"""
+        
+        pacer = Pacer(self.rate, self.speed)
+        while sampler.running:
+            for data in self.chunks(sampler.chunk):
+                if not sampler.running:
+                    break
+                sampler._emit(data)
+                pacer.wait(data.shape[1])
+            
+            if not self.loop:
+                break
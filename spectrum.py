@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+class Spectrum:
+    """频谱分析器：随数据块到达增量计算加窗、重叠的rfft帧，可选平均
+    
+    窗函数、帧缓冲区和输出缓冲区都预先分配并重复使用，每帧的计算量与累计数据长度无关。
+    """
+    
+    def __init__(self, rate=44100, nfft=8192, overlap=0.5, average=0.2, channels=1, full=32768):
+        """构造函数"""
+        
+        self.rate = rate                            # 采样频率
+        self.nfft = nfft                            # 每帧数据点数
+        self.overlap = overlap                      # 相邻帧的重叠比例
+        self.average = average                      # 指数平均系数，1表示不平均
+        self.channels = channels                    # 通道数
+        self.full = full                            # 样本格式的满量程
+        self.reset()
+    
+    def reset(self):
+        """按当前参数重新分配缓冲区"""
+        
+        self.hop = max(int(self.nfft*(1 - self.overlap)), 1) # 帧移
+        self.window = np.hanning(self.nfft)         # 窗函数
+        self.norm = 2 / (self.window.sum() * self.full) # 幅度归一化系数（相对满量程）
+        self.freqs = np.fft.rfftfreq(self.nfft, 1/self.rate) # 各频点的频率
+        self.tail = np.zeros((self.channels, 0))    # 尚未构成完整帧的数据
+        self.work = np.empty(self.nfft)             # 加窗后的帧
+        self.mag = np.empty((self.channels, self.nfft//2 + 1)) # 单帧幅度谱
+        self.avg = np.zeros((self.channels, self.nfft//2 + 1)) # 平均后的幅度谱
+        self.db = np.empty((self.channels, self.nfft//2 + 1)) # 平均后的分贝谱
+        self.frames = 0                             # 已计算的帧数
+    
+    def set_args(self, **kwds):
+        """设置参数"""
+        
+        for key in ('rate', 'nfft', 'overlap', 'average', 'channels', 'full'):
+            if key in kwds:
+                setattr(self, key, kwds[key])
+        
+        if set(kwds) & {'rate', 'nfft', 'overlap', 'channels', 'full'}:
+            self.reset()
+    
+    def iterframes(self, data):
+        """送入形状为(通道数, 数据点数)的数据块，逐帧产出幅度谱(通道数, 频点数)
+        
+        产出的是同一个缓冲区，下一帧时被覆盖。
+        """
+        
+        data = np.reshape(data, (self.channels, -1))
+        buf = np.concatenate((self.tail, data), axis=1)
+        n = (buf.shape[1] - self.nfft) // self.hop + 1 if buf.shape[1] >= self.nfft else 0
+        self.tail = buf[:, n*self.hop:]
+        
+        for i in range(n):
+            for c in range(self.channels):
+                np.multiply(buf[c, i*self.hop:i*self.hop+self.nfft], self.window, out=self.work)
+                np.abs(np.fft.rfft(self.work), out=self.mag[c])
+            self.mag *= self.norm
+            self.frames += 1
+            
+            yield self.mag
+    
+    def feed(self, data):
+        """送入形状为(通道数, 数据点数)的数据块，更新平均后的幅度谱，返回新计算的帧数"""
+        
+        n = 0
+        for mag in self.iterframes(data):
+            if self.frames == 1 or self.average >= 1:
+                self.avg[:] = mag
+            else:
+                self.avg *= 1 - self.average
+                self.avg += self.average * mag
+            n += 1
+        
+        return n
+    
+    def decibel(self, floor=-140):
+        """返回平均后的幅度谱（dBFS）"""
+        
+        np.maximum(self.avg, 10**(floor/20), out=self.db)
+        np.log10(self.db, out=self.db)
+        self.db *= 20
+        
+        return self.db
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import wx
+
+class SpritePanel(wx.Panel):
+    """用预先合成的位图绘制的控件基类：每个值的完整外观合成一次并缓存，值变化事件每帧最多发出一次
+    
+    子类须设置EVENT并实现_sprite(value)，value即当前值，须可作为字典的键。
+    连续操作期间的多次变化合并为一次事件，携带最新的值；若一帧之内值又回到上次发出的值（如快速连点两次开关），
+    则不发出事件：事件处理方从未收到中间的值，其状态（如采样器是否在运行）与控件显示的值仍然一致。
+    """
+    
+    EVENT = None                                    # 值变化事件的(事件类, 事件类型)，由子类设置
+    
+    def __init__(self, parent, id, value, pos, size):
+        """构造函数"""
+        
+        wx.Panel.__init__(self, parent, id, pos, size, style=wx.NO_FULL_REPAINT_ON_RESIZE)
+        
+        self._value = value
+        self.sprites = dict()                       # 各值对应的合成位图
+        self.interval = 33                          # 值变化事件的最短间隔（毫秒）
+        self.pending = False                        # 是否已有待发出的值变化事件
+        self.sent = value                           # 最近一次发出的值
+        
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+    
+    def _sprite(self, value):
+        """合成值为value时控件的完整外观"""
+        
+        raise NotImplementedError
+    
+    def _notify(self):
+        """值变化后在下一帧发出事件，期间的多次变化合并为一次，携带最新的值"""
+        
+        if not self.pending:
+            self.pending = True
+            wx.CallLater(self.interval, self._fire)
+    
+    def _fire(self):
+        """发出值变化事件，值与上次发出的相同时不发出"""
+        
+        self.pending = False
+        if not self or self._value == self.sent:
+            return
+        
+        self.sent = self._value
+        cls, kind = self.EVENT
+        event = cls(kind, self.GetId())
+        event.SetEventObject(self)
+        event.SetValue(self._value)
+        self.GetEventHandler().ProcessEvent(event)
+    
+    def SetValue(self, value):
+        """设置当前值（不发出事件）"""
+        
+        self._value = value
+        self.sent = value
+        self.Refresh()
+    
+    def GetValue(self):
+        """返回当前值"""
+        
+        return self._value
+    
+    def on_paint(self, evt):
+        """响应重绘事件"""
+        
+        if self._value not in self.sprites:
+            self.sprites[self._value] = self._sprite(self._value)
+        
+        dc = wx.PaintDC(self)
+        dc.DrawBitmap(self.sprites[self._value], 0, 0)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import bisect
+
+class Histogram:
+    """按2的幂分桶的耗时直方图（毫秒）：首个桶统计1ms以下，第i个桶统计[2^(i-1), 2^i)ms，最后一个桶统计2048ms以上"""
+    
+    EDGES = [2**i for i in range(12)]               # 各桶的上界（毫秒）
+    
+    def __init__(self):
+        """构造函数"""
+        
+        self.reset()
+    
+    def reset(self):
+        """清零"""
+        
+        self.counts = [0] * (len(self.EDGES) + 1)   # 各桶的计数
+        self.n = 0                                  # 总计数
+        self.total = 0.0                            # 总耗时（毫秒）
+        self.peak = 0.0                             # 最大耗时（毫秒）
+    
+    def add(self, ms):
+        """记录一次耗时"""
+        
+        self.counts[bisect.bisect_right(self.EDGES, ms)] += 1
+        self.n += 1
+        self.total += ms
+        self.peak = max(self.peak, ms)
+    
+    def percentile(self, p):
+        """返回第p百分位数所在桶的上界（毫秒），最后一个桶以最大耗时代替"""
+        
+        if self.n == 0:
+            return 0.0
+        
+        k, acc = p * self.n / 100, 0
+        for i, count in enumerate(self.counts):
+            acc += count
+            if acc >= k:
+                return float(self.EDGES[i]) if i < len(self.EDGES) else self.peak
+        
+        return self.peak
+    
+    def summary(self):
+        """返回可序列化为JSON的统计结果"""
+        
+        return {
+            'n': self.n,
+            'mean': self.total / self.n if self.n else 0.0,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': self.peak,
+            'buckets': self.counts
+        }
+
+class Stats:
+    """流水线运行统计：输入输出数据块速率、数据队列深度的高水位、声卡溢出和丢弃计数、采集到显示的延迟、绘图参数更新和绘制耗时
+    
+    数据块计数取自采样器的数据队列；渲染调度器和屏幕各自持有stats引用，为None时不做任何统计，开销只是一次判断。
+    """
+    
+    def __init__(self, sampler, log=None):
+        """构造函数，sampler为采样器（读取数据队列的计数和溢出次数），log为JSON Lines日志文件路径"""
+        
+        self.sampler = sampler                      # 采样器
+        self.log = log                              # 日志文件路径，None表示不记录
+        self.captured = None                        # 已取出、尚未显示的最早数据块的入队时刻
+        self.latency = Histogram()                  # 采集到显示的延迟
+        self.update = Histogram()                   # 绘图参数更新耗时
+        self.paint = Histogram()                    # 屏幕绘制耗时
+        self.last = (time.perf_counter(), 0, 0)     # 上次快照的时刻、放入和取出的数据块数
+        self.result = None                          # 最近一次快照
+    
+    def received(self, t):
+        """取出一批数据之后调用，t为其中最早数据块的入队时刻"""
+        
+        if self.captured is None:
+            self.captured = t
+    
+    def painted(self, t0):
+        """屏幕绘制（无界面采集时为提交写盘）完成后调用，t0为开始的时刻"""
+        
+        now = time.perf_counter()
+        self.paint.add((now - t0) * 1000)
+        if self.captured is not None:
+            self.latency.add((now - self.captured) * 1000)
+            self.captured = None
+    
+    def snapshot(self):
+        """生成本统计周期的快照，写入日志，并开始新的统计周期"""
+        
+        dq = self.sampler.dq
+        now = time.perf_counter()
+        t, chunks_in, chunks_out = self.last
+        if dq.chunks_in < chunks_in:
+            chunks_in = chunks_out = 0              # 采样器重新启动，数据队列的计数已清零
+        elapsed = max(now - t, 1e-9)
+        
+        self.result = {
+            'time': time.time(),
+            'elapsed': elapsed,
+            'policy': dq.policy,
+            'chunks_in': dq.chunks_in,
+            'chunks_out': dq.chunks_out,
+            'rate_in': (dq.chunks_in - chunks_in) / elapsed,
+            'rate_out': (dq.chunks_out - chunks_out) / elapsed,
+            'samples_in': dq.samples_in,
+            'samples_out': dq.samples_out,
+            'depth': dq.qsize(),
+            'high': dq.peak(),
+            'overflows': self.sampler.overflows,
+            'dropped': dq.dropped,
+            'lost': dq.lost,
+            'merged': dq.merged,
+            'latency': self.latency.summary(),
+            'update': self.update.summary(),
+            'paint': self.paint.summary()
+        }
+        
+        self.last = (now, dq.chunks_in, dq.chunks_out)
+        self.latency.reset()
+        self.update.reset()
+        self.paint.reset()
+        
+        if self.log:
+            with open(self.log, 'a') as fp:
+                fp.write(json.dumps(self.result) + '\n')
+        
+        return self.result
+    
+    def lines(self):
+        """最近一次快照的文本，每行一项，用于屏幕上的统计面板"""
+        
+        r = self.result
+        if r is None:
+            return list()
+        
+        return [
+            '输入 %7.1f 块/秒'%r['rate_in'],
+            '输出 %7.1f 块/秒'%r['rate_out'],
+            '队列 %d  高水位 %d  %s'%(r['depth'], r['high'], r['policy']),
+            '溢出 %d  丢弃 %d块/%d点'%(r['overflows'], r['dropped'], r['lost']),
+            '延迟 p50<%gms p99<%gms 最大%.1fms'%(r['latency']['p50'], r['latency']['p99'], r['latency']['max']),
+            '更新 %.2fms  最大%.2fms'%(r['update']['mean'], r['update']['max']),
+            '绘制 %.2fms  最大%.2fms'%(r['paint']['mean'], r['paint']['max'])
+        ]
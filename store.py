@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+class DataStore:
+    """采样数据存储器：容量按几何级数增长的预分配缓冲区，追加操作均摊O(1)
+    
+    数据按通道优先存放，形状为(通道数, 数据点数)，切片作用于数据点所在的轴。
+    """
+    
+    def __init__(self, dtype=np.int16, capacity=65536, budget=None, channels=1):
+        """构造函数"""
+        
+        self.dtype = np.dtype(dtype)                # 数据类型
+        self.budget = budget                        # 内存预算（字节），None表示不限
+        self.channels = channels                    # 通道数
+        self.capacity = capacity                    # 初始容量（不超过内存预算）
+        self.buf = np.empty((channels, self._initial()), dtype=self.dtype) # 预分配缓冲区
+        self.mapped = False                         # 缓冲区是否为内存映射文件
+        self.size = 0                               # 有效数据点数
+        self.dropped = 0                            # 超出内存预算而丢弃的最早数据点数
+    
+    def __len__(self):
+        """返回每个通道的有效数据点数"""
+        
+        return self.size
+    
+    def __getitem__(self, key):
+        """返回数据切片（缓冲区视图，不复制数据；外部数据文件只读取切片覆盖的部分）"""
+        
+        if isinstance(key, slice) and (key.step or 1) > 0:
+            return self.buf[:, slice(*key.indices(self.size))]
+        
+        return self.buf[:, :self.size][:, key]
+    
+    @property
+    def shape(self):
+        """数据形状"""
+        
+        return (self.channels, self.size)
+    
+    def _limit(self):
+        """返回内存预算允许的每通道数据点数，不限时返回None"""
+        
+        return max(1, self.budget // (self.dtype.itemsize*self.channels)) if self.budget else None
+    
+    def _initial(self):
+        """返回初始缓冲区容量：不超过内存预算"""
+        
+        limit = self._limit()
+        return min(self.capacity, limit) if limit else self.capacity
+    
+    def _reserve(self, extra):
+        """确保缓冲区可以再容纳extra个数据点，超出内存预算时丢弃最早的数据；每次扩大都不超过内存预算"""
+        
+        limit = self._limit()
+        
+        if limit and self.size + extra > limit:
+            keep = max(0, min(self.size, limit//2, limit - extra))
+            self.buf[:, :keep] = self.buf[:, self.size-keep:self.size]
+            self.dropped += self.size - keep
+            self.size = keep
+            extra = min(extra, limit)
+        
+        if self.size + extra > self.buf.shape[1]:
+            capacity = max(self.size + extra, 2*self.buf.shape[1])
+            if limit:
+                capacity = min(capacity, limit)     # 丢弃最早的数据后self.size + extra不超过limit
+            
+            buf = np.empty((self.channels, capacity), dtype=self.dtype)
+            buf[:, :self.size] = self.buf[:, :self.size]
+            self.buf = buf
+            self.mapped = False
+    
+    def append(self, data):
+        """追加数据：形状为(通道数, 数据点数)，单通道时也可以是一维数组"""
+        
+        data = np.asarray(data).reshape(self.channels, -1)
+        self._reserve(data.shape[1])
+        
+        space = self.buf.shape[1] - self.size
+        if data.shape[1] > space:
+            self.dropped += data.shape[1] - space
+            data = data[:, data.shape[1]-space:]
+        
+        self.buf[:, self.size:self.size+data.shape[1]] = data
+        self.size += data.shape[1]
+    
+    def values(self):
+        """返回全部有效数据（缓冲区视图）"""
+        
+        return self.buf[:, :self.size]
+    
+    def attach(self, array):
+        """以外部数组（如np.load(..., mmap_mode='r')返回的内存映射）作为全部数据，不复制
+        
+        数组形状为(数据点数,)或按帧存放的(数据点数, 通道数)，后者以转置视图访问。
+        也可以是形状为(通道数, 数据点数)、支持切片的数据文件对象（如OscFile），切片时才读取数据。
+        此后追加数据将把已有数据复制到内存中的新缓冲区。
+        """
+        
+        self.dtype = array.dtype
+        if isinstance(array, np.ndarray):
+            self.buf = array[np.newaxis, :] if array.ndim == 1 else array.T
+        else:
+            self.buf = array
+        self.channels, self.size = self.buf.shape
+        self.dropped = 0
+        self.mapped = isinstance(array, np.memmap) or not isinstance(array, np.ndarray)
+    
+    def clear(self):
+        """清除数据"""
+        
+        if self.mapped:
+            self.buf = np.empty((self.channels, self._initial()), dtype=self.dtype)
+            self.mapped = False
+        
+        self.size = 0
+        self.dropped = 0
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+import numpy as np
+
+from chunkqueue import ChunkQueue
+
+def chunk(start, n, channels=1):
+    """生成内容为写入计数的数据块，便于核对取出的数据"""
+    
+    return np.tile(np.arange(start, start + n, dtype=np.int16), (channels, 1))
+
+def test_take_concatenates_chunks_across_wraparound():
+    """数据块在缓冲区末尾回绕，取出时首尾相接合并为一个数组"""
+    
+    dq = ChunkQueue(capacity=100, channels=2)
+    dq.put(chunk(0, 70, 2))
+    dq.take()
+    dq.put(chunk(70, 30, 2))
+    dq.put(chunk(100, 50, 2))
+    
+    data, marks, t = dq.take()
+    assert data.shape == (2, 80)
+    assert (data == chunk(70, 80, 2)).all()
+    assert marks == [] and t is not None
+    assert (dq.chunks_in, dq.samples_in, dq.chunks_out, dq.samples_out) == (3, 150, 3, 150)
+    assert dq.take() == (None, [], None)
+
+def test_drop_discards_oldest_chunks():
+    """drop策略：缓冲区满时丢弃最早的数据块，计入丢弃的块数和点数"""
+    
+    dq = ChunkQueue(capacity=100, policy='drop')
+    for i in range(3):
+        dq.put(chunk(40*i, 40))
+    
+    data, marks, t = dq.take()
+    assert (data == chunk(40, 80)).all()
+    assert (dq.dropped, dq.lost) == (1, 40)
+    assert (dq.chunks_in, dq.chunks_out) == (3, 2)
+
+def test_drop_on_item_limit():
+    """项数达到上限时同样丢弃最早的数据块"""
+    
+    dq = ChunkQueue(capacity=1000, items=2, policy='drop')
+    for i in range(5):
+        dq.put(chunk(10*i, 10))
+    
+    assert dq.qsize() == 2
+    assert (dq.dropped, dq.lost) == (3, 30)
+    assert (dq.take()[0] == chunk(30, 20)).all()
+
+def test_merge_joins_untagged_chunks_and_keeps_marks():
+    """merge策略：相邻的无标记数据块合并为一项，带标记的数据块单独成项并连同标记取出"""
+    
+    dq = ChunkQueue(capacity=1000, items=2, policy='merge')
+    for i in range(4):
+        dq.put(chunk(10*i, 10))
+    dq.put(chunk(40, 5), tag='a')
+    dq.put(chunk(45, 5))
+    
+    assert dq.merged == 3
+    assert (dq.dropped, dq.lost) == (4, 40)
+    data, marks, t = dq.take()
+    assert (data == chunk(40, 10)).all()
+    assert marks == [(0, 5, 'a')]
+    assert dq.chunks_out == 2
+
+def test_merge_overflow_drops_like_drop():
+    """merge策略下缓冲区满时同drop，合并项中的数据块全部计入丢弃"""
+    
+    dq = ChunkQueue(capacity=100, policy='merge')
+    for i in range(4):
+        dq.put(chunk(30*i, 30))
+    
+    assert dq.qsize() == 1
+    assert (dq.dropped, dq.lost) == (3, 90)
+    assert (dq.take()[0] == chunk(90, 30)).all()
+
+def test_block_waits_for_consumer():
+    """block策略：缓冲区满时生产者等待消费者取走数据，不丢弃"""
+    
+    dq = ChunkQueue(capacity=100, policy='block', timeout=5)
+    dq.put(chunk(0, 80))
+    
+    taken = list()
+    def consume():
+        time.sleep(0.1)
+        taken.append(dq.take()[0])
+    
+    thread = threading.Thread(target=consume)
+    thread.start()
+    t0 = time.perf_counter()
+    dq.put(chunk(80, 40))
+    thread.join()
+    
+    assert time.perf_counter() - t0 >= 0.05
+    assert dq.dropped == 0
+    assert (taken[0] == chunk(0, 80)).all()
+    assert (dq.take()[0] == chunk(80, 40)).all()
+
+def test_block_drops_after_timeout():
+    """block策略：超过timeout秒仍无空间时丢弃最早的数据块"""
+    
+    dq = ChunkQueue(capacity=100, policy='block', timeout=0.05)
+    dq.put(chunk(0, 80))
+    dq.put(chunk(80, 40))
+    
+    assert (dq.dropped, dq.lost) == (1, 80)
+
+def test_block_without_wait_drops_immediately():
+    """block策略下放入时指定不等待（声卡回调），缓冲区满时立即同drop"""
+    
+    dq = ChunkQueue(capacity=100, policy='block', timeout=5)
+    dq.put(chunk(0, 80), wait=False)
+    t0 = time.perf_counter()
+    dq.put(chunk(80, 40), wait=False)
+    
+    assert time.perf_counter() - t0 < 1
+    assert (dq.dropped, dq.lost) == (1, 80)
+
+def test_grow_for_long_chunk_keeps_queued_data():
+    """放入长于容量的数据块时扩大缓冲区，保留队列中已有的数据"""
+    
+    dq = ChunkQueue(capacity=64)
+    dq.put(chunk(0, 10))
+    dq.put(chunk(10, 100))
+    
+    assert dq.capacity == 128 and dq.dropped == 0
+    assert (dq.take()[0] == chunk(0, 110)).all()
+
+def test_peak_resets_to_current_depth():
+    """高水位取出后复位为当前项数"""
+    
+    dq = ChunkQueue(capacity=1000)
+    for i in range(3):
+        dq.put(chunk(10*i, 10))
+    dq.take()
+    dq.put(chunk(30, 10))
+    
+    assert dq.peak() == 3
+    assert dq.peak() == 1
+
+def test_reset_clears_counters_and_changes_layout():
+    """复位清空队列和计数，按新的通道数和数据类型重新分配缓冲区"""
+    
+    dq = ChunkQueue(capacity=100, policy='drop')
+    for i in range(3):
+        dq.put(chunk(40*i, 40))
+    dq.reset(3, np.float32)
+    
+    assert dq.empty()
+    assert (dq.chunks_in, dq.dropped, dq.lost) == (0, 0, 0)
+    dq.put(np.ones((3, 5), dtype=np.float32))
+    data = dq.take()[0]
+    assert data.shape == (3, 5) and data.dtype == np.float32
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+import filters
+from filters import PRESETS, FilterChain
+
+def reference(sos, x, zi):
+    """逐点计算的直接II型转置级联二阶节，作为对照"""
+    
+    y = np.array(x, dtype=np.float64)
+    zf = np.array(zi, dtype=np.float64)
+    for i, (b0, b1, b2, a0, a1, a2) in enumerate(sos):
+        for n in range(y.shape[1]):
+            u = y[:, n].copy()
+            y[:, n] = b0*u + zf[i, :, 0]
+            zf[i, :, 0] = b1*u - a1*y[:, n] + zf[i, :, 1]
+            zf[i, :, 1] = b2*u - a2*y[:, n]
+    
+    return y, zf
+
+def signal(n, channels=2, seed=0):
+    """直流偏置、工频干扰和噪声叠加的测试信号，浮点样本以1为满量程"""
+    
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / 8000
+    x = 0.2 + 0.25*np.sin(2*np.pi*50*t) + 0.125*np.sin(2*np.pi*440*t) + 0.03*rng.standard_normal((channels, n))
+    
+    return x.astype(np.float32)
+
+@pytest.fixture
+def numpy_only(monkeypatch):
+    """强制使用NumPy整块计算"""
+    
+    monkeypatch.setattr(filters, 'signal', None)
+
+def chain(names, channels=2):
+    """按预设滤波器构造8kHz采样的滤波器"""
+    
+    return FilterChain(8000, channels, names)
+
+@pytest.mark.parametrize('names', [['highpass'], ['lowpass'], ['notch50'], list(PRESETS)])
+def test_numpy_matches_reference(numpy_only, names):
+    """NumPy整块计算与逐点计算的输出和块末状态一致"""
+    
+    f = chain(names)
+    x = signal(700).astype(np.float64)
+    zi = f.steady(x[:, 0])
+    y, zf = f._sosfilt(x, zi)
+    ry, rzf = reference(f.sos, x, zi)
+    
+    assert np.allclose(y, ry, rtol=0, atol=1e-6*np.abs(ry).max())
+    assert np.allclose(zf, rzf, rtol=0, atol=1e-6*np.abs(rzf).max())
+
+def test_numpy_matches_sosfilt(monkeypatch):
+    """NumPy整块计算与scipy.signal.sosfilt的结果相同"""
+    
+    sp = pytest.importorskip('scipy.signal')
+    f = chain(list(PRESETS))
+    x = signal(4096).astype(np.float64)
+    zi = f.steady(x[:, 0])
+    y, zf = sp.sosfilt(f.sos, x, axis=1, zi=zi)
+    
+    monkeypatch.setattr(filters, 'signal', None)
+    ny, nzf = f._sosfilt(x, zi)
+    
+    assert np.allclose(ny, y, rtol=0, atol=1e-6*np.abs(y).max())
+    assert np.allclose(nzf, zf, rtol=0, atol=1e-6*np.abs(zf).max())
+
+def test_chunked_equals_one_shot(numpy_only):
+    """逐块处理时滤波状态跨块延续，结果与一次处理整段数据相同"""
+    
+    x = signal(20000)
+    whole = chain(['highpass', 'notch50']).process(x)
+    
+    f = chain(['highpass', 'notch50'])
+    sizes = [1, 2, 441, 1000, 3, 4096, 4096, 777]
+    parts, i = list(), 0
+    for n in sizes + [x.shape[1] - sum(sizes)]:
+        parts.append(f.process(x[:, i:i+n]))
+        i += n
+    
+    assert np.allclose(np.concatenate(parts, axis=1), whole, rtol=0, atol=1e-3*np.abs(whole).max())
+
+def test_notch_and_highpass_remove_interference(numpy_only):
+    """高通滤除直流，陷波滤除50Hz干扰，440Hz信号基本保留"""
+    
+    x = signal(16000)
+    y = chain(['highpass', 'notch50']).process(x)[:, 8000:].astype(np.float64)
+    spectrum = np.abs(np.fft.rfft(y, axis=1)) / y.shape[1]
+    freqs = np.fft.rfftfreq(y.shape[1], 1/8000)
+    
+    assert abs(y.mean()) < 1e-3
+    assert (spectrum[:, freqs == 50] < 1e-3).all()
+    assert (spectrum[:, freqs == 440] > 0.05).all()
+
+def test_integer_output_is_clipped_and_rounded(numpy_only):
+    """整数数据滤波后取整并削波，数据类型不变"""
+    
+    f = chain(['lowpass'], channels=1)
+    x = np.zeros((1, 400), dtype=np.int16)
+    x[0, 200:] = 32767
+    y = f.process(x)
+    
+    assert y.dtype == np.int16
+    assert y.max() == 32767 and y.min() >= -32768
+
+def test_no_filters_passes_data_through():
+    """未启用滤波器时原样返回"""
+    
+    x = signal(100)
+    assert chain([]).process(x) is x
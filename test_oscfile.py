@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import os
+import numpy as np
+import pytest
+
+from oscfile import CODECS, encode, decode, OscWriter, OscFile
+
+def noise(dtype, shape, seed=0):
+    """生成覆盖整个取值范围的随机数据，差分时会溢出回绕"""
+    
+    rng = np.random.default_rng(seed)
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return rng.standard_normal(shape).astype(dtype)
+    
+    info = np.iinfo(dtype)
+    return rng.integers(info.min, info.max, size=shape, endpoint=True, dtype=dtype)
+
+@pytest.mark.parametrize('codec', list(CODECS))
+@pytest.mark.parametrize('dtype', [np.int16, np.int32, np.float32])
+def test_encode_decode_round_trip(dtype, codec):
+    """差分、按字节重排、压缩之后解压还原，整数差分溢出回绕也无损"""
+    
+    data = noise(dtype, (2, 5000))
+    data[:, 0] = np.iinfo(dtype).max if np.dtype(dtype).kind == 'i' else 0
+    out = decode(encode(data, codec), data.shape, dtype, codec)
+    
+    assert out.dtype == np.dtype(dtype)
+    assert (out == data).all()
+
+def test_encode_without_delta():
+    """不差分时同样无损"""
+    
+    data = noise(np.int16, (1, 1000))
+    assert (decode(encode(data, delta=False), data.shape, np.int16, delta=False) == data).all()
+
+def test_delta_shrinks_smooth_signal():
+    """平滑信号差分后压缩得更小"""
+    
+    data = (np.sin(np.arange(65536)/50)*20000).astype(np.int16)[np.newaxis]
+    assert len(encode(data)) < len(encode(data, delta=False))
+
+def write(path, data, **kwds):
+    """按不规则长度的数据块写入录音文件"""
+    
+    writer = OscWriter(path, data.shape[0], 48000, data.dtype, block=1000, step=100, **kwds)
+    i = 0
+    for n in (1, 999, 1500, 37, 2463):
+        writer.write(data[:, i:i+n])
+        i += n
+    writer.write(data[:, i:])
+    writer.close()
+
+def test_file_round_trip_and_block_index(tmp_path):
+    """写入后按块读回：头部、块索引（位置、数据点数、最小值、最大值）和任意切片都与原数据一致"""
+    
+    path = str(tmp_path/'a.osc')
+    data = noise(np.int16, (2, 5500))
+    write(path, data, meta={'mode': 'trigger'})
+    
+    f = OscFile(path, ahead=0)
+    assert (f.rate, f.channels, f.dtype, f.length) == (48000, 2, np.dtype(np.int16), 5500)
+    assert f.meta == {'mode': 'trigger'}
+    assert list(f.index['count']) == [1000]*5 + [500]
+    assert list(f.starts) == [0, 1000, 2000, 3000, 4000, 5000, 5500]
+    for i, (a, b) in enumerate(zip(f.starts[:-1], f.starts[1:])):
+        assert (f.index['min'][i] == data[:, a:b].min(axis=1)).all()
+        assert (f.index['max'][i] == data[:, a:b].max(axis=1)).all()
+    
+    assert (f[:, :] == data).all()
+    assert (f[:, 999:1001] == data[:, 999:1001]).all()
+    assert (f[1, 2500:4700:3] == data[1, 2500:4700:3]).all()
+    
+    lo, hi, pos = f.summary(0, f.length, size=100)
+    assert list(pos[:3]) == [0, 100, 200]
+    assert (lo[:, 11] == data[:, 1100:1200].min(axis=1)).all()
+    assert (hi[:, -1] == data[:, 5400:].max(axis=1)).all()
+    f.close()
+
+def test_file_without_index_is_recovered(tmp_path):
+    """录制中断、没有写入块索引的文件，依次读取块头重建索引，不完整的末块被舍弃"""
+    
+    path = str(tmp_path/'b.osc')
+    data = noise(np.float32, (1, 4200))
+    write(path, data)
+    
+    size = os.path.getsize(path)
+    f = OscFile(path, ahead=0)
+    end = int(f.index['offset'][-1])
+    f.close()
+    with open(path, 'r+b') as fp:
+        fp.truncate(end + 10)
+    assert os.path.getsize(path) < size
+    
+    f = OscFile(path, ahead=0)
+    assert f.length == 4000
+    assert (f[:, :] == data[:, :4000]).all()
+    f.close()
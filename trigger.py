@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+class Trigger:
+    """触发器：在连续的数据块中定位触发点，输出以触发点对齐的数据段
+    
+    数据块和数据段的形状均为(通道数, 数据点数)，触发点由触发源通道决定。
+    """
+    
+    def __init__(self, length=1411, level=16, hysteresis=8, edge=0, pre=0.25, holdoff=0, sweep=0, auto=4410, source=0):
+        """构造函数"""
+        
+        self.length = length                        # 输出数据段长度
+        self.level = level                          # 触发电平
+        self.hysteresis = hysteresis                # 触发迟滞：信号须先越过 level∓hysteresis 才能再次触发
+        self.edge = edge                            # 触发沿：0 - 上升沿，1 - 下降沿，2 - 双沿
+        self.pre = pre                              # 预触发深度（占数据段长度的比例）
+        self.holdoff = holdoff                      # 触发释抑时间（数据点数）
+        self.sweep = sweep                          # 扫描方式：0 - 常规，1 - 单次，2 - 自动
+        self.auto = auto                            # 自动扫描方式下无触发时强制输出的间隔（数据点数）
+        self.source = source                        # 触发源通道
+        self.channels = 1                           # 通道数
+        self.changes = None                         # 待生效的参数，在下一个数据块开始处理时生效
+        self.reset()
+    
+    def reset(self):
+        """复位状态"""
+        
+        self.npre = int(self.length * self.pre)     # 预触发数据点数
+        self.hist = np.zeros((self.channels, self.npre), dtype=np.int32) # 最近的npre个数据点
+        self.n = 0                                  # 已处理的数据点数
+        self.armed = [False, False]                 # 上升沿、下降沿的预备状态
+        self.next = 0                               # 允许下一次触发的最早位置
+        self.last = 0                               # 最近一次触发的位置
+        self.seg = None                             # 正在填充的数据段
+        self.fill = 0                               # 正在填充的数据段已有的数据点数
+        self.done = False                           # 单次扫描方式下已完成触发
+        self.marks = list()                         # 最近一次process输出的各数据段的(触发点位置, 预触发数据点数)
+    
+    def set_args(self, **kwds):
+        """设置参数（线程安全：参数在下一个数据块开始处理时生效）"""
+        
+        changes = dict(self.changes or {})
+        changes.update(kwds)
+        self.changes = changes
+    
+    def arm(self):
+        """单次扫描方式下重新预备触发"""
+        
+        self.set_args(done=False)
+    
+    def _apply(self):
+        """使待生效的参数生效"""
+        
+        changes, self.changes = self.changes, None
+        done = changes.pop('done', self.done)
+        
+        for key in changes:
+            setattr(self, key, changes[key])
+        
+        if set(changes) & {'length', 'pre'}:
+            self.reset()
+        
+        self.done = done
+    
+    def _crossings(self, x, i):
+        """返回数据块中触发沿i（0 - 上升沿，1 - 下降沿）的全部触发点，并更新预备状态"""
+        
+        if i == 0:
+            above, below = x >= self.level, x < self.level - self.hysteresis
+        else:
+            above, below = x <= self.level, x > self.level + self.hysteresis
+        
+        # 1 - 预备，2 - 越过电平；触发点是紧跟在预备之后的第一个越过电平的点
+        mark = np.where(below, 1, np.where(above, 2, 0))
+        idx = np.flatnonzero(mark)
+        if idx.shape[0] == 0:
+            return idx
+        
+        mark = mark[idx]
+        prev = np.empty_like(mark)
+        prev[0] = 1 if self.armed[i] else 2
+        prev[1:] = mark[:-1]
+        self.armed[i] = bool(mark[-1] == 1)
+        
+        return idx[(mark == 2) & (prev == 1)]
+    
+    def process(self, data):
+        """处理一个数据块，返回本块内完成的数据段列表，各数据段的触发点位置见self.marks"""
+        
+        if self.changes:
+            self._apply()
+        
+        data = data.reshape(-1, data.shape[-1])
+        if data.shape[0] != self.channels:
+            self.channels = data.shape[0]
+            self.reset()
+        
+        buf = np.concatenate((self.hist, data), axis=1)
+        x = buf[min(self.source, self.channels-1), self.npre:]
+        base = self.n - self.npre                   # buf首个数据点的位置
+        end = self.n + x.shape[0]                   # buf末尾的位置
+        segs = list()
+        self.marks = list()
+        
+        if self.edge == 2:
+            trig = np.union1d(self._crossings(x, 0), self._crossings(x, 1))
+        else:
+            trig = self._crossings(x, self.edge)
+        trig = trig + self.n
+        
+        # 继续填充上一个数据块中未完成的数据段
+        start = self.n
+        while True:
+            if self.seg is not None:
+                k = min(self.length - self.fill, end - start)
+                self.seg[:, self.fill:self.fill+k] = buf[:, start-base:start-base+k]
+                self.fill += k
+                if self.fill < self.length:
+                    break
+                
+                segs.append(self.seg)
+                self.marks.append((self.last, self.npre))
+                self.seg = None
+                if self.sweep == 1:
+                    self.done = True
+            
+            if self.done:
+                break
+            
+            # 找出释抑期之后的第一个触发点，自动扫描方式下超时无触发则强制触发
+            i = np.searchsorted(trig, max(self.next, self.n))
+            if i < trig.shape[0]:
+                t = int(trig[i])
+            elif self.sweep == 2 and max(self.next, self.n, self.last + self.auto) < end:
+                t = max(self.next, self.n, self.last + self.auto)
+            else:
+                break
+            
+            self.last = t
+            self.next = t + max(self.holdoff, self.length - self.npre)
+            self.seg = np.empty((self.channels, self.length), dtype=data.dtype)
+            self.fill = 0
+            start = t - self.npre
+        
+        if self.npre:
+            self.hist = buf[:, buf.shape[1]-self.npre:]
+        self.n = end
+        
+        return segs
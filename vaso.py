@@ -2,11 +2,25 @@
 
 import os
 import wx
-import queue
+import time
+import argparse
 import threading
 from PIL import ImageGrab
 
 from sample import AudioSampler
+from source import SignalSource, ReplaySource
+from recorder import Recorder
+from oscfile import OscWriter
+from audiofile import AudioWriter, open_file
+from scheduler import RenderScheduler
+from fftscreen import SpectrumScreen
+from waterfall import Waterfall
+from acquire import Accumulator
+from stats import Stats
+from chunkqueue import ChunkQueue
+from formats import FORMATS, RATES
+from filters import PRESETS, LABELS, FilteredFile
+from analysis import SharedRing, AnalysisPool
 from screen import *
 from knob import *
 from onoff import *
@@ -15,8 +29,8 @@ from startstop import *
 class MainFrame(wx.Frame):
     """主窗口类"""
     
-    def __init__(self, parent):
-        """构造函数"""
+    def __init__(self, parent, input=None, policy='drop', workers=0):
+        """构造函数，input为输入数据源，None表示声卡；policy为数据队列满时的策略；workers为分析进程数，0表示在界面线程中分析"""
         
         wx.Frame.__init__(self, parent, -1,style=wx.DEFAULT_FRAME_STYLE)
         
@@ -36,11 +50,34 @@ class MainFrame(wx.Frame):
         
         # 实例化采样器
         self.sample_thread = None
-        self.dq = queue.Queue()
-        self.sampler = AudioSampler(self.dq)
+        self.opened = None                              # 打开的数据文件（未滤波）
+        self.shown = None                               # 屏幕上显示的打开的数据文件（按勾选的滤波器包装）
+        self.dq = ChunkQueue(policy=policy)
+        self.sampler = AudioSampler(self.dq, callback=True, input=input)
+        self.recorder = Recorder()
         
         # 实例化示波器屏幕
         self.screen = Screen(self)
+        self.sampler.set_args(length=self.screen.k)
+        
+        # 实例化频谱屏幕（默认隐藏）
+        self.fft = SpectrumScreen(self)
+        self.fft.Show(False)
+        
+        # 实例化瀑布图（默认隐藏）
+        self.waterfall = Waterfall(self)
+        self.waterfall.Show(False)
+        
+        # 分析进程池：采样器把连续的数据流写入共享内存，连续测量和频谱由工作进程计算
+        self.pool = None
+        self.ring = None
+        if workers:
+            self.ring = SharedRing()
+            self.pool = AnalysisPool(workers)
+            self.pool.attach(self.ring)
+            self.sampler.set_args(ring=self.ring)
+            self.screen.set_pool(self.pool)
+            self.fft.set_pool(self.pool)
         
         # 创建滑块
         self.slider = wx.Slider(self, -1, 0, 0, 1000, size=wx.DefaultSize, style=wx.SL_HORIZONTAL)
@@ -56,24 +93,69 @@ class MainFrame(wx.Frame):
         self.vknob = Knob(self, value=50)
         self.vknob.Bind(EVT_KNOB_ANGLE_CHANGED, self.on_amplitude)
         
+        # 幅度旋钮调整的通道：全部通道或单独一个通道
+        self.gain_ch = wx.Choice(self, -1, choices=['全部通道'], name='gain')
+        self.gain_ch.SetSelection(0)
+        self.gain_ch.Bind(wx.EVT_CHOICE, self.on_gain_channel)
+        
         # 创建模式开关
         lab_mode = wx.StaticText(self, -1, '实时模式      触发模式', style=wx.ALIGN_CENTER|wx.ST_NO_AUTORESIZE)
         self.sw_mode = Switch(self)
         self.sw_mode.Bind(EVT_SWITCH_CHANGED, self.on_switch_mode)
         
-        # 触发电平和触发数量
+        # 触发电平、触发沿和扫描方式
         self.level_rb = wx.RadioBox(self, -1, label='触发电平', choices=['0.05%', '0.1%', '0.2%', '0.5%'], majorDimension=2, style=wx.RA_SPECIFY_COLS, name='level')
-        self.over_rb = wx.RadioBox(self, -1, label='触发数量', choices=['1', '2', '5', '10', '20', '50'], majorDimension=3, style=wx.RA_SPECIFY_COLS, name='over')
+        self.edge_rb = wx.RadioBox(self, -1, label='触发沿', choices=['上升', '下降', '双沿'], majorDimension=3, style=wx.RA_SPECIFY_COLS, name='edge')
+        self.sweep_rb = wx.RadioBox(self, -1, label='扫描方式', choices=['常规', '单次', '自动'], majorDimension=3, style=wx.RA_SPECIFY_COLS, name='sweep')
+        self.acq_rb = wx.RadioBox(self, -1, label='采集方式', choices=list(Accumulator.MODES), majorDimension=2, style=wx.RA_SPECIFY_COLS, name='acquire')
         self.level_rb.SetSelection(0)
-        self.over_rb.SetSelection(0)
+        self.edge_rb.SetSelection(0)
+        self.sweep_rb.SetSelection(0)
+        self.acq_rb.SetSelection(0)
         self.level_rb.Enable(False)
-        self.over_rb.Enable(False)
+        self.edge_rb.Enable(False)
+        self.sweep_rb.Enable(False)
+        self.acq_rb.Enable(False)
+        
+        # 采样频率和样本格式，下次启动时生效（回放文件以文件为准）
+        self.rate_rb = wx.RadioBox(self, -1, label='采样频率', choices=['%gkHz'%(rate/1000) for rate in RATES], majorDimension=4, style=wx.RA_SPECIFY_COLS, name='rate')
+        self.format_rb = wx.RadioBox(self, -1, label='样本格式', choices=list(FORMATS), majorDimension=3, style=wx.RA_SPECIFY_COLS, name='format')
+        self.rate_rb.SetSelection(RATES.index(self.sampler.rate))
+        self.format_rb.SetSelection(list(FORMATS).index(self.sampler.format))
         self.Bind(wx.EVT_RADIOBOX, self.on_radio_box)
         
         # 生成启停按钮
         self.btn_star_stop = StartStop(self)
         self.btn_star_stop.Bind(EVT_SS_CHANGED, self.on_star_stop)
         
+        # 录制开关：勾选后采集期间将数据连续写入数据目录下的文件
+        self.cb_record = wx.CheckBox(self, -1, '同步录制到磁盘')
+        
+        # 通道开关：勾选后以立体声双通道采集，下次启动时生效
+        self.cb_stereo = wx.CheckBox(self, -1, '双通道采集')
+        
+        # 自动测量开关
+        self.cb_measure = wx.CheckBox(self, -1, '自动测量')
+        self.cb_measure.Bind(wx.EVT_CHECKBOX, self.on_measure)
+        
+        # 运行统计开关：勾选后在屏幕上显示统计面板，并每秒向数据目录下的stats.jsonl追加一行统计快照
+        self.cb_stats = wx.CheckBox(self, -1, '运行统计')
+        self.cb_stats.Bind(wx.EVT_CHECKBOX, self.on_stats)
+        
+        # 频谱开关和频率坐标开关
+        self.cb_fft = wx.CheckBox(self, -1, '显示频谱', name='fft')
+        self.cb_wf = wx.CheckBox(self, -1, '显示瀑布图', name='waterfall')
+        self.cb_log = wx.CheckBox(self, -1, '对数频率', name='log')
+        self.cb_log.SetValue(True)
+        self.cb_fft.Bind(wx.EVT_CHECKBOX, self.on_spectrum)
+        self.cb_wf.Bind(wx.EVT_CHECKBOX, self.on_spectrum)
+        self.cb_log.Bind(wx.EVT_CHECKBOX, self.on_spectrum)
+        
+        # 滤波器开关：作用于采集的数据和打开的文件，可以同时勾选多个
+        self.cb_filters = [wx.CheckBox(self, -1, LABELS[name], name=name) for name in PRESETS]
+        for cb in self.cb_filters:
+            cb.Bind(wx.EVT_CHECKBOX, self.on_filter)
+        
         # 生成清除|保存|截屏文本按钮
         t_clear = wx.StaticText(self, -1, '清除', name='clear')
         t_s1 = wx.StaticText(self, -1, ' | ')
@@ -88,15 +170,41 @@ class MainFrame(wx.Frame):
         t_capture.Bind(wx.EVT_MOUSE_EVENTS, self.on_text_button)
         t_open.Bind(wx.EVT_MOUSE_EVENTS, self.on_text_button)
         
+        # 生成触发事件的上一个|下一个|跳转|导出文本按钮
+        t_prev = wx.StaticText(self, -1, '上一事件', name='prev')
+        t_s4 = wx.StaticText(self, -1, ' | ')
+        t_next = wx.StaticText(self, -1, '下一事件', name='next')
+        t_s5 = wx.StaticText(self, -1, ' | ')
+        t_goto = wx.StaticText(self, -1, '跳转', name='goto')
+        t_s6 = wx.StaticText(self, -1, ' | ')
+        t_events = wx.StaticText(self, -1, '导出事件', name='events')
+        
+        t_prev.Bind(wx.EVT_MOUSE_EVENTS, self.on_text_button)
+        t_next.Bind(wx.EVT_MOUSE_EVENTS, self.on_text_button)
+        t_goto.Bind(wx.EVT_MOUSE_EVENTS, self.on_text_button)
+        t_events.Bind(wx.EVT_MOUSE_EVENTS, self.on_text_button)
+        
         # 创建布局管理控件
         sizer_max = wx.BoxSizer()                       # 最顶层的布局控件，水平布局
         sizer_left = wx.BoxSizer(wx.VERTICAL)           # 左侧区域布局控件，垂直布局
         sizer_right = wx.BoxSizer(wx.VERTICAL)          # 右侧区域布局控件，垂直布局
         sizer_text = wx.BoxSizer()                      # 右侧底部文本控件，水平布局
+        sizer_event = wx.BoxSizer()                     # 右侧底部触发事件文本控件，水平布局
+        sizer_fft = wx.BoxSizer()                       # 右侧频谱开关，水平布局
+        sizer_filter = wx.BoxSizer()                    # 右侧滤波器开关，水平布局
         
         # 部件组装
         sizer_left.Add(self.screen, 1, wx.EXPAND|wx.ALL, 0)
         sizer_left.Add(self.slider, 0, wx.EXPAND|wx.TOP|wx.BOTTOM, 5)
+        sizer_left.Add(self.fft, 0, wx.EXPAND|wx.BOTTOM, 5)
+        sizer_left.Add(self.waterfall, 0, wx.EXPAND|wx.BOTTOM, 5)
+        
+        sizer_fft.Add(self.cb_fft, 0, wx.ALL, 0)
+        sizer_fft.Add(self.cb_wf, 0, wx.LEFT, 10)
+        sizer_fft.Add(self.cb_log, 0, wx.LEFT, 10)
+        
+        for i, cb in enumerate(self.cb_filters):
+            sizer_filter.Add(cb, 0, wx.LEFT if i else wx.ALL, 10 if i else 0)
         
         sizer_text.Add(t_clear, 0, wx.ALL, 0)
         sizer_text.Add(t_s1, 0, wx.ALL, 0)
@@ -106,18 +214,38 @@ class MainFrame(wx.Frame):
         sizer_text.Add(t_s3, 0, wx.ALL, 0)
         sizer_text.Add(t_open, 0, wx.ALL, 0)
         
+        sizer_event.Add(t_prev, 0, wx.ALL, 0)
+        sizer_event.Add(t_s4, 0, wx.ALL, 0)
+        sizer_event.Add(t_next, 0, wx.ALL, 0)
+        sizer_event.Add(t_s5, 0, wx.ALL, 0)
+        sizer_event.Add(t_goto, 0, wx.ALL, 0)
+        sizer_event.Add(t_s6, 0, wx.ALL, 0)
+        sizer_event.Add(t_events, 0, wx.ALL, 0)
+        
         sizer_right.Add(self.hknob, 0, wx.TOP, 0)
         sizer_right.Add(self.lab_hknob, 0, wx.EXPAND|wx.TOP, 5)
         sizer_right.Add(self.vknob, 0, wx.TOP, 20)
         sizer_right.Add(self.lab_vknob, 0, wx.EXPAND|wx.TOP, 5)
+        sizer_right.Add(self.gain_ch, 0, wx.ALIGN_CENTER_HORIZONTAL|wx.TOP, 5)
         sizer_right.Add(self.sw_mode, 0, wx.TOP, 30)
         sizer_right.Add(lab_mode, 0, wx.EXPAND|wx.TOP, 5)
         sizer_right.AddSpacer(15)
         sizer_right.Add(self.level_rb, 0, wx.EXPAND|wx.ALL, 10)
-        sizer_right.Add(self.over_rb, 0, wx.EXPAND|wx.ALL, 10)
+        sizer_right.Add(self.edge_rb, 0, wx.EXPAND|wx.ALL, 10)
+        sizer_right.Add(self.sweep_rb, 0, wx.EXPAND|wx.ALL, 10)
+        sizer_right.Add(self.acq_rb, 0, wx.EXPAND|wx.ALL, 10)
+        sizer_right.Add(self.rate_rb, 0, wx.EXPAND|wx.ALL, 10)
+        sizer_right.Add(self.format_rb, 0, wx.EXPAND|wx.ALL, 10)
         sizer_right.Add(wx.Panel(self), 1, wx.ALL, 0)
+        sizer_right.Add(sizer_fft, 0, wx.ALIGN_CENTER_HORIZONTAL|wx.TOP, 10)
+        sizer_right.Add(sizer_filter, 0, wx.ALIGN_CENTER_HORIZONTAL|wx.TOP, 5)
+        sizer_right.Add(self.cb_measure, 0, wx.ALIGN_CENTER_HORIZONTAL|wx.TOP, 5)
+        sizer_right.Add(self.cb_stats, 0, wx.ALIGN_CENTER_HORIZONTAL|wx.TOP, 5)
+        sizer_right.Add(self.cb_stereo, 0, wx.ALIGN_CENTER_HORIZONTAL|wx.TOP, 5)
+        sizer_right.Add(self.cb_record, 0, wx.ALIGN_CENTER_HORIZONTAL|wx.TOP, 5)
         sizer_right.Add(self.btn_star_stop, 0, wx.TOP, 10)
         sizer_right.Add(sizer_text, 0, wx.ALIGN_CENTER_HORIZONTAL|wx.TOP, 10)
+        sizer_right.Add(sizer_event, 0, wx.ALIGN_CENTER_HORIZONTAL|wx.TOP, 5)
         
         sizer_max.Add(sizer_left, 1, wx.EXPAND|wx.ALL, 0)
         sizer_max.Add(sizer_right, 0, wx.EXPAND|wx.ALL, 20)
@@ -125,54 +253,68 @@ class MainFrame(wx.Frame):
         self.SetSizer(sizer_max)
         self.SetAutoLayout(True)
         
-        # 启动线程：以阻塞方式从队列中读出数据
-        read_thread = threading.Thread(target=self.read_data)
-        read_thread.setDaemon(True)
-        read_thread.start()
+        # 启动渲染调度器：在GUI线程中按限定帧率批量读出队列中的数据
+        self.scheduler = RenderScheduler(self.dq, self.screen, fps=30)
+        self.scheduler.add_sink(self.fft)
+        self.scheduler.add_sink(self.waterfall)
+        self.scheduler.start()
         
         self.Bind(wx.EVT_SIZE, self.on_size)            # 绑定窗口尺寸改变事件
         self.Bind(wx.EVT_CLOSE, self.on_close)          # 绑定窗口关闭事件
     
-    def read_data(self):
-        """读数据队列的线程函数"""
-        
-        while True:
-            self.screen.append_data(self.dq.get())
-        
     def on_close(self, evt):
         """关闭窗口"""
         
-        if self.sample_thread and self.sample_thread.isAlive():
+        if self.sample_thread and self.sample_thread.is_alive():
             self.sampler.stop()
         
         if self.sample_thread:
             self.sample_thread.join()
         
+        self.scheduler.Stop()
+        self.recorder.close()
+        self._release()
+        if self.pool:
+            self.pool.close()
+            self.ring.close()
         self.Destroy()
-            
+    
     def on_size(self, evt):
         """响应窗口大小变化"""
         
         w, h = self.GetSize()
         
+        if h < 1040:
+            self.rate_rb.Show(False)
+            self.format_rb.Show(False)
+            self.Layout()
+        else:
+            self.rate_rb.Show(True)
+            self.format_rb.Show(True)
+            self.Layout()
+        
         if h < 960:
             self.level_rb.Show(False)
-            self.over_rb.Show(False)
+            self.edge_rb.Show(False)
+            self.sweep_rb.Show(False)
             self.Layout()
         else:
             self.level_rb.Show(True)
-            self.over_rb.Show(True)
+            self.edge_rb.Show(True)
+            self.sweep_rb.Show(True)
             self.Layout()
-            
+        
         if h < 760:
             self.vknob.Show(False)
             self.lab_vknob.Show(False)
+            self.gain_ch.Show(False)
             self.Layout()
         else:
             self.vknob.Show(True)
             self.lab_vknob.Show(True)
+            self.gain_ch.Show(True)
             self.Layout()
-            
+        
         if h < 580:
             self.hknob.Show(False)
             self.lab_hknob.Show(False)
@@ -187,29 +329,151 @@ class MainFrame(wx.Frame):
         
         if self.sampler.running:
             self.sampler.stop()
+            self.sample_thread.join()
+            self.recorder.close()
+            self.sampler.set_args(recorder=None)
             self.slider.Enable(True)
         else:
             self.slider.SetValue(1000)
             self.slider.Enable(False)
             
+            # 回放数据源结束时采样器已自行停止，需关闭上次的录制
+            self.recorder.close()
+            self.sampler.set_args(recorder=None)
+            
+            # 打开的文件是内存映射的，不在其后追加新数据
+            if self.screen.data.mapped:
+                self.screen.clear()
+                self._release()
+            
+            # 回放文件等数据源自带采样频率和样本格式，否则以选择的为准；屏幕的时间标注、纵轴标注和频谱随之换算
+            rate = self.sampler.input.rate or self.sampler.rate
+            if rate != self.screen.rate:
+                self.screen.set_rate(rate)
+                self.fft.set_rate(rate)
+                self.waterfall.set_rate(rate)
+                self.sampler.set_args(length=self.screen.k)
+            
+            dtype = FORMATS[self.sampler.input.format or self.sampler.format]
+            if dtype != self.screen.data.dtype:
+                self.screen.set_format(dtype)
+                self.fft.set_format(dtype)
+                self.waterfall.set_format(dtype)
+            self.sampler.set_args(level=self._level(self.level_rb.GetSelection()), hysteresis=8*self.screen.full/32768)
+            
+            channels = self.sampler.input.channels or (2 if self.cb_stereo.GetValue() else 1)
+            if channels != self.screen.data.channels:
+                self.screen.set_channels(channels)
+                self.fft.set_channels(channels)
+                self.waterfall.set_channels(channels)
+                self._gain_channels()
+            self.sampler.set_args(channels=channels)
+            
+            if self.cb_record.GetValue():
+                path = os.path.join(self.works, time.strftime('%Y%m%d_%H%M%S.osc'))
+                self.recorder.open(path, channels=channels, rate=rate, meta=self.sampler.describe(), dtype=dtype)
+                self.sampler.set_args(recorder=self.recorder)
+            
             self.sample_thread = threading.Thread(target=self.sampler.start)
             self.sample_thread.setDaemon(True)
             self.sample_thread.start()
     
+    def on_spectrum(self, evt):
+        """显示或隐藏频谱和瀑布图，切换频率坐标"""
+        
+        name = evt.GetEventObject().GetName()
+        if name == 'fft':
+            self.fft.clear()
+            self.fft.Show(self.cb_fft.GetValue())
+            self.Layout()
+        elif name == 'waterfall':
+            self.waterfall.clear()
+            self.waterfall.Show(self.cb_wf.GetValue())
+            self.Layout()
+        else:
+            self.fft.set_log(self.cb_log.GetValue())
+            self.waterfall.set_log(self.cb_log.GetValue())
+    
+    def _filtered(self, data):
+        """按勾选的滤波器包装打开的数据文件，读取时逐块滤波；没有勾选时原样返回"""
+        
+        filters = [cb.GetName() for cb in self.cb_filters if cb.GetValue()]
+        
+        return FilteredFile(data, filters, rate=self.screen.rate) if filters else data
+    
+    def _show(self, data):
+        """在屏幕上显示打开的数据文件，之前显示的滤波包装在换下后关闭（释放文件句柄、预读线程和缓存）"""
+        
+        shown, self.shown = self.shown, self._filtered(data)
+        self.screen.load_data(self.shown)
+        self._gain_channels()
+        if isinstance(shown, FilteredFile):
+            shown.close()
+        
+        if self.waterfall.IsShown():
+            self.waterfall.render(self.screen.data)
+    
+    def _release(self):
+        """关闭打开的数据文件及其滤波包装"""
+        
+        self.waterfall.stop()
+        if isinstance(self.shown, FilteredFile):
+            self.shown.close()
+        if self.opened is not None:
+            self.opened.close()
+        
+        self.shown = self.opened = None
+    
+    def on_filter(self, evt):
+        """启用或关闭滤波器：采集中的数据从下一个数据块起生效，屏幕上打开的文件重新载入"""
+        
+        self.sampler.set_args(filters=[cb.GetName() for cb in self.cb_filters if cb.GetValue()])
+        
+        if self.opened is not None and self.screen.data.mapped:
+            self._show(self.opened)
+            self.slider.SetValue(1000)
+    
+    def on_measure(self, evt):
+        """显示或隐藏自动测量结果"""
+        
+        self.screen.set_measure(self.cb_measure.GetValue())
+    
+    def on_stats(self, evt):
+        """开启或关闭运行统计"""
+        
+        stats = Stats(self.sampler, log=os.path.join(self.works, 'stats.jsonl')) if self.cb_stats.GetValue() else None
+        self.scheduler.set_stats(stats)
+        self.screen.set_stats(stats)
+    
     def on_slider(self, evt):
         """拖动滑块"""
         
         self.screen.set_pos(self.slider.GetValue())
     
     def on_amplitude(self, evt):
-        """改变幅度缩放比例"""
+        """改变幅度缩放比例：全部通道或选中的通道"""
+        
+        c = self.gain_ch.GetSelection()
+        self.screen.set_amplitude(evt.GetValue(), c - 1 if c > 0 else None)
+    
+    def on_gain_channel(self, evt):
+        """选择幅度旋钮调整的通道，旋钮转到该通道当前的幅度"""
+        
+        c = self.gain_ch.GetSelection()
+        self.vknob.SetValue(self.screen.amplitude(c - 1 if c > 0 else None))
+    
+    def _gain_channels(self):
+        """按屏幕的通道数更新幅度旋钮可选的通道（各通道的缩放倍数已随通道数复位）"""
         
-        self.screen.set_amplitude(evt.GetValue())
+        self.gain_ch.SetItems(['全部通道'] + ['CH%d'%(c+1) for c in range(self.screen.data.channels)])
+        self.gain_ch.SetSelection(0)
+        self.vknob.SetValue(self.screen.amplitude())
     
     def on_time_width(self, evt):
         """改变时间窗口宽度"""
         
         self.screen.set_time_width(evt.GetValue())
+        self.sampler.set_args(length=self.screen.k)
     
     def on_switch_mode(self, evt):
         """改变模式"""
@@ -217,24 +481,44 @@ class MainFrame(wx.Frame):
         mode = not bool(evt.GetValue())
         self.sampler.set_args(mode=mode)
         
+        # 平均和峰值保持只对触发对齐的数据段有意义
         if mode:
             self.level_rb.Enable(False)
-            self.over_rb.Enable(False)
+            self.edge_rb.Enable(False)
+            self.sweep_rb.Enable(False)
+            self.acq_rb.Enable(False)
+            self.acq_rb.SetSelection(0)
+            self.screen.set_acquire(0)
         else:
             self.level_rb.Enable(True)
-            self.over_rb.Enable(True)
+            self.edge_rb.Enable(True)
+            self.sweep_rb.Enable(True)
+            self.acq_rb.Enable(True)
+    
+    def _level(self, i):
+        """第i档触发电平（满量程的0.05%、0.1%、0.2%、0.5%）在当前样本格式下的数值"""
         
+        return [16,32,64,160][i] * self.screen.full / 32768
+    
     def on_radio_box(self, evt):
-        """改变触发电平和触发数量"""
+        """改变触发电平、触发沿、扫描方式、采集方式、采样频率和样本格式"""
         
         objName = evt.GetEventObject().GetName()
         if objName == 'level':
-            self.level = self.sampler.set_args(level=[16,32,64,160][evt.GetInt()])
+            self.sampler.set_args(level=self._level(evt.GetInt()))
+        elif objName == 'rate':
+            self.sampler.set_args(rate=RATES[evt.GetInt()])
+        elif objName == 'format':
+            self.sampler.set_args(format=list(FORMATS)[evt.GetInt()])
+        elif objName == 'edge':
+            self.sampler.set_args(edge=evt.GetInt())
+        elif objName == 'acquire':
+            self.screen.set_acquire(evt.GetInt())
         else:
-            self.over = self.sampler.set_args(over=[1,2,5,10,20,50][evt.GetInt()])
+            self.sampler.set_args(sweep=evt.GetInt())
     
     def on_text_button(self, evt):
-        """响应清除、截屏、保存和打开操作"""
+        """响应清除、截屏、保存、打开和触发事件操作"""
         
         obj = evt.GetEventObject()
         name = obj.GetName()
@@ -247,7 +531,31 @@ class MainFrame(wx.Frame):
         if evt.LeftUp():
             if name == 'clear':
                 self.screen.clear()
+                self.fft.clear()
+                self.waterfall.clear()
                 self.slider.SetValue(0)
+            elif name == 'prev':
+                self.screen.prev_event()
+            elif name == 'next':
+                self.screen.next_event()
+            elif name == 'goto':
+                n = len(self.screen.events)
+                if n:
+                    i = wx.GetNumberFromUser('事件序号（1~%d）'%n, '序号', '跳转到事件', max(self.screen.events.current, 0)+1, 1, n, self)
+                    if i > 0:
+                        self.screen.goto_event(i-1)
+            elif name == 'events':
+                wildcard = 'CSV file (*.csv)|*.csv'
+                dlg = wx.FileDialog(self, 
+                    message     = '导出事件表为...', 
+                    defaultDir  = self.works, 
+                    defaultFile = '', 
+                    wildcard    = wildcard, 
+                    style       = wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT)
+                
+                dlg.Center()
+                if dlg.ShowModal() == wx.ID_OK:
+                    self.screen.events.export(dlg.GetPath(), self.screen.data.dropped)
             elif name == 'capture':
                 w, h = self.screen.GetSize()
                 im = ImageGrab.grab().crop((3, 25, w-6, h+20))
@@ -264,7 +572,7 @@ class MainFrame(wx.Frame):
                 if dlg.ShowModal() == wx.ID_OK: 
                     im.save(dlg.GetPath())
             elif name == 'save':
-                wildcard = 'data file (*.npy)|*.npy'
+                wildcard = 'recording (*.osc)|*.osc|data file (*.npy)|*.npy|WAV file (*.wav)|*.wav|FLAC file (*.flac)|*.flac'
                 dlg = wx.FileDialog(self, 
                     message     = '保存数据为...', 
                     defaultDir  = self.works, 
@@ -274,9 +582,26 @@ class MainFrame(wx.Frame):
                 
                 dlg.Center()
                 if dlg.ShowModal() == wx.ID_OK:
-                    np.save(dlg.GetPath(), self.screen.data)
+                    # 分块写入，不把整个文件读入内存；.npy文件单通道保存为一维数组，多通道保存为(数据点数, 通道数)
+                    path = dlg.GetPath()
+                    ext = os.path.splitext(path)[1].lower()
+                    if ext in ('.osc', '.wav', '.flac'):
+                        cls = OscWriter if ext == '.osc' else AudioWriter
+                        writer = cls(path, self.screen.data.channels, self.screen.rate, self.screen.data.dtype)
+                        for i in range(0, len(self.screen.data), 1048576):
+                            writer.write(self.screen.data[i:i+1048576])
+                        writer.close()
+                    else:
+                        data = self.screen.data
+                        shape = (len(data),) if data.channels == 1 else (len(data), data.channels)
+                        out = np.lib.format.open_memmap(path, mode='w+', dtype=data.dtype, shape=shape)
+                        for i in range(0, len(data), 1048576):
+                            chunk = data[i:i+1048576]
+                            out[i:i+chunk.shape[1]] = chunk[0] if data.channels == 1 else chunk.T
+                        out.flush()
+                        del out
             else:
-                wildcard = 'data file (*.npy)|*.npy'    
+                wildcard = 'data file (*.osc;*.npy;*.wav;*.flac)|*.osc;*.npy;*.wav;*.flac'    
                 dlg = wx.FileDialog(self, 
                     message       = '选择数据文件',
                     defaultDir    = self.works,  
@@ -287,12 +612,39 @@ class MainFrame(wx.Frame):
                 
                 dlg.Center()
                 if dlg.ShowModal() == wx.ID_OK: 
-                    self.screen.data = np.array([], dtype=np.int16)
-                    self.screen.append_data(np.load(dlg.GetPath()))
+                    # 按块读取，只读取时间窗口覆盖的数据块；.osc、WAV和FLAC文件自带采样频率
+                    data = open_file(dlg.GetPath())
+                    if hasattr(data, 'rate'):
+                        self.screen.set_rate(data.rate)
+                        self.fft.set_rate(data.rate)
+                        self.waterfall.set_rate(data.rate)
+                        self.sampler.set_args(length=self.screen.k)
+                    
+                    # 换下之前打开的文件后再关闭它
+                    opened, self.opened = self.opened, data
+                    self._show(data)
+                    if opened is not None:
+                        opened.close()
                     self.slider.SetValue(1000)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='音频存储示波器')
+    parser.add_argument('--signal', choices=SignalSource.KINDS, help='以合成信号代替声卡输入')
+    parser.add_argument('--freq', type=float, default=50, help='合成信号频率（Hz）')
+    parser.add_argument('--replay', help='以回放.osc、.npy、WAV或FLAC文件代替声卡输入')
+    parser.add_argument('--speed', type=float, default=1, help='合成信号或回放的倍速，0表示不限速')
+    parser.add_argument('--policy', choices=ChunkQueue.POLICIES, default='drop', help='显示队列满时的策略：block - 等待，drop - 丢弃最早的数据块（录制不受影响），merge - 合并数据块')
+    parser.add_argument('--workers', type=int, default=0, help='分析进程数：连续测量和频谱在工作进程中计算，0表示在界面线程中计算')
+    args = parser.parse_args()
+    
+    if args.replay:
+        feed = ReplaySource(args.replay, speed=args.speed)
+    elif args.signal:
+        feed = SignalSource(args.signal, freq=args.freq, speed=args.speed)
+    else:
+        feed = None
+    
     app = wx.App()
-    frame = MainFrame(None)
+    frame = MainFrame(None, input=feed, policy=args.policy, workers=args.workers)
     frame.Show()
     app.MainLoop()
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+import wx
+import time
+import numpy as np
+
+from spectrum import Spectrum
+from formats import full_scale
+
+def colormap(n=256):
+    """生成n级颜色查找表：黑 → 蓝 → 品红 → 橙 → 黄 → 白"""
+    
+    stops = np.array([0, 0.2, 0.45, 0.7, 0.9, 1.0])
+    colours = np.array([(0,0,0), (20,20,140), (170,30,150), (245,110,30), (250,220,40), (255,255,255)])
+    x = np.linspace(0, 1, n)
+    
+    return np.stack([np.interp(x, stops, colours[:, i]) for i in range(3)], axis=1).astype(np.uint8)
+
+class Waterfall(wx.Panel):
+    """瀑布图（时频图）：每个帧移追加一列，图像保存在循环使用的位图中，重绘时分两段贴图"""
+    
+    LUT = colormap()                                # 颜色查找表
+    
+    def __init__(self, parent, rate=44100, channels=1, size=(-1, 200)):
+        """构造函数"""
+        
+        wx.Panel.__init__(self, parent, -1, size=size, style=wx.SUNKEN_BORDER)
+        self.SetBackgroundColour(wx.Colour(0, 0, 0))
+        self.SetDoubleBuffered(True)
+        
+        self.spectrum = Spectrum(rate=rate, nfft=2048, overlap=0.5, average=1, channels=channels) # 频谱分析器
+        self.channel = 0                            # 显示的通道
+        self.log = True                             # 频率轴是否为对数坐标
+        self.fmin = 20                              # 对数坐标下的最低频率
+        self.top = -20                              # 色标上限（dBFS）
+        self.bottom = -120                          # 色标下限（dBFS）
+        self.job = None                             # 正在分步进行的整段录音绘制（生成器）
+        self.scrsize = self.GetSize()               # 屏幕宽度和高度
+        self._layout()
+        
+        self.Bind(wx.EVT_SIZE, self.on_size)
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+    
+    def _layout(self):
+        """按屏幕尺寸重建环形位图和频点到像素行的映射（停止正在进行的整段绘制）"""
+        
+        self.job = None
+        w, h = max(self.scrsize[0], 1), max(self.scrsize[1], 1)
+        freqs = self.spectrum.freqs
+        fmax = self.spectrum.rate / 2
+        
+        # 每行下边缘的频率，行0在底部；行内多个频点取最大值，没有频点的行取最近的频点
+        frac = np.arange(h) / h
+        edges = self.fmin * (fmax/self.fmin)**frac if self.log else fmax*frac
+        self.rows = np.minimum(np.searchsorted(freqs, edges), freqs.shape[0] - 1)
+        
+        self.ring = wx.Bitmap(w, h)                 # 环形位图
+        self.col = 0                                # 下一列在环形位图中的位置
+        dc = wx.MemoryDC(self.ring)
+        dc.SetBackground(wx.Brush(wx.Colour(0, 0, 0)))
+        dc.Clear()
+        dc.SelectObject(wx.NullBitmap)
+    
+    def _column(self, mag):
+        """将单帧幅度谱转为一列RGB像素（高度 × 3），自上而下频率递减"""
+        
+        db = 20 * np.log10(np.maximum(np.maximum.reduceat(mag, self.rows), 1e-12))
+        idx = np.clip((db - self.bottom) * (255 / (self.top - self.bottom)), 0, 255).astype(np.uint8)
+        
+        return self.LUT[idx[::-1]]
+    
+    def _blit(self, columns):
+        """将若干列像素写入环形位图，分段处理环绕"""
+        
+        img = np.ascontiguousarray(np.stack(columns, axis=1))
+        w = self.ring.GetWidth()
+        img = img[:, -w:]
+        
+        dc = wx.MemoryDC(self.ring)
+        i = 0
+        while i < img.shape[1]:
+            k = min(img.shape[1] - i, w - self.col)
+            part = np.ascontiguousarray(img[:, i:i+k])
+            dc.DrawBitmap(wx.Bitmap.FromBuffer(k, part.shape[0], part), self.col, 0)
+            self.col = (self.col + k) % w
+            i += k
+        dc.SelectObject(wx.NullBitmap)
+    
+    def on_size(self, evt):
+        """响应窗口大小变化"""
+        
+        self.scrsize = self.GetSize()
+        self._layout()
+        self.Refresh()
+    
+    def on_paint(self, evt):
+        """响应重绘事件：最早的列在左，最新的列在右"""
+        
+        dc = wx.PaintDC(self)
+        w, h = self.ring.GetWidth(), self.ring.GetHeight()
+        
+        mdc = wx.MemoryDC(self.ring)
+        dc.Blit(0, 0, w - self.col, h, mdc, self.col, 0)
+        dc.Blit(w - self.col, 0, self.col, h, mdc, 0, 0)
+        mdc.SelectObject(wx.NullBitmap)
+    
+    def append_data(self, data):
+        """送入数据，每个新的频谱帧追加一列；隐藏时不计算"""
+        
+        if not self.IsShown():
+            return
+        
+        self.job = None
+        columns = [self._column(mag[self.channel]) for mag in self.spectrum.iterframes(data)]
+        if columns:
+            self._blit(columns)
+            self.Refresh()
+    
+    def render(self, data, block=262144, slice=0.04):
+        """绘制整段录音的瀑布图：按块流式读取，每个像素列取其覆盖的各帧的最大值，内存占用与录音长度无关
+        
+        data为DataStore或形状为(通道数, 数据点数)、支持切片的数组。绘制在界面线程中分步进行，每步约slice秒，
+        完成的像素列随即显示，长录音不会使界面停止响应；再次绘制、清除或追加实时数据时停止。
+        """
+        
+        self._layout()
+        self.job = self._render(data, block)
+        self._step(self.job, slice)
+    
+    def stop(self):
+        """停止正在进行的整段绘制"""
+        
+        self.job = None
+    
+    def _step(self, job, slice):
+        """执行整段绘制的一步，未完成时稍后继续"""
+        
+        if not self or job is not self.job:
+            return
+        
+        t = time.time()
+        try:
+            while time.time() - t < slice:
+                next(job)
+        except StopIteration:
+            self.job = None
+            return
+        
+        wx.CallLater(10, self._step, job, slice)
+    
+    def _render(self, data, block):
+        """整段绘制的生成器：每读完一块数据产出一次，已经完整的像素列写入环形位图"""
+        
+        channels, n = data.shape
+        w = self.ring.GetWidth()
+        spectrum = Spectrum(rate=self.spectrum.rate, nfft=self.spectrum.nfft, overlap=self.spectrum.overlap, average=1, channels=channels, full=full_scale(data.dtype))
+        total = max((n - spectrum.nfft) // spectrum.hop + 1, 1)
+        peak = np.zeros((w, spectrum.nfft//2 + 1))
+        done = 0                                    # 已写入位图的像素列数
+        
+        block = max(block - block % spectrum.hop, spectrum.hop)
+        for i in range(0, n, block):
+            for mag in spectrum.iterframes(data[i:i+block]):
+                j = min((spectrum.frames - 1) * w // total, w - 1)
+                np.maximum(peak[j], mag[min(self.channel, channels - 1)], out=peak[j])
+            
+            # 下一帧所在的像素列之前的各列已经完整
+            j = min(spectrum.frames * w // total, w)
+            if j > done:
+                self._blit([self._column(item) for item in peak[done:j]])
+                done = j
+                self.Refresh()
+            
+            yield
+        
+        if done < w:
+            self._blit([self._column(item) for item in peak[done:]])
+            self.Refresh()
+    
+    def set_log(self, log):
+        """设置频率轴为对数或线性坐标（清除已有图像）"""
+        
+        self.log = log
+        self._layout()
+        self.Refresh()
+    
+    def set_rate(self, rate):
+        """设置采样频率（清除已有图像）"""
+        
+        self.spectrum.set_args(rate=rate)
+        self._layout()
+        self.Refresh()
+    
+    def set_channels(self, channels):
+        """设置通道数"""
+        
+        self.spectrum.set_args(channels=channels)
+        self.channel = min(self.channel, channels - 1)
+    
+    def set_format(self, dtype):
+        """设置样本的数据类型，频谱幅度以其满量程为0dB"""
+        
+        self.spectrum.set_args(full=full_scale(dtype))
+    
+    def clear(self):
+        """清除图像"""
+        
+        self.spectrum.reset()
+        self._layout()
+        self.Refresh()